@@ -1,26 +1,67 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Depends, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel, ReplaceOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
 import os
+import asyncio
+import csv
+import gzip
+import io
+import json
 import logging
+import re
+import socket
+import unicodedata
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, PlainSerializer, ValidationError
+from typing import Annotated, List, Optional, Dict, Any, AsyncIterator, Iterator, Tuple
 import uuid
-from datetime import datetime, timedelta
+import time
+import math
+import zlib
+import hashlib
+from collections import OrderedDict, Counter
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 import base64
 from enum import Enum
 import bcrypt
 from jose import JWTError, jwt
+from PIL import Image, ImageOps, UnidentifiedImageError
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Request tracing: with DB_COMMAND_TRACING=true every response carries the number of MongoDB
+# commands (including getMores) it took, in the X-DB-Commands header
+DB_COMMAND_TRACING = os.environ.get('DB_COMMAND_TRACING', 'false').lower() == 'true'
+DB_COMMANDS_HEADER = "X-DB-Commands"
+db_command_counter: ContextVar[Optional[List[int]]] = ContextVar("db_command_counter", default=None)
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands against the counter of the request they run for (Motor copies the context)"""
+    
+    def started(self, event):
+        counter = db_command_counter.get()
+        if counter is not None:
+            counter[0] += 1
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[CommandCounter()] if DB_COMMAND_TRACING else [])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -48,6 +89,49 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+# Password hashing pool: bcrypt takes ~100-250ms per call, so keep it off the event loop.
+# PASSWORD_HASH_EXECUTOR: "thread" (default), "process" or "inline" (old behaviour, for benchmarking)
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', str(PASSWORD_HASH_WORKERS * 4)))
+
+if PASSWORD_HASH_EXECUTOR == "process":
+    password_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+elif PASSWORD_HASH_EXECUTOR == "thread":
+    password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+else:
+    password_executor = None
+
+password_jobs_in_flight = 0
+
+async def run_password_job(func, *args):
+    """Run a bcrypt job on the password pool, rejecting with 503 when the queue is full"""
+    global password_jobs_in_flight
+    if password_executor is None:
+        return func(*args)
+    
+    if password_jobs_in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"}
+        )
+    
+    password_jobs_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        password_jobs_in_flight -= 1
+
+async def hash_password_async(password: str) -> str:
+    """Hash password on the password pool"""
+    return await run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify password on the password pool"""
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -59,8 +143,169 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Authenticated principal cache
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', '30'))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES', '2048'))
+PRINCIPAL_FIELDS = {"_id": 0, "id": 1, "username": 1, "role": 1, "status": 1, "wallet_balance": 1}
+
+class PrincipalCache:
+    """Bounded TTL/LRU cache of slim user principals keyed by token subject (username)"""
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._subject_by_user_id: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def get(self, subject: str):
+        entry = self._entries.get(subject)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(subject)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, subject: str, principal: "AuthPrincipal"):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(subject)
+        self._subject_by_user_id[principal.id] = subject
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+    
+    def invalidate_user(self, user_id: str):
+        """Drop the cached principal of a user whose id/username/role/status/wallet_balance changed"""
+        subject = self._subject_by_user_id.pop(user_id, None)
+        if subject is not None and self._entries.pop(subject, None) is not None:
+            self.invalidations += 1
+    
+    def _drop(self, subject: str):
+        entry = self._entries.pop(subject, None)
+        if entry is not None and self._subject_by_user_id.get(entry[1].id) == subject:
+            del self._subject_by_user_id[entry[1].id]
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL_SECONDS)
+
+class SnapshotCache:
+    """Short-lived snapshot of an expensive computation with stale-while-revalidate.
+    
+    Fresh snapshots are returned as-is, stale ones are returned while a single background
+    refresh runs, and concurrent callers with no usable snapshot share one computation.
+    """
+    
+    def __init__(self, compute, fresh_seconds: float, stale_seconds: float):
+        self.compute = compute
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self._value = None
+        self._computed_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+    
+    async def get(self):
+        age = time.monotonic() - self._computed_at
+        if self._value is not None and age < self.fresh_seconds:
+            self.hits += 1
+            return self._value
+        if self._value is not None and age < self.stale_seconds:
+            self.stale_hits += 1
+            self._start_refresh()
+            return self._value
+        self.misses += 1
+        return await asyncio.shield(self._start_refresh())
+    
+    def invalidate(self):
+        self._value = None
+        self._computed_at = 0.0
+    
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+        return self._refresh_task
+    
+    async def _refresh(self):
+        try:
+            value = await self.compute()
+        except Exception as e:
+            logger.error(f"Error refreshing snapshot {getattr(self.compute, '__name__', self.compute)}: {str(e)}")
+            if self._value is None:
+                raise
+            return self._value
+        self._value = value
+        self._computed_at = time.monotonic()
+        return value
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fresh_seconds": self.fresh_seconds,
+            "stale_seconds": self.stale_seconds,
+            "age_seconds": round(time.monotonic() - self._computed_at, 3) if self._value is not None else None,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses
+        }
+
+class SnapshotCacheGroup:
+    """Bounded LRU of SnapshotCaches, one per key (e.g. a normalized query)"""
+    
+    def __init__(self, fresh_seconds: float, stale_seconds: float, max_entries: int):
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._caches: "OrderedDict[Any, SnapshotCache]" = OrderedDict()
+        self.evictions = 0
+    
+    async def get(self, key, compute):
+        """Snapshot for key, computed with compute() the first time the key is seen"""
+        cache = self._caches.get(key)
+        if cache is None:
+            cache = SnapshotCache(compute, self.fresh_seconds, self.stale_seconds)
+            self._caches[key] = cache
+            while len(self._caches) > self.max_entries:
+                self._caches.popitem(last=False)
+                self.evictions += 1
+        self._caches.move_to_end(key)
+        return await cache.get()
+    
+    def invalidate(self):
+        self._caches.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        caches = list(self._caches.values())
+        return {
+            "entries": len(caches),
+            "max_entries": self.max_entries,
+            "fresh_seconds": self.fresh_seconds,
+            "stale_seconds": self.stale_seconds,
+            "evictions": self.evictions,
+            "hits": sum(cache.hits for cache in caches),
+            "stale_hits": sum(cache.stale_hits for cache in caches),
+            "misses": sum(cache.misses for cache in caches)
+        }
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user"""
+    """Get current authenticated user (slim principal, served from cache when possible)"""
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -74,12 +319,18 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"username": username})
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+    
+    user = await db.users.find_one({"username": username}, PRINCIPAL_FIELDS)
     if user is None:
         raise credentials_exception
-    return User(**user)
+    principal = AuthPrincipal(**user)
+    principal_cache.set(username, principal)
+    return principal
 
-async def get_current_admin(current_user: "User" = Depends(get_current_user)):
+async def get_current_admin(current_user: "AuthPrincipal" = Depends(get_current_user)):
     """Get current admin user only"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -88,6 +339,15 @@ async def get_current_admin(current_user: "User" = Depends(get_current_user)):
         )
     return current_user
 
+def public_blob_url(value: Optional[str]) -> Optional[str]:
+    """Absolute URL of a stored "/api/blobs/<sha256>" path (see Blob Store); other values are returned as is"""
+    if isinstance(value, str) and value.startswith(BLOB_URL_PREFIX):
+        return f"{BLOB_PUBLIC_BASE_URL}{value}"
+    return value
+
+# Image fields of stored documents: kept as blob paths, served against BLOB_PUBLIC_BASE_URL in JSON responses
+BlobURL = Annotated[str, PlainSerializer(public_blob_url, return_type=str, when_used="json")]
+
 # Enums
 class PropertyType(str, Enum):
     apartment = "apartment"
@@ -164,14 +424,14 @@ class SiteSettings(BaseModel):
     contact_phone: str = "1900 123 456"
     contact_address: str = "123 Nguyễn Huệ, Quận 1, TP. Hồ Chí Minh"
     company_address: str = "123 Nguyễn Huệ, Quận 1, TP. Hồ Chí Minh"
-    logo_url: Optional[str] = None
-    favicon_url: Optional[str] = None
-    banner_image: Optional[str] = None
+    logo_url: Optional[BlobURL] = None
+    favicon_url: Optional[BlobURL] = None
+    banner_image: Optional[BlobURL] = None
     bank_account_number: str = "1234567890"
     bank_account_holder: str = "CONG TY TNHH BDS VIET NAM"
     bank_name: str = "Ngân hàng Vietcombank"
     bank_branch: Optional[str] = "Chi nhánh TP.HCM"
-    bank_qr_code: Optional[str] = None
+    bank_qr_code: Optional[BlobURL] = None
     contact_button_1_text: str = "Zalo"
     contact_button_1_link: str = "https://zalo.me/123456789"
     contact_button_2_text: str = "Telegram"
@@ -225,7 +485,7 @@ class Property(BaseModel):
     city: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
-    images: List[str] = []  # base64 images
+    images: List[BlobURL] = []  # base64 images
     featured: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -234,6 +494,33 @@ class Property(BaseModel):
     contact_email: Optional[str] = None
     agent_name: Optional[str] = None
 
+class PropertySummary(BaseModel):
+    """Compact property for list views: first image only, truncated description"""
+    id: str
+    title: str
+    description: str = ""
+    property_type: PropertyType
+    status: PropertyStatus
+    price: float
+    price_per_sqm: Optional[float] = None
+    area: float
+    bedrooms: int
+    bathrooms: int
+    address: str
+    district: str
+    city: str
+    images: List[BlobURL] = []
+    featured: bool = False
+    created_at: datetime
+    views: int = 0
+    contact_phone: str
+    agent_name: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class NearbyPropertySummary(PropertySummary):
+    distance_m: Optional[float] = None  # radius searches only
+
 class PropertyCreate(BaseModel):
     title: str
     description: str
@@ -280,7 +567,7 @@ class NewsArticle(BaseModel):
     slug: str
     content: str
     excerpt: str
-    featured_image: Optional[str] = None  # base64
+    featured_image: Optional[BlobURL] = None  # base64
     category: str
     tags: List[str] = []
     published: bool = True
@@ -383,7 +670,7 @@ class Land(BaseModel):
     city: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
-    images: List[str] = []  # base64 images
+    images: List[BlobURL] = []  # base64 images
     featured: bool = False
     legal_status: str  # Tình trạng pháp lý: "Sổ đỏ", "Sổ hồng", etc
     orientation: Optional[str] = None  # Hướng: "Đông", "Tây", etc
@@ -395,6 +682,61 @@ class Land(BaseModel):
     contact_email: Optional[str] = None
     agent_name: Optional[str] = None
 
+class LandSummary(BaseModel):
+    """Compact land for list views: first image only, truncated description"""
+    id: str
+    title: str
+    description: str = ""
+    land_type: LandType
+    status: PropertyStatus
+    price: float
+    price_per_sqm: Optional[float] = None
+    area: float
+    width: Optional[float] = None
+    length: Optional[float] = None
+    address: str
+    district: str
+    city: str
+    images: List[BlobURL] = []
+    featured: bool = False
+    legal_status: str
+    orientation: Optional[str] = None
+    road_width: Optional[float] = None
+    created_at: datetime
+    views: int = 0
+    contact_phone: str
+    agent_name: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class NearbyLandSummary(LandSummary):
+    distance_m: Optional[float] = None  # radius searches only
+
+class FacetCount(BaseModel):
+    value: Any
+    count: int
+
+class PriceRangeCount(BaseModel):
+    min: float
+    max: Optional[float] = None  # open-ended top range
+    count: int
+
+class PropertyFacetResults(BaseModel):
+    """Facet counts for the current filters plus the first page of results"""
+    total: int
+    facets: Dict[str, List[FacetCount]]
+    price_ranges: List[PriceRangeCount]
+    results: List[PropertySummary]
+    next_cursor: Optional[str] = None
+
+class LandFacetResults(BaseModel):
+    """Facet counts for the current filters plus the first page of results"""
+    total: int
+    facets: Dict[str, List[FacetCount]]
+    price_ranges: List[PriceRangeCount]
+    results: List[LandSummary]
+    next_cursor: Optional[str] = None
+
 class LandCreate(BaseModel):
     title: str
     description: str
@@ -498,7 +840,7 @@ class User(BaseModel):
     wallet_balance: float = 0.0
     full_name: Optional[str] = None
     phone: Optional[str] = None
-    avatar: Optional[str] = None  # base64
+    avatar: Optional[BlobURL] = None  # base64
     address: Optional[str] = None
     is_active: bool = True
     email_verified: bool = False
@@ -506,6 +848,14 @@ class User(BaseModel):
     last_login: Optional[datetime] = None
     profile_completed: bool = False
 
+class AuthPrincipal(BaseModel):
+    """Slim projection of a user document attached to authenticated requests"""
+    id: str
+    username: str
+    role: UserRole = UserRole.member
+    status: UserStatus = UserStatus.active
+    wallet_balance: float = 0.0
+
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -532,7 +882,7 @@ class UserProfile(BaseModel):
     wallet_balance: float
     full_name: Optional[str] = None
     phone: Optional[str] = None
-    avatar: Optional[str] = None
+    avatar: Optional[BlobURL] = None
     address: Optional[str] = None
     created_at: datetime
     last_login: Optional[datetime] = None
@@ -548,7 +898,7 @@ class Transaction(BaseModel):
     description: str
     reference_id: Optional[str] = None  # For post fees, etc.
     admin_notes: Optional[str] = None
-    transfer_bill: Optional[str] = None  # Base64 encoded image of transfer receipt
+    transfer_bill: Optional[BlobURL] = None  # Base64 encoded image of transfer receipt
     transaction_id: Optional[str] = None  # Bank transaction ID
     method: Optional[str] = None  # Payment method (bank transfer, etc.)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -623,7 +973,7 @@ class MemberPost(BaseModel):
     status: PostStatus = PostStatus.pending
     author_id: str
     price: float
-    images: List[str] = []
+    images: List[BlobURL] = []
     contact_phone: str
     contact_email: Optional[str] = None
     
@@ -705,117 +1055,2276 @@ class PostApproval(BaseModel):
     rejection_reason: Optional[str] = None
     featured: bool = False
 
-# Wallet & Transaction Routes
-@api_router.get("/wallet/balance")
-async def get_wallet_balance(current_user: User = Depends(get_current_user)):
-    """Get user wallet balance"""
-    return {
-        "balance": current_user.wallet_balance,
-        "user_id": current_user.id
-    }
+# Site Statistics Counters
+# The counters collection holds a "site_stats" document and one document per property city.
+# Writes keep them current with atomic $inc; reconcile_counters() corrects drift.
+STATS_COUNTER_ID = "site_stats"
+COUNTERS_RECONCILE_SECONDS = float(os.environ.get('COUNTERS_RECONCILE_SECONDS', '600'))
+CONTENT_TRACKED_FIELDS = {"_id": 0, "id": 1, "status": 1, "city": 1, "published": 1}
+
+def stats_counter_fields(collection_name: str, doc: Optional[dict]) -> Dict[str, int]:
+    """Counter contributions of a single content document"""
+    if not doc:
+        return {}
+    if collection_name == "properties":
+        fields = {"total_properties": 1}
+        if doc.get("status") == "for_sale":
+            fields["properties_for_sale"] = 1
+        elif doc.get("status") == "for_rent":
+            fields["properties_for_rent"] = 1
+        return fields
+    if collection_name == "lands":
+        return {"total_lands": 1}
+    if collection_name == "sims":
+        return {"total_sims": 1}
+    if collection_name == "news_articles":
+        return {"total_news_articles": 1} if doc.get("published") is True else {}
+    if collection_name == "tickets":
+        fields = {"total_tickets": 1}
+        if doc.get("status") == "open":
+            fields["open_tickets"] = 1
+        elif doc.get("status") == "resolved":
+            fields["resolved_tickets"] = 1
+        return fields
+    return {}
+
+def city_counter_id(city: str) -> str:
+    return f"property_city:{city}"
+
+async def bump_city_counter(city: Optional[str], delta: int):
+    if city is None:
+        return
+    await db.counters.update_one(
+        {"_id": city_counter_id(city)},
+        {"$inc": {"count": delta}, "$setOnInsert": {"kind": "property_city", "city": city}},
+        upsert=True
+    )
 
-@api_router.post("/wallet/deposit")
-async def deposit_money(deposit_request: DepositRequest, current_user: User = Depends(get_current_user)):
-    """Request money deposit (requires admin approval)"""
-    if deposit_request.amount <= 0:
-        raise HTTPException(status_code=400, detail="Amount must be greater than 0")
-    
-    # Create transaction record
-    transaction_dict = {
-        "id": str(uuid.uuid4()),
-        "user_id": current_user.id,
-        "amount": deposit_request.amount,
-        "transaction_type": "deposit",
-        "status": "pending",
-        "description": deposit_request.description,
-        "transfer_bill": deposit_request.transfer_bill,
-        "method": "Bank Transfer",
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
+async def record_content_change(collection_name: str, before: Optional[dict], after: Optional[dict]):
+    """Keep derived data in step with a create (before=None), update or delete (after=None)"""
+    before_fields = stats_counter_fields(collection_name, before)
+    after_fields = stats_counter_fields(collection_name, after)
+    deltas = {}
+    for field in set(before_fields) | set(after_fields):
+        delta = after_fields.get(field, 0) - before_fields.get(field, 0)
+        if delta:
+            deltas[field] = delta
+    if deltas:
+        await db.counters.update_one({"_id": STATS_COUNTER_ID}, {"$inc": deltas}, upsert=True)
+    
+    if collection_name == "properties":
+        old_city = before.get("city") if before else None
+        new_city = after.get("city") if after else None
+        if before and after and old_city == new_city:
+            return
+        if before:
+            await bump_city_counter(old_city, -1)
+        if after:
+            await bump_city_counter(new_city, 1)
+
+async def record_content_inserts(collection_name: str, documents: List[dict]):
+    """record_content_change for a batch of created documents, with one $inc per counter document"""
+    deltas = Counter()
+    for document in documents:
+        deltas.update(stats_counter_fields(collection_name, document))
+    if deltas:
+        await db.counters.update_one({"_id": STATS_COUNTER_ID}, {"$inc": dict(deltas)}, upsert=True)
+    if collection_name == "properties":
+        for city, count in Counter(document.get("city") for document in documents).items():
+            await bump_city_counter(city, count)
+
+# Blob Store
+# Uploaded images are stored once, keyed by the SHA-256 of their bytes, and documents only keep
+# "/api/blobs/<sha256>" paths. Bytes live on the filesystem under BLOB_STORE_DIR (sharded by hash
+# prefix) or in GridFS when BLOB_STORE_BACKEND=gridfs; metadata lives in the blobs collection.
+# Responses prefix the paths with BLOB_PUBLIC_BASE_URL, the API origin as seen by browsers (e.g.
+# http://localhost:8001 when the frontend is served from another origin; empty when both share an
+# origin): the BlobURL model fields do it when serializing, endpoints returning raw documents call
+# public_blob_urls. Changing the base (new domain, CDN) therefore needs no data migration, and
+# absolute URLs sent back by clients are stored as paths again.
+BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND', 'filesystem')  # "filesystem" or "gridfs"
+BLOB_STORE_DIR = Path(os.environ.get('BLOB_STORE_DIR', str(ROOT_DIR / 'blobs')))
+BLOB_URL_PREFIX = "/api/blobs/"
+BLOB_PUBLIC_BASE_URL = os.environ.get('BLOB_PUBLIC_BASE_URL', '').rstrip('/')
+# Moving base64 images already stored in documents into the blob store is opt-in
+BLOB_MIGRATE_INLINE_IMAGES = os.environ.get('BLOB_MIGRATE_INLINE_IMAGES', 'false').lower() == 'true'
+BLOB_CHUNK_BYTES = 256 * 1024
+BLOB_GRIDFS_BUCKET = "blob_data"
+BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+DATA_URL_PATTERN = re.compile(r"^data:([\w.+-]+/[\w.+-]+);base64,(.*)$", re.DOTALL)
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+# Fields that may hold an image URL (or a list of them), per collection
+INLINE_IMAGE_FIELDS = {
+    "properties": ["images"],
+    "lands": ["images"],
+    "member_posts": ["images"],
+    "news_articles": ["featured_image"],
+    "users": ["avatar"],
+    "site_settings": ["logo_url", "favicon_url", "banner_image", "bank_qr_code"],
+    "transactions": ["transfer_bill", "bank_transfer_image"],
+}
+
+class FilesystemBlobBackend:
+    def __init__(self, root: Path):
+        self.root = root
+    
+    def path_for(self, blob_id: str) -> Path:
+        return self.root / blob_id[:2] / blob_id[2:4] / blob_id
+    
+    async def exists(self, blob_id: str) -> bool:
+        return await asyncio.to_thread(self.path_for(blob_id).exists)
+    
+    async def put(self, blob_id: str, spooled_path: Path):
+        target = self.path_for(blob_id)
+        def move():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(spooled_path, target)
+        await asyncio.to_thread(move)
+    
+    async def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        handle = await asyncio.to_thread(open, self.path_for(blob_id), "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(handle.read, BLOB_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(handle.close)
+
+class GridFSBlobBackend:
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        return AsyncIOMotorGridFSBucket(db, bucket_name=BLOB_GRIDFS_BUCKET, chunk_size_bytes=BLOB_CHUNK_BYTES)
+    
+    async def exists(self, blob_id: str) -> bool:
+        return await db[f"{BLOB_GRIDFS_BUCKET}.files"].count_documents({"_id": blob_id}, limit=1) > 0
+    
+    async def put(self, blob_id: str, spooled_path: Path):
+        handle = await asyncio.to_thread(open, spooled_path, "rb")
+        try:
+            await self.bucket().upload_from_stream_with_id(blob_id, blob_id, handle)
+        finally:
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(spooled_path.unlink, missing_ok=True)
+    
+    async def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket().open_download_stream(blob_id)
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+blob_backend = GridFSBlobBackend() if BLOB_STORE_BACKEND == "gridfs" else FilesystemBlobBackend(BLOB_STORE_DIR)
+
+def blob_url(blob_id: str) -> str:
+    """Stored form of a blob's URL; responses make it absolute with public_blob_url"""
+    return f"{BLOB_URL_PREFIX}{blob_id}"
+
+def public_blob_urls(collection_name: str, document: dict) -> dict:
+    """public_blob_url for the image fields of a raw document returned by an endpoint, in place"""
+    for field in INLINE_IMAGE_FIELDS.get(collection_name, []):
+        value = document.get(field)
+        if isinstance(value, list):
+            document[field] = [public_blob_url(item) for item in value]
+        elif value is not None:
+            document[field] = public_blob_url(value)
+    return document
+
+async def upload_file_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(BLOB_CHUNK_BYTES)
+        if not chunk:
+            break
+        yield chunk
+
+async def single_chunk(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+async def store_blob(chunks: AsyncIterator[bytes], content_type: str, max_bytes: Optional[int] = None,
+                     metadata: Optional[dict] = None) -> dict:
+    """Spool a byte stream to disk while hashing it, then store it under its SHA-256 (deduplicated)"""
+    spool_dir = BLOB_STORE_DIR / "tmp"
+    await asyncio.to_thread(spool_dir.mkdir, parents=True, exist_ok=True)
+    spooled_path = spool_dir / f"{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    
+    handle = await asyncio.to_thread(open, spooled_path, "wb")
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise HTTPException(status_code=400, detail=f"File size too large (max {max_bytes // (1024 * 1024)}MB)")
+            digest.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        await asyncio.to_thread(spooled_path.unlink, missing_ok=True)
+        raise
+    await asyncio.to_thread(handle.close)
     
-    await db.transactions.insert_one(transaction_dict)
+    blob_id = digest.hexdigest()
+    if await blob_backend.exists(blob_id):
+        await asyncio.to_thread(spooled_path.unlink, missing_ok=True)
+    else:
+        await blob_backend.put(blob_id, spooled_path)
+    update = {"$setOnInsert": {
+        "id": blob_id,
+        "content_type": content_type,
+        "size": size,
+        "backend": BLOB_STORE_BACKEND,
+        "created_at": datetime.utcnow()
+    }}
+    if metadata:
+        update["$set"] = metadata
+    await db.blobs.update_one({"id": blob_id}, update, upsert=True)
+    return {"blob_id": blob_id, "url": blob_url(blob_id), "content_type": content_type, "size": size}
+
+async def externalize_image(value):
+    """Move a base64 data: URL into the blob store and return its blob URL; other values are returned as is"""
+    if isinstance(value, str) and BLOB_PUBLIC_BASE_URL and value.startswith(f"{BLOB_PUBLIC_BASE_URL}{BLOB_URL_PREFIX}"):
+        # A URL we served, sent back unchanged: store the path
+        return value[len(BLOB_PUBLIC_BASE_URL):]
+    if not isinstance(value, str) or not value.startswith("data:"):
+        return value
+    match = DATA_URL_PATTERN.match(value)
+    if not match:
+        return value
+    try:
+        data = base64.b64decode(match.group(2), validate=False)
+    except ValueError:
+        return value
+    if match.group(1) not in IMAGE_UPLOAD_CONTENT_TYPES.values():
+        return value
+    try:
+        stored = await ingest_image(data)
+    except HTTPException:
+        # Not an image Pillow can decode: keep the value rather than serve arbitrary bytes from our origin
+        return value
+    return stored["url"]
+
+async def externalize_inline_images(collection_name: str, document: dict) -> dict:
+    """Replace inline base64 images in a document (or $set payload) with blob URLs, in place"""
+    for field in INLINE_IMAGE_FIELDS.get(collection_name, []):
+        value = document.get(field)
+        if isinstance(value, list):
+            document[field] = [await externalize_image(item) for item in value]
+        elif value is not None:
+            document[field] = await externalize_image(value)
+    return document
+
+async def migrate_inline_images():
+    """Background task: move base64 images already stored in documents into the blob store (resumable)"""
+    for collection_name, fields in INLINE_IMAGE_FIELDS.items():
+        moved = 0
+        try:
+            cursor = db[collection_name].find(
+                {"$or": [{field: {"$regex": "^data:"}} for field in fields]},
+                {"_id": 1, **{field: 1 for field in fields}}
+            )
+            async for document in cursor:
+                original = {field: document[field] for field in fields if field in document}
+                converted = await externalize_inline_images(collection_name, dict(original))
+                changes = {field: value for field, value in converted.items() if value != original[field]}
+                if changes:
+                    update = {"$set": changes}
+                    if collection_name == "site_settings":
+                        # Cached by version in every worker
+                        update["$inc"] = {"version": 1}
+                    await db[collection_name].update_one({"_id": document["_id"]}, update)
+                    moved += 1
+        except Exception as e:
+            logger.error(f"Error migrating inline images in {collection_name}: {str(e)}")
+        if moved:
+            await bump_content_generation(FORMAT_GENERATION)
+            logger.info(f"Moved inline images of {moved} {collection_name} documents into the blob store")
+
+# Image Derivatives
+# Uploaded images are decoded on the image pool: EXIF is dropped (after applying its orientation),
+# the original is capped at IMAGE_MAX_DIMENSION, and a "thumb" (cropped to the listing card size)
+# and a "medium" variant are encoded as IMAGE_VARIANT_FORMAT. Variant blob ids are recorded on the
+# original's blob metadata so list endpoints can swap image URLs for thumbnails.
+# IMAGE_PROCESS_EXECUTOR: "process" (default), "thread" or "inline"
+IMAGE_PROCESS_EXECUTOR = os.environ.get('IMAGE_PROCESS_EXECUTOR', 'process')
+IMAGE_PROCESS_WORKERS = int(os.environ.get('IMAGE_PROCESS_WORKERS', str(min(4, os.cpu_count() or 1))))
+IMAGE_PROCESS_QUEUE_LIMIT = int(os.environ.get('IMAGE_PROCESS_QUEUE_LIMIT', str(IMAGE_PROCESS_WORKERS * 4)))
+IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', '2560'))
+IMAGE_VARIANT_FORMAT = os.environ.get('IMAGE_VARIANT_FORMAT', 'WEBP').upper()  # "WEBP" or "JPEG"
+IMAGE_VARIANTS = {
+    "thumb": {"size": (400, 300), "crop": True, "quality": 75},
+    "medium": {"size": (1200, 1200), "crop": False, "quality": 80},
+}
+IMAGE_VARIANT_PATTERN = "^(thumb|medium)$"
+IMAGE_FORMAT_CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+# Formats accepted at all; GIF and animations are stored as uploaded, the others are re-encoded
+IMAGE_UPLOAD_CONTENT_TYPES = {**IMAGE_FORMAT_CONTENT_TYPES, "GIF": "image/gif"}
+IMAGE_VARIANT_CACHE_MAX_ENTRIES = 10000
+
+if IMAGE_PROCESS_EXECUTOR == "process":
+    image_executor = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+elif IMAGE_PROCESS_EXECUTOR == "thread":
+    image_executor = ThreadPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS, thread_name_prefix="images")
+else:
+    image_executor = None
+
+image_jobs_in_flight = 0
+
+async def run_image_job(func, *args):
+    """Run an image job on the image pool, rejecting with 503 when the queue is full"""
+    global image_jobs_in_flight
+    if image_executor is None:
+        return func(*args)
+    
+    if image_jobs_in_flight >= IMAGE_PROCESS_WORKERS + IMAGE_PROCESS_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"}
+        )
     
+    image_jobs_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(image_executor, func, *args)
+    finally:
+        image_jobs_in_flight -= 1
+
+def encode_image(image: Image.Image, image_format: str, quality: int) -> dict:
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    options = {"quality": quality} if image_format != "PNG" else {"optimize": True}
+    if image.info.get("icc_profile"):
+        options["icc_profile"] = image.info["icc_profile"]
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
     return {
-        "message": "Deposit request created successfully. Waiting for admin approval.",
-        "transaction_id": transaction_dict["id"],
-        "amount": deposit_request.amount
+        "data": output.getvalue(),
+        "content_type": IMAGE_FORMAT_CONTENT_TYPES[image_format],
+        "width": image.width,
+        "height": image.height
     }
 
-@api_router.get("/wallet/transactions", response_model=List[Transaction])
-async def get_user_transactions(
-    current_user: User = Depends(get_current_user),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, le=100),
-    transaction_type: Optional[TransactionType] = None
-):
-    """Get user transaction history"""
-    filter_query = {"user_id": current_user.id}
-    if transaction_type:
-        filter_query["transaction_type"] = transaction_type
-    
-    transactions = await db.transactions.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    return [Transaction(**txn) for txn in transactions]
+def render_image_variants(data: bytes, include_original: bool = True) -> dict:
+    """Decode an image and render its stripped original and variants (runs on the image pool).
+    
+    The result always holds the content type of the detected format; animations and GIFs are only
+    decoded, not rendered. Raises ValueError for formats outside IMAGE_UPLOAD_CONTENT_TYPES."""
+    with Image.open(io.BytesIO(data)) as source:
+        source_format = source.format
+        if source_format not in IMAGE_UPLOAD_CONTENT_TYPES:
+            raise ValueError(f"Unsupported image format {source_format}")
+        rendered = {"content_type": IMAGE_UPLOAD_CONTENT_TYPES[source_format]}
+        if source_format not in IMAGE_FORMAT_CONTENT_TYPES or getattr(source, "is_animated", False):
+            source.load()
+            return rendered
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    if image.mode not in ("RGB", "RGBA", "L", "LA"):
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+    
+    if include_original:
+        if max(image.size) > IMAGE_MAX_DIMENSION:
+            image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+        rendered["original"] = encode_image(image, source_format, 90)
+    for name, spec in IMAGE_VARIANTS.items():
+        if spec["crop"]:
+            variant = ImageOps.fit(image, spec["size"], Image.LANCZOS)
+        else:
+            variant = image.copy()
+            variant.thumbnail(spec["size"], Image.LANCZOS)
+        rendered[name] = encode_image(variant, IMAGE_VARIANT_FORMAT, spec["quality"])
+    return rendered
 
-# Admin Transaction Management Routes
-@api_router.get("/admin/transactions", response_model=List[Transaction])
-async def get_all_transactions(
-    current_admin: User = Depends(get_current_admin),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, le=200),
-    status: Optional[TransactionStatus] = None,
-    transaction_type: Optional[TransactionType] = None
-):
-    """Get all transactions - Admin only"""
-    filter_query = {}
-    if status:
-        filter_query["status"] = status
-    if transaction_type:
-        filter_query["transaction_type"] = transaction_type
+async def render_image(data: bytes, include_original: bool = True) -> dict:
+    try:
+        return await run_image_job(render_image_variants, data, include_original)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+        raise HTTPException(status_code=400, detail="File is not a valid image")
+
+async def store_image_variants(rendered: dict) -> Dict[str, str]:
+    """Store rendered variants, returning {variant name: blob id}"""
+    variants = {}
+    for name in IMAGE_VARIANTS:
+        stored = await store_blob(
+            single_chunk(rendered[name]["data"]),
+            rendered[name]["content_type"],
+            metadata={"variants": {}, "width": rendered[name]["width"], "height": rendered[name]["height"]}
+        )
+        variants[name] = stored["blob_id"]
+    return variants
+
+async def ingest_image(data: bytes) -> dict:
+    """Process an uploaded image and store the stripped original and its variants"""
+    rendered = await render_image(data)
+    if "original" not in rendered:
+        return {**await store_blob(single_chunk(data), rendered["content_type"], metadata={"variants": {}}), "variants": {}}
+    
+    variants = await store_image_variants(rendered)
+    original = rendered["original"]
+    stored = await store_blob(
+        single_chunk(original["data"]),
+        original["content_type"],
+        metadata={"variants": variants, "width": original["width"], "height": original["height"]}
+    )
+    return {**stored, "variants": {name: blob_url(blob_id) for name, blob_id in variants.items()}}
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """Read an upload in chunks, rejecting it as soon as it exceeds max_bytes"""
+    chunks = []
+    size = 0
+    async for chunk in upload_file_chunks(file):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=400, detail=f"File size too large (max {max_bytes // (1024 * 1024)}MB)")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+async def backfill_image_variants():
+    """Derive variants for image blobs stored before the pipeline existed"""
+    processed = 0
+    async for blob in db.blobs.find({"variants": {"$exists": False}, "content_type": {"$regex": "^image/"}}, {"_id": 0, "id": 1}):
+        try:
+            data = b"".join([chunk async for chunk in blob_backend.stream(blob["id"])])
+            rendered = await render_image(data, include_original=False)
+            variants = await store_image_variants(rendered) if "thumb" in rendered else {}
+        except HTTPException:
+            variants = {}
+        except Exception as e:
+            logger.error(f"Error deriving image variants for blob {blob['id']}: {str(e)}")
+            continue
+        await db.blobs.update_one({"id": blob["id"]}, {"$set": {"variants": variants}})
+        processed += 1
+    if processed:
+        await bump_content_generation(FORMAT_GENERATION)
+        logger.info(f"Derived image variants for {processed} stored blobs")
+
+async def image_maintenance():
+    """Background task: (if enabled) move inline base64 images into the blob store, then derive missing variants"""
+    if BLOB_MIGRATE_INLINE_IMAGES:
+        await migrate_inline_images()
+    try:
+        await backfill_image_variants()
+    except Exception as e:
+        logger.error(f"Error backfilling image variants: {str(e)}")
+
+# Variants of a blob never change once recorded, so lookups are cached without expiry
+image_variant_cache: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+
+async def lookup_image_variants(blob_ids: List[str]) -> Dict[str, Dict[str, str]]:
+    missing = [blob_id for blob_id in set(blob_ids) if blob_id not in image_variant_cache]
+    if missing:
+        async for blob in db.blobs.find({"id": {"$in": missing}, "variants": {"$exists": True}}, {"_id": 0, "id": 1, "variants": 1}):
+            image_variant_cache[blob["id"]] = blob["variants"]
+        while len(image_variant_cache) > IMAGE_VARIANT_CACHE_MAX_ENTRIES:
+            image_variant_cache.popitem(last=False)
+    return {blob_id: image_variant_cache[blob_id] for blob_id in blob_ids if blob_id in image_variant_cache}
+
+def blob_id_from_url(url: str) -> Optional[str]:
+    """Blob id of a blob URL, with or without a public base"""
+    if isinstance(url, str) and BLOB_URL_PREFIX in url:
+        base, blob_id = url.rsplit(BLOB_URL_PREFIX, 1)
+        if base in ("", BLOB_PUBLIC_BASE_URL) and BLOB_ID_PATTERN.match(blob_id):
+            return blob_id
+    return None
+
+async def apply_image_variant(documents: List[dict], variant: Optional[str]) -> List[dict]:
+    """Replace each document's images with the requested variant of its first image (for list views)"""
+    if not variant:
+        return documents
+    first_images = [document["images"][0] for document in documents if document.get("images")]
+    known = await lookup_image_variants([blob_id for blob_id in map(blob_id_from_url, first_images) if blob_id])
+    for document in documents:
+        if document.get("images"):
+            first_image = document["images"][0]
+            variant_id = known.get(blob_id_from_url(first_image), {}).get(variant)
+            document["images"] = [blob_url(variant_id) if variant_id else first_image]
+    return documents
+
+# Keyset Pagination
+# List endpoints accept an opaque `cursor` (returned in the X-Next-Cursor header) encoding the last
+# document's sort value and id. The next page starts strictly after that (value, id) pair, so deep
+# pages cost the same as the first one. `skip` still works but is ignored when a cursor is given.
+# sort_by is limited to the scalar fields listed per collection, and cursor values must be scalars.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CURSOR_VALUE_TYPES = (str, int, float, bool, datetime, type(None))
+LISTING_SORT_FIELDS = ("created_at", "updated_at", "price", "price_per_sqm", "area", "views")
+PROPERTY_SORT_PATTERN = f"^({'|'.join(LISTING_SORT_FIELDS + ('bedrooms', 'bathrooms'))})$"
+LAND_SORT_PATTERN = f"^({'|'.join(LISTING_SORT_FIELDS)})$"
+SIM_SORT_PATTERN = "^(created_at|updated_at|price|views)$"
+
+def keyset_sort(sort_by: str, sort_order: int) -> List[tuple]:
+    """Sort on the requested field with id as tiebreaker, so every position is unique"""
+    return [(sort_by, sort_order), ("id", sort_order)]
+
+def encode_cursor(sort_by: str, sort_order: int, document: dict) -> str:
+    value = document.get(sort_by)
+    payload = {"f": sort_by, "o": sort_order, "id": document["id"]}
+    if isinstance(value, datetime):
+        payload["d"] = value.isoformat()
+    else:
+        payload["v"] = value
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: int) -> tuple:
+    """Return (sort value, id) from a cursor, rejecting cursors issued for another sort"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value = datetime.fromisoformat(payload["d"]) if "d" in payload else payload["v"]
+        cursor_sort, cursor_order, last_id = payload["f"], payload["o"], payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Anything else (an object such as {"$ne": null}) would end up as a query operator
+    if not isinstance(value, CURSOR_VALUE_TYPES) or not isinstance(last_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort_by or cursor_order != sort_order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by/order")
+    return value, last_id
+
+def keyset_query(filter_query: dict, sort_by: str, sort_order: int, cursor: Optional[str]) -> dict:
+    """Add the "after cursor" condition to a filter"""
+    if not cursor:
+        return filter_query
+    value, last_id = decode_cursor(cursor, sort_by, sort_order)
+    id_after = {"$lt" if sort_order == -1 else "$gt": last_id}
+    if value is None:
+        # Missing values sort before everything else
+        after = {"$or": [{sort_by: None, "id": id_after}]}
+        if sort_order == 1:
+            after["$or"].append({sort_by: {"$ne": None}})
+    else:
+        after = {"$or": [
+            {sort_by: {"$lt" if sort_order == -1 else "$gt": value}},
+            {sort_by: value, "id": id_after}
+        ]}
+        if sort_order == -1:
+            after["$or"].append({sort_by: None})
+    return {"$and": [filter_query, after]} if filter_query else after
+
+def set_next_cursor(response: Response, documents: List[dict], limit: int, sort_by: str, sort_order: int):
+    """Expose the cursor of the next page when this page is full"""
+    if documents and len(documents) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_by, sort_order, documents[-1])
+
+# Listing Summaries
+# Public list endpoints only fetch what a listing card shows: the summary model's fields, the first
+# image and the first SUMMARY_DESCRIPTION_CHARS characters of the description. Detail endpoints
+# still return full documents.
+SUMMARY_DESCRIPTION_CHARS = 200
+
+def summary_projection(model) -> dict:
+    projection = {"_id": 0, **{field: 1 for field in model.model_fields}}
+    description = {"$ifNull": ["$description", ""]}
+    # One extra character tells us whether the description was cut
+    projection["description"] = {"$substrCP": [description, 0, SUMMARY_DESCRIPTION_CHARS + 1]}
+    projection["images"] = {"$slice": [{"$ifNull": ["$images", []]}, 1]}
+    return projection
+
+PROPERTY_SUMMARY_PROJECTION = summary_projection(PropertySummary)
+LAND_SUMMARY_PROJECTION = summary_projection(LandSummary)
+
+async def find_listing_summaries(collection_name: str, projection: dict, filter_query: dict,
+                                 sort: Optional[List[tuple]] = None, skip: int = 0, limit: int = 20,
+                                 image_variant: Optional[str] = None, near: Optional[dict] = None) -> List[dict]:
+    """Run a list query with the summary projection and swap the first image for its variant (thumb by default).
+    
+    With `near` ($geoNear near/maxDistance) documents come nearest first with their distance_m.
+    """
+    if near:
+        pipeline = [{"$geoNear": {**near, "query": filter_query, "key": "location", "distanceField": "distance_m", "spherical": True}}]
+        projection = {**projection, "distance_m": 1}
+    else:
+        pipeline = [{"$match": filter_query}]
+    pipeline += summary_page_stages(projection, sort, skip, limit)
+    documents = await db[collection_name].aggregate(pipeline).to_list(limit)
+    return await finish_listing_summaries(documents, image_variant)
+
+def summary_page_stages(projection: dict, sort: Optional[List[tuple]], skip: int, limit: int) -> List[dict]:
+    stages = []
+    if sort:
+        sort = dict(sort)
+        stages.append({"$sort": sort})
+        # Keep the sort fields, cursors are built from them
+        projection = {**projection, **{field: 1 for field in sort if field not in projection}}
+    if skip:
+        stages.append({"$skip": skip})
+    return stages + [{"$limit": limit}, {"$project": projection}]
+
+async def finish_listing_summaries(documents: List[dict], image_variant: Optional[str]) -> List[dict]:
+    for document in documents:
+        if len(document["description"]) > SUMMARY_DESCRIPTION_CHARS:
+            document["description"] = document["description"][:SUMMARY_DESCRIPTION_CHARS].rstrip() + "…"
+    return await apply_image_variant(documents, image_variant or "thumb")
+
+# Listing Search Index
+# search_postings is an inverted index over properties and lands: one posting per (document, token)
+# with a score from the weights of the fields the token appears in. Text is folded to plain ASCII
+# (diacritics removed, đ -> d) on both sides, so "quan 1" finds "Quận 1". Postings are maintained by
+# the content write helpers with idempotent upserts (concurrent writers of the same document cannot
+# collide); a rebuild runs at startup when SEARCH_INDEX_FORMAT changes, and until it finishes searches
+# fall back to a (escaped) regex scan. A search starts from the documents of its rarest term, so its
+# cost follows that term's frequency rather than the most common one's.
+SEARCH_COLLECTIONS = ("properties", "lands")
+SEARCH_FIELD_WEIGHTS = {"title": 5.0, "district": 3.0, "city": 3.0, "address": 2.0, "description": 1.0}
+SEARCH_INDEX_STATE_ID = "search_index_state"
+SEARCH_INDEX_FORMAT = 1  # bump to rebuild the postings at next startup
+SEARCH_REBUILD_CHUNK = 500
+SEARCH_MAX_TERMS = 8
+SEARCH_PREFIX_MIN_CHARS = 2  # the last query term also matches as a prefix (search as you type)
+SEARCH_STATE_CHECK_SECONDS = 30
+SEARCH_CANDIDATE_CAP = 5000  # a term on more postings than this is not used to narrow a search
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+SEARCH_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def fold_vietnamese(text: str) -> str:
+    """Lowercase and strip Vietnamese diacritics, e.g. Quận Đống Đa -> quan dong da"""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if unicodedata.category(char) != "Mn").lower()
+
+def search_tokens(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return SEARCH_TOKEN_PATTERN.findall(fold_vietnamese(HTML_TAG_PATTERN.sub(" ", text)))
+
+def search_postings_for(collection_name: str, document: dict) -> List[dict]:
+    scores = {}
+    for field, weight in SEARCH_FIELD_WEIGHTS.items():
+        for token in set(search_tokens(document.get(field))):
+            scores[token] = scores.get(token, 0.0) + weight
+    return [
+        {"_id": f"{collection_name}:{document['id']}:{token}", "collection": collection_name,
+         "doc_id": document["id"], "token": token, "score": score}
+        for token, score in scores.items()
+    ]
+
+async def index_search_document(collection_name: str, document: dict):
+    """(Re)index one document from its full search fields"""
+    if collection_name in SEARCH_COLLECTIONS:
+        await write_search_chunk(collection_name, [document])
+
+async def reindex_search_document(collection_name: str, doc_id: str, update_data: dict):
+    """Reindex a document after an update that touched a searchable field"""
+    if collection_name not in SEARCH_COLLECTIONS or not SEARCH_FIELD_WEIGHTS.keys() & update_data.keys():
+        return
+    document = await db[collection_name].find_one({"id": doc_id}, {"_id": 0, "id": 1, **{field: 1 for field in SEARCH_FIELD_WEIGHTS}})
+    if document:
+        await index_search_document(collection_name, document)
+
+async def remove_search_document(collection_name: str, doc_id: str):
+    if collection_name in SEARCH_COLLECTIONS:
+        await db.search_postings.delete_many({"collection": collection_name, "doc_id": doc_id})
+
+async def rebuild_search_index():
+    """Background task: rebuild the postings of every searchable collection"""
+    try:
+        await db.counters.update_one(
+            {"_id": SEARCH_INDEX_STATE_ID},
+            {"$set": {"status": "running", "format": SEARCH_INDEX_FORMAT}},
+            upsert=True
+        )
+        for collection_name in SEARCH_COLLECTIONS:
+            await db.search_postings.delete_many({"collection": collection_name})
+            cursor = db[collection_name].find({}, {"_id": 0, "id": 1, **{field: 1 for field in SEARCH_FIELD_WEIGHTS}})
+            chunk = []
+            async for document in cursor:
+                chunk.append(document)
+                if len(chunk) >= SEARCH_REBUILD_CHUNK:
+                    await write_search_chunk(collection_name, chunk)
+                    chunk = []
+            await write_search_chunk(collection_name, chunk)
+        await db.counters.update_one(
+            {"_id": SEARCH_INDEX_STATE_ID},
+            {"$set": {"status": "done", "completed_at": datetime.utcnow()}}
+        )
+        search_index_state["checked_at"] = 0.0
+        logger.info("Search index rebuild completed")
+    except Exception as e:
+        logger.error(f"Error rebuilding search index: {str(e)}")
+
+async def write_search_chunk(collection_name: str, documents: List[dict]):
+    """Upsert the postings of documents, then drop the tokens they no longer contain"""
+    if not documents:
+        return
+    # Posting ids are deterministic, so documents indexed twice at once (an update during the rebuild,
+    # two updates of one listing) replace each other's postings instead of failing on duplicate keys
+    postings = [posting for document in documents for posting in search_postings_for(collection_name, document)]
+    if postings:
+        await db.search_postings.bulk_write([ReplaceOne({"_id": posting["_id"]}, posting, upsert=True) for posting in postings], ordered=False)
+    await db.search_postings.delete_many({
+        "collection": collection_name,
+        "doc_id": {"$in": [document["id"] for document in documents]},
+        "_id": {"$nin": [posting["_id"] for posting in postings]}
+    })
+
+async def search_index_needs_rebuild() -> bool:
+    state = await db.counters.find_one({"_id": SEARCH_INDEX_STATE_ID})
+    return not (state and state.get("status") == "done" and state.get("format") == SEARCH_INDEX_FORMAT)
+
+search_index_state = {"ready": False, "checked_at": 0.0}
+
+async def search_index_ready() -> bool:
+    """Whether the postings are complete (checked at most every SEARCH_STATE_CHECK_SECONDS)"""
+    now = time.monotonic()
+    if not search_index_state["ready"] and now - search_index_state["checked_at"] > SEARCH_STATE_CHECK_SECONDS:
+        search_index_state["checked_at"] = now
+        search_index_state["ready"] = not await search_index_needs_rebuild()
+    return search_index_state["ready"]
+
+async def search_ranked_ids(collection_name: str, q: str, skip: int, limit: int) -> List[str]:
+    """Ids of the documents matching every query term, best score first"""
+    terms = list(dict.fromkeys(search_tokens(q)))[:SEARCH_MAX_TERMS]
+    if not terms:
+        return []
+    last_term = terms[-1]
+    prefix = len(last_term) >= SEARCH_PREFIX_MIN_CHARS
+    token_match = {"token": {"$in": terms}}
+    if prefix:
+        token_match = {"$or": [token_match, {"token": {"$regex": f"^{re.escape(last_term)}"}}]}
+    is_exact = {"$in": ["$token", terms]}
+    match = {"collection": collection_name, **token_match}
+    
+    if len(terms) > 1:
+        # Every result contains every term: start from the documents of the rarest one
+        term_filters = [{"collection": collection_name, "token": term} for term in terms]
+        if prefix:
+            term_filters[-1]["token"] = {"$regex": f"^{re.escape(last_term)}"}
+        frequencies = await asyncio.gather(*[
+            db.search_postings.count_documents(term_filter, limit=SEARCH_CANDIDATE_CAP) for term_filter in term_filters
+        ])
+        rarest = min(range(len(terms)), key=lambda index: frequencies[index])
+        if frequencies[rarest] == 0:
+            return []
+        if frequencies[rarest] < SEARCH_CANDIDATE_CAP:
+            match["doc_id"] = {"$in": await db.search_postings.distinct("doc_id", term_filters[rarest])}
     
-    transactions = await db.transactions.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    return [Transaction(**txn) for txn in transactions]
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "doc_id": 1,
+            # Prefix matches count for the last term at half weight
+            "term": {"$cond": [is_exact, "$token", last_term]},
+            "score": {"$cond": [is_exact, "$score", {"$multiply": ["$score", 0.5]}]}
+        }},
+        {"$group": {"_id": "$doc_id", "score": {"$sum": "$score"}, "terms": {"$addToSet": "$term"}}},
+        {"$match": {"terms": {"$size": len(terms)}}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit}
+    ]
+    return [hit["_id"] for hit in await db.search_postings.aggregate(pipeline).to_list(limit)]
+
+async def search_listings(collection_name: str, projection: dict, q: str, skip: int, limit: int) -> List[dict]:
+    """Ranked, accent-insensitive search returning listing summaries"""
+    if await search_index_ready():
+        ids = await search_ranked_ids(collection_name, q, skip, limit)
+        if not ids:
+            return []
+        documents = await find_listing_summaries(collection_name, projection, {"id": {"$in": ids}}, limit=len(ids))
+        rank = {doc_id: position for position, doc_id in enumerate(ids)}
+        return sorted(documents, key=lambda document: rank[document["id"]])
+    
+    pattern = re.escape(q)
+    search_query = {"$or": [{field: {"$regex": pattern, "$options": "i"}} for field in SEARCH_FIELD_WEIGHTS]}
+    return await find_listing_summaries(collection_name, projection, search_query, skip=skip, limit=limit)
+
+# SIM Number Index
+# Sims carry precomputed number keys so digit searches are index lookups instead of regex scans:
+# number_digits (normalized, "+84..." -> "0..."), number_reversed (tail searches become prefix
+# matches), number_ngrams (every 2-4 digit substring, for "contains") and number_patterns (the
+# "số đẹp" classes of the number's tail). Keys are set by the content write helpers; sims written
+# before SIM_NUMBER_INDEX_FORMAT are backfilled at startup.
+SIM_NUMBER_INDEX_FORMAT = 1  # bump to recompute the keys of every sim at next startup
+SIM_NGRAM_SIZES = (2, 3, 4)
+SIM_BACKFILL_CHUNK = 500
+SIM_PATTERN_CLASSES = {
+    "tu_quy": "Tứ quý",
+    "tam_hoa": "Tam hoa",
+    "loc_phat": "Lộc phát",
+    "than_tai": "Thần tài",
+    "ong_dia": "Ông địa",
+    "taxi": "Taxi",
+    "tien_len": "Tiến lên",
+    "guong": "Gương",
+    "nam_sinh": "Năm sinh",
+}
+SIM_PATTERN_CLASS_PATTERN = f"^({'|'.join(SIM_PATTERN_CLASSES)})$"
+SIM_WILDCARD_PATTERN = re.compile(r"^[0-9*?xX]+$")
+SIM_BIRTH_YEARS = (1950, 2030)
+
+def sim_number_digits(phone_number: Optional[str]) -> str:
+    digits = re.sub(r"\D", "", phone_number or "")
+    if digits.startswith("84") and len(digits) == 11:
+        digits = "0" + digits[2:]
+    return digits
+
+def is_birthday(day: str, month: str, year: int) -> bool:
+    try:
+        datetime(year, int(month), int(day))
+    except ValueError:
+        return False
+    return SIM_BIRTH_YEARS[0] <= year <= SIM_BIRTH_YEARS[1]
+
+def sim_pattern_classes(digits: str) -> List[str]:
+    """Pattern classes of a number, judged on its tail like buyers do"""
+    classes = []
+    if re.search(r"(\d)\1{3}$", digits):
+        classes.append("tu_quy")
+    elif re.search(r"(\d)\1{2}$", digits):
+        classes.append("tam_hoa")
+    if digits.endswith(("68", "86")):
+        classes.append("loc_phat")
+    if digits.endswith(("39", "79")):
+        classes.append("than_tai")
+    if digits.endswith(("38", "78")):
+        classes.append("ong_dia")
+    # Repeated blocks: AB.AB.AB, ABC.ABC, ABCD.ABCD (not a single repeated digit)
+    if any(len(digits) >= size * repeats and digits[-size * repeats:] == digits[-size:] * repeats
+           and len(set(digits[-size:])) > 1 for size, repeats in ((2, 3), (3, 2), (4, 2))):
+        classes.append("taxi")
+    # Ascending run of 4+ digits, e.g. 1234, 3456
+    tail = digits[-4:]
+    if len(tail) == 4 and all(int(tail[i + 1]) - int(tail[i]) == 1 for i in range(3)):
+        classes.append("tien_len")
+    # Mirror tails: ABBA, ABCCBA
+    if any(len(digits) >= size and digits[-size:] == digits[-size:][::-1] and len(set(digits[-size:])) > 1
+           for size in (4, 6)):
+        classes.append("guong")
+    # Birth year (...1990), ddmmyy (...150890) or ddmmyyyy (...15081990)
+    if (len(digits) >= 4 and SIM_BIRTH_YEARS[0] <= int(digits[-4:]) <= SIM_BIRTH_YEARS[1]) \
+            or (len(digits) >= 8 and is_birthday(digits[-8:-6], digits[-6:-4], int(digits[-4:]))) \
+            or (len(digits) >= 6 and any(is_birthday(digits[-6:-4], digits[-4:-2], century + int(digits[-2:]))
+                                          for century in (1900, 2000))):
+        classes.append("nam_sinh")
+    return classes
+
+def sim_number_ngrams(digits: str) -> List[str]:
+    return sorted({digits[i:i + size] for size in SIM_NGRAM_SIZES for i in range(len(digits) - size + 1)})
+
+def sim_number_fields(phone_number: Optional[str]) -> dict:
+    digits = sim_number_digits(phone_number)
+    return {
+        "number_digits": digits,
+        "number_reversed": digits[::-1],
+        "number_ngrams": sim_number_ngrams(digits),
+        "number_patterns": sim_pattern_classes(digits),
+        "number_index_format": SIM_NUMBER_INDEX_FORMAT
+    }
 
-@api_router.put("/admin/transactions/{transaction_id}/approve")
-async def approve_transaction(
-    transaction_id: str,
-    current_admin: User = Depends(get_current_admin)
-):
-    """Approve transaction and update user balance - Admin only"""
-    transaction = await db.transactions.find_one({"id": transaction_id})
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
+def with_sim_number_index(collection_name: str, data: dict) -> dict:
+    """Add the number keys to a sim document (or $set data) that carries a phone_number"""
+    if collection_name == "sims" and data.get("phone_number"):
+        data.update(sim_number_fields(data["phone_number"]))
+    return data
+
+def sim_segment_ngrams(segment: str) -> List[str]:
+    """Index keys every number containing this literal digit run must have"""
+    if len(segment) < SIM_NGRAM_SIZES[0]:
+        return []
+    size = min(len(segment), SIM_NGRAM_SIZES[-1])
+    return [segment[i:i + size] for i in range(len(segment) - size + 1)]
+
+def sim_pattern_query(pattern: str) -> dict:
+    """Filter for a wildcard number pattern: * is any run of digits, ? or x is one digit.
+    
+    The pattern covers the whole number: "*6868" is a tail, "09*68*8" a head, middle and tail. The
+    anchored regex on number_digits uses the literal head as an index prefix, the literal tail becomes
+    a prefix match on number_reversed and literal runs become $all n-gram keys, so the planner can
+    start from whichever key is most selective.
+    """
+    pattern = re.sub(r"\*+", "*", pattern.strip().replace("x", "?").replace("X", "?"))
+    if not pattern or not SIM_WILDCARD_PATTERN.match(pattern) or pattern == "*":
+        raise HTTPException(status_code=400, detail="Pattern must contain digits and the wildcards * ? x")
+    if "*" not in pattern and "?" not in pattern:
+        return {"number_digits": pattern}
+    
+    segments = [segment for segment in re.split(r"[*?]", pattern) if segment]
+    regex = "^" + "".join(r"\d*" if char == "*" else r"\d" if char == "?" else char for char in pattern) + "$"
+    query = {"number_digits": {"$regex": regex}}
+    tail = re.search(r"\d*$", pattern).group()
+    if tail:
+        query["number_reversed"] = {"$regex": f"^{tail[::-1]}"}
+    ngrams = list(dict.fromkeys(ngram for segment in segments for ngram in sim_segment_ngrams(segment)))
+    if ngrams:
+        query["number_ngrams"] = {"$all": ngrams}
+    return query
+
+async def backfill_sim_number_index():
+    """Background task: compute number keys for sims missing them or built by an older format"""
+    try:
+        stale = {"number_index_format": {"$ne": SIM_NUMBER_INDEX_FORMAT}}
+        updated = 0
+        while True:
+            sims = await db.sims.find(stale, {"_id": 0, "id": 1, "phone_number": 1}).limit(SIM_BACKFILL_CHUNK).to_list(SIM_BACKFILL_CHUNK)
+            if not sims:
+                break
+            await db.sims.bulk_write([
+                UpdateOne({"id": sim["id"]}, {"$set": sim_number_fields(sim.get("phone_number"))})
+                for sim in sims
+            ], ordered=False)
+            updated += len(sims)
+        if updated:
+            logger.info(f"Indexed numbers of {updated} sims")
+    except Exception as e:
+        logger.error(f"Error backfilling sim number index: {str(e)}")
+
+# Listing Locations
+# Properties and lands with valid latitude/longitude also keep them as a GeoJSON point in "location"
+# (2dsphere indexed), maintained by the content write helpers and backfilled at startup. Documents
+# without usable coordinates get location: null, which the index skips.
+GEO_COLLECTIONS = ("properties", "lands")
+GEO_BACKFILL_CHUNK = 500
+NEARBY_DEFAULT_RADIUS_KM = float(os.environ.get('NEARBY_DEFAULT_RADIUS_KM', '5'))
+NEARBY_MAX_RADIUS_KM = float(os.environ.get('NEARBY_MAX_RADIUS_KM', '50'))
+
+def geo_point(latitude, longitude) -> Optional[dict]:
+    """GeoJSON point for a coordinate pair, or None if either is missing or out of range"""
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in (latitude, longitude)):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return {"type": "Point", "coordinates": [float(longitude), float(latitude)]}
+
+def with_geo_location(collection_name: str, document: dict) -> dict:
+    if collection_name in GEO_COLLECTIONS:
+        document["location"] = geo_point(document.get("latitude"), document.get("longitude"))
+    return document
+
+async def sync_geo_location(collection_name: str, doc_id: str, update_data: dict):
+    """Recompute the point after an update that touched either coordinate"""
+    if collection_name not in GEO_COLLECTIONS or not {"latitude", "longitude"} & update_data.keys():
+        return
+    document = await db[collection_name].find_one({"id": doc_id}, {"_id": 0, "latitude": 1, "longitude": 1})
+    if document:
+        await db[collection_name].update_one(
+            {"id": doc_id},
+            {"$set": {"location": geo_point(document.get("latitude"), document.get("longitude"))}}
+        )
+
+async def backfill_geo_locations():
+    """Background task: set location on documents written before it existed"""
+    try:
+        updated = 0
+        for collection_name in GEO_COLLECTIONS:
+            while True:
+                documents = await db[collection_name].find(
+                    {"location": {"$exists": False}}, {"_id": 0, "id": 1, "latitude": 1, "longitude": 1}
+                ).limit(GEO_BACKFILL_CHUNK).to_list(GEO_BACKFILL_CHUNK)
+                if not documents:
+                    break
+                await db[collection_name].bulk_write([
+                    UpdateOne({"id": document["id"]}, {"$set": {"location": geo_point(document.get("latitude"), document.get("longitude"))}})
+                    for document in documents
+                ], ordered=False)
+                updated += len(documents)
+        if updated:
+            logger.info(f"Backfilled locations of {updated} listings")
+    except Exception as e:
+        logger.error(f"Error backfilling listing locations: {str(e)}")
+
+def bbox_query(bbox: str) -> dict:
+    """$geoWithin filter for a map viewport given as west,south,east,north"""
+    try:
+        west, south, east, north = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    ring = [[west, south], [east, south], [east, north], [west, north], [west, south]]
+    return {"location": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}}
+
+async def find_nearby_summaries(collection_name: str, projection: dict, response: Response, filter_query: dict,
+                                lat: Optional[float], lng: Optional[float], radius_km: float, bbox: Optional[str],
+                                skip: int, cursor: Optional[str], limit: int, sort_by: str, order: str,
+                                image_variant: Optional[str]) -> List[dict]:
+    """Listing summaries within radius_km of lat/lng (nearest first, with distance_m) or inside a bbox
+    viewport (list order, with cursors)"""
+    if bbox is not None:
+        if lat is not None or lng is not None:
+            raise HTTPException(status_code=400, detail="Use either lat/lng or bbox")
+        filter_query.update(bbox_query(bbox))
+        sort_order = -1 if order == "desc" else 1
+        documents = await find_listing_summaries(
+            collection_name, projection, keyset_query(filter_query, sort_by, sort_order, cursor),
+            sort=keyset_sort(sort_by, sort_order), skip=0 if cursor else skip, limit=limit, image_variant=image_variant
+        )
+        set_next_cursor(response, documents, limit, sort_by, sort_order)
+        return documents
+    
+    if lat is None or lng is None:
+        raise HTTPException(status_code=400, detail="Provide lat and lng, or bbox")
+    return await find_listing_summaries(
+        collection_name, projection, filter_query, skip=skip, limit=limit, image_variant=image_variant,
+        near={"near": geo_point(lat, lng), "maxDistance": radius_km * 1000}
+    )
+
+# Listing Facets
+# Facet counts and the first page of results come from one $facet aggregation over the current
+# filters, cached briefly per normalized filter (stale snapshots are served while one refresh runs).
+PROPERTY_FACET_FIELDS = ("property_type", "status", "city", "district", "bedrooms")
+LAND_FACET_FIELDS = ("land_type", "status", "city", "district", "orientation")
+FACET_MAX_VALUES = 50
+# Price range boundaries in VND; prices above the last one fall in an open-ended range
+LISTING_PRICE_BOUNDARIES = [0, 1_000_000_000, 2_000_000_000, 3_000_000_000, 5_000_000_000,
+                            10_000_000_000, 20_000_000_000, 50_000_000_000]
+LISTING_FACETS_FRESH_SECONDS = float(os.environ.get('LISTING_FACETS_FRESH_SECONDS', '10'))
+LISTING_FACETS_STALE_SECONDS = float(os.environ.get('LISTING_FACETS_STALE_SECONDS', '60'))
+LISTING_FACETS_MAX_ENTRIES = int(os.environ.get('LISTING_FACETS_MAX_ENTRIES', '256'))
+CASE_INSENSITIVE_FILTERS = ("city", "district")
+
+listing_facets_cache = SnapshotCacheGroup(LISTING_FACETS_FRESH_SECONDS, LISTING_FACETS_STALE_SECONDS, LISTING_FACETS_MAX_ENTRIES)
+
+async def compute_listing_facets(collection_name: str, projection: dict, facet_fields: tuple, filter_query: dict,
+                                 sort_by: str, sort_order: int, limit: int, image_variant: Optional[str]) -> dict:
+    facets = {
+        field: [
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_MAX_VALUES}
+        ]
+        for field in facet_fields
+    }
+    facets["total"] = count_facet()
+    facets["price_ranges"] = [{"$bucket": {
+        "groupBy": "$price",
+        "boundaries": LISTING_PRICE_BOUNDARIES,
+        "default": "above",
+        "output": {"count": {"$sum": 1}}
+    }}]
+    facets["results"] = summary_page_stages(projection, keyset_sort(sort_by, sort_order), 0, limit)
+    result = await run_facets(db[collection_name], facets, match=filter_query)
+    
+    price_ranges = []
+    for bucket in result["price_ranges"]:
+        if bucket["_id"] == "above":
+            price_ranges.append({"min": LISTING_PRICE_BOUNDARIES[-1], "max": None, "count": bucket["count"]})
+        else:
+            upper = LISTING_PRICE_BOUNDARIES[LISTING_PRICE_BOUNDARIES.index(bucket["_id"]) + 1]
+            price_ranges.append({"min": bucket["_id"], "max": upper, "count": bucket["count"]})
+    documents = await finish_listing_summaries(result["results"], image_variant)
+    return {
+        "total": facet_count(result, "total"),
+        "facets": {
+            field: [{"value": row["_id"], "count": row["count"]} for row in result[field] if row["_id"] is not None]
+            for field in facet_fields
+        },
+        "price_ranges": price_ranges,
+        "results": documents,
+        "next_cursor": encode_cursor(sort_by, sort_order, documents[-1]) if len(documents) >= limit else None
+    }
+
+async def get_listing_facets(collection_name: str, projection: dict, facet_fields: tuple, filter_builder,
+                             filters: dict, sort_by: str, order: str, limit: int,
+                             image_variant: Optional[str]) -> dict:
+    """Cached facets + first page for the list filters in `filters` (keyword arguments of filter_builder)"""
+    filters = {
+        name: value.strip().lower() if name in CASE_INSENSITIVE_FILTERS else value
+        for name, value in filters.items() if value is not None
+    }
+    sort_order = -1 if order == "desc" else 1
+    key = (collection_name, json.dumps(filters, sort_keys=True, default=str), sort_by, sort_order, limit, image_variant)
+    filter_query = filter_builder(**filters)
+    return await listing_facets_cache.get(key, lambda: compute_listing_facets(
+        collection_name, projection, facet_fields, filter_query, sort_by, sort_order, limit, image_variant
+    ))
+
+# Conditional GET
+# Public read endpoints send ETag, Last-Modified and Cache-Control and answer If-None-Match /
+# If-Modified-Since with 304 before serializing anything. List validators come from a per-collection
+# generation (bumped by every content write) and the request URL; detail validators from the
+# document's updated_at. A "format" generation, bumped at startup and by migrations that rewrite
+# documents, is part of every validator so a deploy never revalidates a body it would render
+# differently. View counts are not part of any validator.
+CONTENT_GENERATIONS_ID = "content_generations"
+FORMAT_GENERATION = "format"
+LIST_CACHE_CONTROL = os.environ.get('LIST_CACHE_CONTROL', 'public, max-age=30')
+SETTINGS_CACHE_CONTROL = os.environ.get('SETTINGS_CACHE_CONTROL', 'public, max-age=60')
+DETAIL_CACHE_CONTROL = "no-cache"  # always revalidate, so every detail view still reaches us (and is counted)
+
+async def bump_content_generation(*names: str):
+    """Invalidate the validators of responses built from these collections"""
+    now = datetime.utcnow()
+    await db.counters.update_one(
+        {"_id": CONTENT_GENERATIONS_ID},
+        {"$inc": {f"{name}.generation": 1 for name in names}, "$set": {f"{name}.modified_at": now for name in names}},
+        upsert=True
+    )
+
+async def content_generations(*names: str) -> Dict[str, dict]:
+    projection = {name: 1 for name in (FORMAT_GENERATION, *names)}
+    return await db.counters.find_one({"_id": CONTENT_GENERATIONS_ID}, projection) or {}
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """If-None-Match wins over If-Modified-Since, as in RFC 9110"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+def conditional_get(request: Request, response: Response, etag: Optional[str],
+                    last_modified: Optional[datetime], cache_control: str) -> Optional[Response]:
+    """Set the validators on response, or return a 304 response if the client's copy is current"""
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    if etag and is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+async def list_conditional_get(request: Request, response: Response, collection_name: str,
+                               cache_control: str = LIST_CACHE_CONTROL) -> Optional[Response]:
+    """conditional_get for a response built from one collection and the request's path and query"""
+    state = await content_generations(collection_name)
+    generations = [state.get(name) or {} for name in (FORMAT_GENERATION, collection_name)]
+    url_hash = hashlib.sha1(f"{request.url.path}?{sorted(request.query_params.multi_items())}".encode()).hexdigest()[:16]
+    etag = f'"{collection_name}-{"-".join(str(generation.get("generation", 0)) for generation in generations)}-{url_hash}"'
+    modified = [generation["modified_at"] for generation in generations if generation.get("modified_at")]
+    return conditional_get(request, response, etag, max(modified) if modified else None, cache_control)
+
+async def document_conditional_get(request: Request, response: Response, document: dict,
+                                   cache_control: str = DETAIL_CACHE_CONTROL) -> Optional[Response]:
+    """conditional_get for a single document, validated by its updated_at (or created_at)"""
+    modified_at = document.get("updated_at") or document.get("created_at")
+    if not isinstance(modified_at, datetime):
+        return conditional_get(request, response, None, None, cache_control)
+    state = await content_generations()
+    format_generation = (state.get(FORMAT_GENERATION) or {}).get("generation", 0)
+    modified_ms = int(modified_at.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    etag = f'"{document["id"]}-{modified_ms}-{format_generation}"'
+    return conditional_get(request, response, etag, modified_at, cache_control)
+
+# Content Write Helpers (properties, lands, sims, news_articles, tickets)
+async def insert_content_document(collection_name: str, document: dict):
+    """Insert a content document and update derived data"""
+    await externalize_inline_images(collection_name, document)
+    with_sim_number_index(collection_name, document)
+    with_geo_location(collection_name, document)
+    await db[collection_name].insert_one(document)
+    await record_content_change(collection_name, None, document)
+    await index_search_document(collection_name, document)
+    await bump_content_generation(collection_name)
+
+async def update_content_document(collection_name: str, doc_id: str, update_data: dict) -> bool:
+    """$set fields on a content document and update derived data. Returns False if not found."""
+    await externalize_inline_images(collection_name, update_data)
+    with_sim_number_index(collection_name, update_data)
+    before = await db[collection_name].find_one_and_update(
+        {"id": doc_id},
+        {"$set": update_data},
+        projection=CONTENT_TRACKED_FIELDS
+    )
+    if before is None:
+        return False
+    await record_content_change(collection_name, before, {**before, **update_data})
+    await reindex_search_document(collection_name, doc_id, update_data)
+    await sync_geo_location(collection_name, doc_id, update_data)
+    await bump_content_generation(collection_name)
+    return True
+
+async def delete_content_document(collection_name: str, doc_id: str) -> bool:
+    """Delete a content document and update derived data. Returns False if not found."""
+    deleted = await db[collection_name].find_one_and_delete({"id": doc_id}, projection=CONTENT_TRACKED_FIELDS)
+    if deleted is None:
+        return False
+    await record_content_change(collection_name, deleted, None)
+    await remove_search_document(collection_name, doc_id)
+    await bump_content_generation(collection_name)
+    return True
+
+async def insert_content_documents(collection_name: str, documents: List[dict]) -> Tuple[List[dict], Dict[int, str]]:
+    """Batch version of insert_content_document using insert_many.
+    
+    Documents whose id already exists are skipped. Returns the inserted documents and an error
+    message per position for documents rejected for any other reason.
+    """
+    for document in documents:
+        await externalize_inline_images(collection_name, document)
+        with_sim_number_index(collection_name, document)
+        with_geo_location(collection_name, document)
+    rejected: Dict[int, str] = {}
+    skipped = set()
+    try:
+        await db[collection_name].insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            if error.get("code") == 11000:
+                skipped.add(error["index"])
+            else:
+                rejected[error["index"]] = error.get("errmsg", "Write failed")
+    inserted = [document for index, document in enumerate(documents) if index not in skipped and index not in rejected]
+    if inserted:
+        await record_content_inserts(collection_name, inserted)
+        if collection_name in SEARCH_COLLECTIONS:
+            await write_search_chunk(collection_name, inserted)
+        await bump_content_generation(collection_name)
+    return inserted, rejected
+
+async def record_pageview_counters(pageviews: List[dict]):
+    """Count a batch of stored pageviews in the site counters"""
+    if pageviews:
+        await db.counters.update_one({"_id": STATS_COUNTER_ID}, {"$inc": {"total_pageviews": len(pageviews)}}, upsert=True)
+
+async def reconcile_counters():
+    """Recompute every counter from the real collections to correct drift"""
+    (
+        total_properties, total_for_sale, total_for_rent, total_news, total_sims, total_lands,
+        total_tickets, open_tickets, resolved_tickets, total_pageviews, cities
+    ) = await asyncio.gather(
+        db.properties.count_documents({}),
+        db.properties.count_documents({"status": "for_sale"}),
+        db.properties.count_documents({"status": "for_rent"}),
+        db.news_articles.count_documents({"published": True}),
+        db.sims.count_documents({}),
+        db.lands.count_documents({}),
+        db.tickets.count_documents({}),
+        db.tickets.count_documents({"status": "open"}),
+        db.tickets.count_documents({"status": "resolved"}),
+        count_pageviews(),
+        db.properties.aggregate([{"$group": {"_id": "$city", "count": {"$sum": 1}}}]).to_list(None)
+    )
     
-    if transaction["status"] != "pending":
-        raise HTTPException(status_code=400, detail="Transaction is not pending")
+    await db.counters.update_one({"_id": STATS_COUNTER_ID}, {"$set": {
+        "total_properties": total_properties,
+        "properties_for_sale": total_for_sale,
+        "properties_for_rent": total_for_rent,
+        "total_news_articles": total_news,
+        "total_sims": total_sims,
+        "total_lands": total_lands,
+        "total_tickets": total_tickets,
+        "open_tickets": open_tickets,
+        "resolved_tickets": resolved_tickets,
+        "total_pageviews": total_pageviews,
+        "reconciled_at": datetime.utcnow()
+    }}, upsert=True)
     
-    # Update transaction status
-    await db.transactions.update_one(
-        {"id": transaction_id},
-        {
-            "$set": {
-                "status": "completed",
-                "completed_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-                "admin_notes": f"Approved by admin: {current_admin.username}"
-            }
-        }
+    actual_cities = {row["_id"]: row["count"] for row in cities if row["_id"] is not None}
+    await db.counters.update_many(
+        {"kind": "property_city", "city": {"$nin": list(actual_cities)}},
+        {"$set": {"count": 0}}
     )
-    
-    # Update user balance for deposits
-    if transaction["transaction_type"] == "deposit":
-        await db.users.update_one(
-            {"id": transaction["user_id"]},
-            {"$inc": {"wallet_balance": transaction["amount"]}}
+    for city, count in actual_cities.items():
+        await db.counters.update_one(
+            {"_id": city_counter_id(city)},
+            {"$set": {"kind": "property_city", "city": city, "count": count}},
+            upsert=True
         )
-    
-    return {"message": "Transaction approved successfully"}
 
-@api_router.put("/admin/transactions/{transaction_id}/reject")
+counters_reconcile_task: Optional[asyncio.Task] = None
+
+async def reconcile_counters_once():
+    """reconcile_counters, joining the run already in progress in this process instead of starting another"""
+    global counters_reconcile_task
+    if counters_reconcile_task is None or counters_reconcile_task.done():
+        counters_reconcile_task = asyncio.ensure_future(reconcile_counters())
+    # Shielded: a caller that goes away does not cancel the run for the others
+    await asyncio.shield(counters_reconcile_task)
+
+async def counters_reconcile_loop():
+    """Background task: reconcile counters at startup and then periodically"""
+    while True:
+        try:
+            await reconcile_counters_once()
+        except Exception as e:
+            logger.error(f"Error reconciling counters: {str(e)}")
+        await asyncio.sleep(COUNTERS_RECONCILE_SECONDS)
+
+# Maintenance Leases
+# Every worker process runs the startup and periodic maintenance tasks. Jobs that must run in one
+# process at a time (the traffic rollup backfill, pageview archival) are claimed with a single
+# find_one_and_update on their state document in counters, which records the owning worker and a
+# lease expiry. The owner renews the lease as it makes progress and stops as soon as a renewal fails;
+# another worker can only take the job over once the lease has expired.
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+MAINTENANCE_LEASE_SECONDS = float(os.environ.get('MAINTENANCE_LEASE_SECONDS', '600'))
+
+async def claim_lease(state_id: str, condition: dict, fields: dict) -> Optional[dict]:
+    """Take the lease on a state document matching `condition` (created if missing) and set `fields`.
+    Returns the updated document, or None while another worker holds an unexpired lease."""
+    now = datetime.utcnow()
+    try:
+        return await db.counters.find_one_and_update(
+            {
+                "_id": state_id,
+                **condition,
+                "$or": [{"lease_owner": WORKER_ID}, {"lease_until": None}, {"lease_until": {"$lt": now}}]
+            },
+            {"$set": {
+                **fields,
+                "lease_owner": WORKER_ID,
+                "lease_until": now + timedelta(seconds=MAINTENANCE_LEASE_SECONDS)
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The document exists but did not match: leased elsewhere (or not in `condition`)
+        return None
+
+async def renew_lease(state_id: str, fields: Optional[dict] = None):
+    """Extend our lease (setting `fields` with it), raising RuntimeError if another worker took it over"""
+    result = await db.counters.update_one(
+        {"_id": state_id, "lease_owner": WORKER_ID},
+        {"$set": {**(fields or {}), "lease_until": datetime.utcnow() + timedelta(seconds=MAINTENANCE_LEASE_SECONDS)}}
+    )
+    if result.matched_count == 0:
+        raise RuntimeError(f"Lost the {state_id} lease")
+
+async def release_lease(state_id: str, fields: Optional[dict] = None) -> bool:
+    """Give up our lease (setting `fields` with it); False if another worker had taken it over"""
+    result = await db.counters.update_one(
+        {"_id": state_id, "lease_owner": WORKER_ID},
+        {"$set": {**(fields or {}), "lease_owner": None, "lease_until": None}}
+    )
+    return result.matched_count > 0
+
+# Pageview Partitions
+# Raw pageviews live in one collection per month ("pageviews_YYYYMM"). Reads over a time window only
+# touch the partitions overlapping it, and partitions older than PAGEVIEW_RETENTION_MONTHS are
+# exported to gzip-compressed NDJSON under PAGEVIEW_ARCHIVE_DIR and then dropped. The traffic rollups
+# are kept, so analytics still cover archived months. "pageviews" is the legacy unpartitioned collection.
+# Archival runs under the pageview_retention lease (see Maintenance Leases), so one worker at a time
+# exports and drops partitions.
+PAGEVIEW_PARTITION_PREFIX = "pageviews_"
+PAGEVIEW_PARTITION_PATTERN = re.compile(rf"^{PAGEVIEW_PARTITION_PREFIX}\d{{6}}$")
+PAGEVIEW_RETENTION_MONTHS = int(os.environ.get('PAGEVIEW_RETENTION_MONTHS', '12'))  # 0 keeps everything
+PAGEVIEW_ARCHIVE_DIR = Path(os.environ.get('PAGEVIEW_ARCHIVE_DIR', str(ROOT_DIR / 'archive' / 'pageviews')))
+PAGEVIEW_MAINTENANCE_SECONDS = float(os.environ.get('PAGEVIEW_MAINTENANCE_SECONDS', str(6 * 3600)))
+PAGEVIEW_MIGRATION_CHUNK = 5000
+PAGEVIEW_ARCHIVE_COUNTER_ID = "pageview_archive"  # pageviews per archived partition
+PAGEVIEW_RETENTION_STATE_ID = "pageview_retention"
+known_pageview_partitions = set()
+
+def pageview_partition_name(timestamp: datetime) -> str:
+    return f"{PAGEVIEW_PARTITION_PREFIX}{timestamp.strftime('%Y%m')}"
+
+async def list_pageview_partitions() -> List[str]:
+    names = await db.list_collection_names()
+    return sorted(name for name in names if PAGEVIEW_PARTITION_PATTERN.match(name))
+
+async def pageview_partitions_for_range(start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+    """Partitions overlapping [start, end), oldest first"""
+    first = pageview_partition_name(start) if start else None
+    last = pageview_partition_name(end - timedelta(microseconds=1)) if end else None
+    return [
+        name for name in await list_pageview_partitions()
+        if (first is None or name >= first) and (last is None or name <= last)
+    ]
+
+async def ensure_pageview_partition(name: str):
+    if name not in known_pageview_partitions:
+        await db[name].create_indexes(INDEX_DECLARATIONS["pageviews"])
+        known_pageview_partitions.add(name)
+
+async def insert_pageviews(pageviews: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """Insert pageviews into their monthly partitions, returning (stored, not stored). A duplicate
+    key means an earlier, interrupted attempt already stored the pageview."""
+    by_partition = {}
+    for pageview in pageviews:
+        by_partition.setdefault(pageview_partition_name(pageview["timestamp"]), []).append(pageview)
+    stored, failed = [], []
+    for name, documents in by_partition.items():
+        await ensure_pageview_partition(name)
+        try:
+            await db[name].insert_many(documents, ordered=False)
+            stored.extend(documents)
+        except BulkWriteError as e:
+            # Unordered: every document without a write error was inserted
+            failed_indexes = {error["index"] for error in e.details.get("writeErrors", []) if error.get("code") != 11000}
+            for index, document in enumerate(documents):
+                (failed if index in failed_indexes else stored).append(document)
+    return stored, failed
+
+async def count_pageviews() -> int:
+    """Total pageviews: live collections (metadata counts, no collection scan) plus archived partitions"""
+    names = await list_pageview_partitions() + ["pageviews"]
+    counts = await asyncio.gather(*[db[name].estimated_document_count() for name in names])
+    archive = await db.counters.find_one({"_id": PAGEVIEW_ARCHIVE_COUNTER_ID}) or {}
+    # A partition archived but not yet dropped is still counted live
+    archived = sum(count for name, count in archive.get("partitions", {}).items() if name not in names)
+    return sum(counts) + archived
+
+async def migrate_legacy_pageviews():
+    """Move pageviews from the unpartitioned collection into the monthly partitions (resumable)"""
+    moved = 0
+    while True:
+        chunk = await db.pageviews.find({}).limit(PAGEVIEW_MIGRATION_CHUNK).to_list(PAGEVIEW_MIGRATION_CHUNK)
+        if not chunk:
+            break
+        # Documents copied by an interrupted earlier run already exist in their partition
+        _, failed = await insert_pageviews(chunk)
+        if failed:
+            raise RuntimeError(f"Could not copy {len(failed)} legacy pageviews into their partitions")
+        await db.pageviews.delete_many({"_id": {"$in": [pageview["_id"] for pageview in chunk]}})
+        moved += len(chunk)
+    if moved:
+        logger.info(f"Moved {moved} legacy pageviews into monthly partitions")
+
+def archive_json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+async def archive_pageview_partition(name: str) -> Path:
+    """Export a partition to <PAGEVIEW_ARCHIVE_DIR>/<name>.ndjson.gz, renewing the retention lease
+    as it goes"""
+    await asyncio.to_thread(PAGEVIEW_ARCHIVE_DIR.mkdir, parents=True, exist_ok=True)
+    target = PAGEVIEW_ARCHIVE_DIR / f"{name}.ndjson.gz"
+    # Per worker, so a worker whose lease expired mid-export never writes into its successor's file
+    partial = PAGEVIEW_ARCHIVE_DIR / f"{name}.ndjson.gz.{WORKER_ID}.partial"
+    
+    archive = await asyncio.to_thread(gzip.open, partial, "wt", encoding="utf-8")
+    written = 0
+    try:
+        try:
+            lines = []
+            async for pageview in db[name].find({}):
+                lines.append(json.dumps(pageview, default=archive_json_default, ensure_ascii=False))
+                written += 1
+                if len(lines) >= 1000:
+                    await asyncio.to_thread(archive.write, "\n".join(lines) + "\n")
+                    lines = []
+                    await renew_lease(PAGEVIEW_RETENTION_STATE_ID)
+            if lines:
+                await asyncio.to_thread(archive.write, "\n".join(lines) + "\n")
+        finally:
+            await asyncio.to_thread(archive.close)
+        await renew_lease(PAGEVIEW_RETENTION_STATE_ID)
+        await asyncio.to_thread(os.replace, partial, target)
+    except BaseException:
+        await asyncio.to_thread(partial.unlink, missing_ok=True)
+        raise
+    # Set, not incremented: re-archiving a partition after an interrupted drop must not count it twice
+    await db.counters.update_one(
+        {"_id": PAGEVIEW_ARCHIVE_COUNTER_ID},
+        {"$set": {f"partitions.{name}": written}},
+        upsert=True
+    )
+    return target
+
+async def apply_pageview_retention() -> List[str]:
+    """Archive and drop partitions older than PAGEVIEW_RETENTION_MONTHS, returning their names
+    (none while another worker holds the retention lease)"""
+    if PAGEVIEW_RETENTION_MONTHS <= 0:
+        return []
+    now = datetime.utcnow()
+    month_index = now.year * 12 + now.month - 1 - PAGEVIEW_RETENTION_MONTHS
+    oldest_kept = f"{PAGEVIEW_PARTITION_PREFIX}{month_index // 12:04d}{month_index % 12 + 1:02d}"
+    expired = [name for name in await list_pageview_partitions() if name < oldest_kept]
+    if not expired or not await claim_lease(PAGEVIEW_RETENTION_STATE_ID, {}, {"started_at": now}):
+        return []
+    
+    archived = []
+    try:
+        for name in expired:
+            target = await archive_pageview_partition(name)
+            # Still ours: no other worker can be exporting the partition we drop
+            await renew_lease(PAGEVIEW_RETENTION_STATE_ID)
+            await db[name].drop()
+            known_pageview_partitions.discard(name)
+            archived.append(name)
+            logger.info(f"Archived pageview partition {name} to {target}")
+    finally:
+        await release_lease(PAGEVIEW_RETENTION_STATE_ID, {"finished_at": datetime.utcnow()})
+    return archived
+
+async def pageview_maintenance_loop(rollup_backfill: Optional[Tuple[datetime, datetime]]):
+    """Background task: migrate legacy pageviews, backfill rollups if needed, then apply retention periodically
+    (taking over a rollup backfill left unfinished by another worker)"""
+    try:
+        await migrate_legacy_pageviews()
+    except Exception as e:
+        logger.error(f"Error migrating legacy pageviews: {str(e)}")
+    while True:
+        if rollup_backfill is not None:
+            await backfill_traffic_rollups(*rollup_backfill)
+        try:
+            await apply_pageview_retention()
+        except Exception as e:
+            logger.error(f"Error applying pageview retention: {str(e)}")
+        await asyncio.sleep(PAGEVIEW_MAINTENANCE_SECONDS)
+        try:
+            rollup_backfill = await prepare_traffic_rollups()
+        except Exception as e:
+            rollup_backfill = None
+            logger.error(f"Error checking traffic rollup backfill: {str(e)}")
+
+# Unique Visitor Estimation
+HLL_PRECISION = 12
+HLL_RANK_WEIGHTS = [2.0 ** -rank for rank in range(65)]
+
+class HyperLogLog:
+    """HyperLogLog cardinality sketch with 2^precision one-byte registers.
+    
+    The standard error is about 1.04 / sqrt(2^precision): 1.6% at the default precision of 12,
+    for a fixed 4 KB of registers no matter how many sessions are added. Sketches of the same
+    precision merge losslessly (register-wise max), so counts combine across any hours, days or pages.
+    """
+    
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.size)
+    
+    def add(self, value: str):
+        hashed = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rank = remaining_bits - (hashed & ((1 << remaining_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def merge(self, other: "HyperLogLog"):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(HLL_RANK_WEIGHTS[rank] for rank in self.registers)
+        empty_registers = self.registers.count(0)
+        if estimate <= 2.5 * self.size and empty_registers:
+            # Small range correction (linear counting)
+            estimate = self.size * math.log(self.size / empty_registers)
+        return int(round(estimate))
+    
+    def to_bytes(self) -> bytes:
+        """Compact serialization: precision byte + zlib-compressed registers"""
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(precision=data[0], registers=bytearray(zlib.decompress(data[1:])))
+
+def merged_unique_count(sketches: List[bytes]) -> int:
+    """Estimate unique sessions across serialized sketches"""
+    merged = HyperLogLog()
+    for sketch in sketches:
+        if sketch:
+            merged.merge(HyperLogLog.from_bytes(sketch))
+    return merged.count()
+
+# Traffic Rollups
+# traffic_analytics holds hourly and daily buckets per page_path (plus "*" for the whole site) with
+# views and a HyperLogLog sketch of sessions. Buckets are fed from the pageview stream; days follow
+# the local UTC offset.
+TRAFFIC_TZ_OFFSET_HOURS = float(os.environ.get('TRAFFIC_TZ_OFFSET_HOURS', '7'))  # Vietnam (UTC+7)
+TRAFFIC_ALL_PAGES = "*"
+TRAFFIC_ROLLUP_STATE_ID = "traffic_rollup_state"
+TRAFFIC_ROLLUP_FORMAT = 2  # bump to rebuild the buckets still covered by raw pageviews at next startup
+TRAFFIC_BACKFILL_CHUNK = 5000
+TRAFFIC_MERGE_RETRIES = 5
+
+def traffic_bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """UTC start of the hour/day bucket containing a UTC timestamp"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    offset = timedelta(hours=TRAFFIC_TZ_OFFSET_HOURS)
+    return (timestamp + offset).replace(hour=0, minute=0, second=0, microsecond=0) - offset
+
+def traffic_bucket_id(granularity: str, bucket_start: datetime, page_path: str) -> str:
+    return f"{granularity}:{bucket_start.strftime('%Y%m%d%H')}:{page_path}"
+
+def traffic_bucket_label(bucket_start: datetime, granularity: str) -> str:
+    """Local-time label of a bucket, e.g. 2024-05-01 or 2024-05-01T14:00"""
+    local_start = bucket_start + timedelta(hours=TRAFFIC_TZ_OFFSET_HOURS)
+    return local_start.strftime("%Y-%m-%dT%H:00" if granularity == "hour" else "%Y-%m-%d")
+
+async def record_traffic_rollups(pageviews: List[dict]):
+    """Fold a batch of pageviews into the hourly and daily traffic buckets"""
+    if not pageviews:
+        return
+    
+    buckets = {}
+    for pageview in pageviews:
+        for granularity in ("hour", "day"):
+            bucket_start = traffic_bucket_start(pageview["timestamp"], granularity)
+            for page_path in (pageview["page_path"], TRAFFIC_ALL_PAGES):
+                bucket = buckets.setdefault(traffic_bucket_id(granularity, bucket_start, page_path), {
+                    "fields": {
+                        "granularity": granularity,
+                        "page_path": page_path,
+                        "timestamp": bucket_start,
+                        "date": traffic_bucket_label(bucket_start, granularity)
+                    },
+                    "views": 0,
+                    "sketch": HyperLogLog()
+                })
+                bucket["views"] += 1
+                bucket["sketch"].add(pageview["session_id"])
+    
+    await merge_traffic_buckets(buckets)
+
+async def merge_traffic_buckets(buckets: Dict[str, dict]):
+    """Merge batch sketches into stored buckets (read-merge-write with optimistic versioning)"""
+    pending = buckets
+    for attempt in range(TRAFFIC_MERGE_RETRIES):
+        stored = await db.traffic_analytics.find(
+            {"_id": {"$in": list(pending)}},
+            {"sessions_hll": 1, "hll_version": 1}
+        ).to_list(None)
+        stored = {doc["_id"]: doc for doc in stored}
+        
+        bucket_ids = list(pending)
+        operations = []
+        for bucket_id in bucket_ids:
+            bucket = pending[bucket_id]
+            current = stored.get(bucket_id, {})
+            sketch = HyperLogLog(registers=bytearray(bucket["sketch"].registers))
+            if current.get("sessions_hll"):
+                sketch.merge(HyperLogLog.from_bytes(current["sessions_hll"]))
+            version = current.get("hll_version", 0)
+            operations.append(UpdateOne(
+                {"_id": bucket_id, "hll_version": version},
+                {
+                    "$inc": {"views": bucket["views"]},
+                    "$set": {"sessions_hll": sketch.to_bytes(), "unique_visitors": sketch.count(), "hll_version": version + 1},
+                    "$setOnInsert": bucket["fields"]
+                },
+                upsert=True
+            ))
+        
+        try:
+            await db.traffic_analytics.bulk_write(operations, ordered=False)
+            return
+        except BulkWriteError as e:
+            # Another writer updated (or created) some buckets first: retry just those
+            failed = {bucket_ids[error["index"]] for error in e.details.get("writeErrors", [])}
+            pending = {bucket_id: pending[bucket_id] for bucket_id in failed}
+    
+    logger.error(f"Giving up merging {len(pending)} traffic buckets after {TRAFFIC_MERGE_RETRIES} attempts")
+
+async def get_today_traffic() -> dict:
+    """Views and unique visitors of the current (local) day, from its site-wide bucket"""
+    today_start = traffic_bucket_start(datetime.utcnow(), "day")
+    bucket = await db.traffic_analytics.find_one(
+        {"_id": traffic_bucket_id("day", today_start, TRAFFIC_ALL_PAGES)},
+        {"_id": 0, "views": 1, "unique_visitors": 1}
+    )
+    return bucket or {}
+
+async def oldest_raw_pageview_time() -> Optional[datetime]:
+    """Earliest time still covered by raw pageviews (partitions or the legacy collection)"""
+    candidates = []
+    partitions = await list_pageview_partitions()
+    if partitions:
+        month = partitions[0][len(PAGEVIEW_PARTITION_PREFIX):]
+        candidates.append(datetime(int(month[:4]), int(month[4:]), 1))
+    legacy = await db.pageviews.find_one({}, {"_id": 0, "timestamp": 1}, sort=[("timestamp", 1)])
+    if legacy:
+        candidates.append(legacy["timestamp"])
+    return min(candidates) if candidates else None
+
+async def traffic_rebuild_start(timestamp: datetime) -> datetime:
+    """Where a rebuild from raw pageviews starting at a timestamp begins: the start of its local day,
+    unless that day already has buckets (fed from an archived partition), which are then kept by
+    starting at the next day boundary (also an hour boundary for whole-hour offsets)"""
+    day_start = traffic_bucket_start(timestamp, "day")
+    if day_start == timestamp:
+        return day_start
+    next_day = day_start + timedelta(days=1)
+    if await db.traffic_analytics.find_one({"granularity": "day", "timestamp": {"$gte": day_start, "$lt": next_day}}, {"_id": 1}):
+        return next_day
+    return day_start
+
+async def prepare_traffic_rollups() -> Optional[Tuple[datetime, datetime]]:
+    """Called at startup before any pageview is buffered, and by the maintenance loop to take over a
+    backfill whose worker stopped.
+    
+    Returns the (start, cutoff) window of existing raw pageviews that this worker has claimed the
+    backfill of, or None when the rollups are already complete or another worker holds the lease.
+    """
+    state = await db.counters.find_one({"_id": TRAFFIC_ROLLUP_STATE_ID})
+    if state and state.get("status") == "done" and state.get("format") == TRAFFIC_ROLLUP_FORMAT:
+        return None
+    
+    # First run, an interrupted backfill or an older bucket format: rebuild the buckets the raw
+    # pageviews still cover. Older buckets were fed from partitions archived since, so they are kept.
+    cutoff = datetime.utcnow()
+    oldest = await oldest_raw_pageview_time()
+    rebuild_from = await traffic_rebuild_start(min(oldest, cutoff) if oldest else cutoff)
+    claimed = await claim_lease(
+        TRAFFIC_ROLLUP_STATE_ID,
+        {"$nor": [{"status": "done", "format": TRAFFIC_ROLLUP_FORMAT}]},
+        {"status": "running", "format": TRAFFIC_ROLLUP_FORMAT, "backfill_start": rebuild_from, "backfill_cutoff": cutoff}
+    )
+    if not claimed:
+        return None
+    await db.traffic_analytics.delete_many({"timestamp": {"$gte": rebuild_from}})
+    return rebuild_from, cutoff
+
+async def backfill_traffic_rollups(start: datetime, cutoff: datetime):
+    """Roll up every stored raw pageview in [start, cutoff), under the lease prepare_traffic_rollups claimed"""
+    finished = {}
+    try:
+        chunk = []
+        for name in await pageview_partitions_for_range(start=start, end=cutoff):
+            cursor = db[name].find(
+                {"timestamp": {"$gte": start, "$lt": cutoff}},
+                {"_id": 0, "page_path": 1, "session_id": 1, "timestamp": 1}
+            ).sort("timestamp", 1)
+            async for pageview in cursor:
+                chunk.append(pageview)
+                if len(chunk) >= TRAFFIC_BACKFILL_CHUNK:
+                    await renew_lease(TRAFFIC_ROLLUP_STATE_ID)
+                    await record_traffic_rollups(chunk)
+                    chunk = []
+        await renew_lease(TRAFFIC_ROLLUP_STATE_ID)
+        await record_traffic_rollups(chunk)
+        finished = {"status": "done", "completed_at": datetime.utcnow()}
+        logger.info("Traffic rollup backfill completed")
+    except Exception as e:
+        logger.error(f"Error backfilling traffic rollups: {str(e)}")
+    finally:
+        # An unfinished backfill stays "running" without an owner, for the next worker to take over
+        try:
+            await release_lease(TRAFFIC_ROLLUP_STATE_ID, finished)
+        except Exception as e:
+            logger.error(f"Error releasing the traffic rollup lease: {str(e)}")
+
+# Pageview Ingestion
+# Pageviews are buffered in memory and written with insert_many by size or by time.
+# When the buffer is full new pageviews are dropped (and counted) rather than slowing the site down.
+PAGEVIEW_BUFFER_MAX = int(os.environ.get('PAGEVIEW_BUFFER_MAX', '20000'))
+PAGEVIEW_FLUSH_BATCH = int(os.environ.get('PAGEVIEW_FLUSH_BATCH', '500'))
+PAGEVIEW_FLUSH_INTERVAL_SECONDS = float(os.environ.get('PAGEVIEW_FLUSH_INTERVAL_SECONDS', '2'))
+PAGEVIEW_BATCH_MAX_ITEMS = 50
+
+def new_pageview_document(analytics_data: "AnalyticsCreate") -> dict:
+    """Build a pageview document without re-validating through the PageView model"""
+    return {
+        "id": str(uuid.uuid4()),
+        "page_path": analytics_data.page_path,
+        "user_agent": analytics_data.user_agent,
+        "ip_address": analytics_data.ip_address,
+        "referrer": analytics_data.referrer,
+        "session_id": analytics_data.session_id,
+        "timestamp": datetime.utcnow(),
+        "duration": None
+    }
+
+async def write_pageview_batch(pageviews: List[dict]) -> List[dict]:
+    """Store a batch of pageviews and update everything derived from the stored ones, returning
+    the pageviews that could not be stored"""
+    stored, failed = await insert_pageviews(pageviews)
+    await record_pageview_counters(stored)
+    await record_traffic_rollups(stored)
+    return failed
+
+class PageviewBuffer:
+    """Bounded in-process queue of pageviews flushed in batches"""
+    
+    def __init__(self, writer, max_pending: int, batch_size: int, flush_interval: float):
+        self.writer = writer
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.accepted = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+    
+    def add(self, pageviews: List[dict]) -> int:
+        """Queue pageviews, returning how many were accepted"""
+        accepted = pageviews[:max(self.max_pending - len(self._pending), 0)]
+        self.dropped += len(pageviews) - len(accepted)
+        self.accepted += len(accepted)
+        self._pending.extend(accepted)
+        if len(self._pending) >= self.batch_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+        return len(accepted)
+    
+    async def flush(self):
+        """Write out everything pending, one batch at a time. Pageviews that could not be written go
+        back to the front of the queue for the next flush."""
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                try:
+                    failed = await self.writer(batch)
+                except asyncio.CancelledError:
+                    self._pending[:0] = batch
+                    raise
+                except Exception as e:
+                    failed = batch
+                    logger.error(f"Error flushing {len(batch)} pageviews: {str(e)}")
+                self.flushed += len(batch) - len(failed)
+                if failed:
+                    self.failed += len(failed)
+                    self._pending[:0] = failed
+                    logger.error(f"Requeued {len(failed)} pageviews that could not be stored")
+                    break
+    
+    async def drain(self):
+        """Wait for a flush started by add() and write out what is left (shutdown)"""
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+    
+    async def run(self):
+        """Background task: flush on a timer"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed
+        }
+
+pageview_buffer = PageviewBuffer(write_pageview_batch, PAGEVIEW_BUFFER_MAX, PAGEVIEW_FLUSH_BATCH, PAGEVIEW_FLUSH_INTERVAL_SECONDS)
+
+# View Counters
+# Detail endpoints count views in memory per (collection, id) and a background task writes them out
+# with one bulk_write of $inc per collection. Responses add the not-yet-written views to the stored
+# count. When VIEW_COUNTER_MAX_KEYS documents are pending, views of other documents are written
+# directly (and a flush is started) instead of growing the buffer.
+VIEW_COUNTER_FLUSH_INTERVAL_SECONDS = float(os.environ.get('VIEW_COUNTER_FLUSH_INTERVAL_SECONDS', '5'))
+VIEW_COUNTER_MAX_KEYS = int(os.environ.get('VIEW_COUNTER_MAX_KEYS', '10000'))
+
+class ViewCounterBuffer:
+    """Write-behind $inc counters for the views field of content documents"""
+    
+    def __init__(self, max_keys: int, flush_interval: float):
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+        self._pending: Dict[tuple, int] = {}
+        self._in_flight: Dict[tuple, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.direct_writes = 0
+        self.flushed = 0
+        self.failed = 0
+    
+    async def record(self, collection_name: str, doc_id: str) -> int:
+        """Count one view, returning the views of this document not yet in the database"""
+        key = (collection_name, doc_id)
+        self.recorded += 1
+        if key not in self._pending and len(self._pending) >= self.max_keys:
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.ensure_future(self.flush())
+            self.direct_writes += 1
+            await db[collection_name].update_one({"id": doc_id}, {"$inc": {"views": 1}})
+            return 1 + self._in_flight.get(key, 0)
+        self._pending[key] = self._pending.get(key, 0) + 1
+        return self._pending[key] + self._in_flight.get(key, 0)
+    
+    async def flush(self):
+        """Write out every pending increment"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._in_flight, self._pending = self._pending, {}
+            by_collection: Dict[str, List[tuple]] = {}
+            for key in self._in_flight:
+                by_collection.setdefault(key[0], []).append(key)
+            try:
+                for collection_name, keys in by_collection.items():
+                    operations = [UpdateOne({"id": doc_id}, {"$inc": {"views": self._in_flight[(collection_name, doc_id)]}}) for _, doc_id in keys]
+                    try:
+                        await db[collection_name].bulk_write(operations, ordered=False)
+                        failed = set()
+                    except BulkWriteError as e:
+                        # Unordered: every operation without a write error was applied
+                        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                        logger.error(f"Error flushing {len(failed)} view counters of {collection_name}: {str(e)}")
+                    except Exception as e:
+                        failed = set(range(len(keys)))
+                        logger.error(f"Error flushing {len(operations)} view counters of {collection_name}: {str(e)}")
+                    self.flushed += len(keys) - len(failed)
+                    self.failed += len(failed)
+                    for index, key in enumerate(keys):
+                        if index not in failed:
+                            del self._in_flight[key]
+            finally:
+                # Failed (or interrupted) increments go back to pending and are retried on the next flush
+                for key, count in self._in_flight.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+                self._in_flight = {}
+    
+    async def run(self):
+        """Background task: flush on a timer"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def drain(self):
+        """Wait for a flush started by record() and write out what is left (shutdown)"""
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_keys": len(self._pending),
+            "max_keys": self.max_keys,
+            "flush_interval_seconds": self.flush_interval,
+            "recorded": self.recorded,
+            "direct_writes": self.direct_writes,
+            "flushed_keys": self.flushed,
+            "failed_keys": self.failed
+        }
+
+view_counters = ViewCounterBuffer(VIEW_COUNTER_MAX_KEYS, VIEW_COUNTER_FLUSH_INTERVAL_SECONDS)
+
+# Wallet Ledger
+# Every wallet balance change goes through wallet_ledger.apply. The users document is changed with one
+# conditional find_one_and_update (a debit only matches while wallet_balance still covers it, so racing
+# requests cannot overdraw or lose each other's updates) and the transactions entry recording the change
+# is written next to it. On a replica set or mongos both writes share one multi-document transaction.
+# Otherwise the change also pushes a marker onto the user's wallet_pending list: the marker is pulled
+# once the entry is stored, and if storing it fails the change is reverted by an update that only
+# matches while the marker is still there, so compensating twice is harmless. When the outcome of the
+# write is unknown (network error, timeout) the marker is left in place: markers older than
+# WALLET_PENDING_GRACE_SECONDS are settled by keeping changes whose entry is stored as completed and
+# reverting the rest. A change can also claim another document (a pending deposit being approved, a
+# pending post being rejected): the claim is a conditional status change made in the same transaction,
+# or recorded on the marker so that reverting the change also puts the status back.
+WALLET_TRANSACTIONS = os.environ.get('WALLET_TRANSACTIONS', 'auto').lower()  # auto, on or off
+WALLET_PENDING_GRACE_SECONDS = float(os.environ.get('WALLET_PENDING_GRACE_SECONDS', '300'))
+WALLET_BALANCE_FIELDS = {"_id": 0, "id": 1, "wallet_balance": 1}
+MEMBER_POSTING_FEE = 50000  # Charged by /member/posts/create, refunded when the post is rejected
+
+class WalletLedger:
+    """Atomic wallet balance changes, each paired with its transactions ledger entry"""
+    
+    def __init__(self, mode: str, grace_seconds: float):
+        self.mode = mode
+        self.grace_seconds = grace_seconds
+        self.use_transactions = mode == "on"
+        self.applied = 0
+        self.declined = 0
+        self.compensated = 0
+        self.settled = 0
+    
+    async def detect(self):
+        """In auto mode, use transactions when connected to a replica set or mongos"""
+        if self.mode != "auto":
+            return
+        try:
+            hello = await client.admin.command("hello")
+        except Exception as e:
+            logger.warning(f"Could not detect transaction support, wallet ledger uses compensation: {str(e)}")
+            hello = {}
+        self.use_transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+    
+    async def apply(self, user_id: str, amount: float, entry: Optional[dict], allow_overdraft: bool = False,
+                    claim: Optional[dict] = None) -> Optional[float]:
+        """Add amount (negative for a debit) to the wallet and record entry in transactions.
+        
+        claim ({"collection", "id", "status", "set"}) moves another document out of `status` with the
+        `set` fields, together with the balance change. entry may be None when the claimed document is
+        itself the ledger entry (a pending deposit set to completed).
+        
+        Returns the new balance, or None when the user does not exist, cannot cover the debit or the
+        claimed document is no longer in `status`."""
+        query = {"id": user_id}
+        if amount < 0 and not allow_overdraft:
+            query["wallet_balance"] = {"$gte": -amount}
+        if self.use_transactions:
+            balance = await self._apply_in_transaction(query, amount, entry, claim)
+        else:
+            balance = await self._apply_with_compensation(query, amount, entry, claim)
+        if balance is None:
+            self.declined += 1
+            return None
+        self.applied += 1
+        principal_cache.invalidate_user(user_id)
+        return balance
+    
+    async def _apply_in_transaction(self, query: dict, amount: float, entry: Optional[dict], claim: Optional[dict]) -> Optional[float]:
+        async def write(session):
+            user = await db.users.find_one_and_update(
+                query,
+                {"$inc": {"wallet_balance": amount}, "$set": {"updated_at": datetime.utcnow()}},
+                projection=WALLET_BALANCE_FIELDS,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if user is None:
+                return None
+            if claim:
+                result = await db[claim["collection"]].update_one(
+                    {"id": claim["id"], "status": claim["status"]}, {"$set": claim["set"]}, session=session
+                )
+                if result.modified_count == 0:
+                    await session.abort_transaction()
+                    return None
+            if entry:
+                await db.transactions.insert_one(dict(entry), session=session)
+            return user["wallet_balance"]
+        
+        async with await client.start_session() as session:
+            return await session.with_transaction(write)
+    
+    async def _apply_with_compensation(self, query: dict, amount: float, entry: Optional[dict], claim: Optional[dict]) -> Optional[float]:
+        user_id = query["id"]
+        entry_id = entry["id"] if entry else claim["id"]
+        now = datetime.utcnow()
+        marker = {"id": entry_id, "amount": amount, "at": now}
+        if claim:
+            marker["claim"] = claim
+        user = await db.users.find_one_and_update(
+            {**query, "wallet_pending.id": {"$ne": entry_id}},
+            {"$inc": {"wallet_balance": amount}, "$set": {"updated_at": now}, "$push": {"wallet_pending": marker}},
+            projection=WALLET_BALANCE_FIELDS,
+            return_document=ReturnDocument.AFTER
+        )
+        if user is None:
+            return None
+        try:
+            if claim:
+                result = await db[claim["collection"]].update_one(
+                    {"id": claim["id"], "status": claim["status"]}, {"$set": claim["set"]}
+                )
+                if result.modified_count == 0:
+                    await self.compensate(user_id, entry_id, amount)
+                    return None
+            if entry:
+                await db.transactions.insert_one(dict(entry))
+        except WriteError:
+            # Rejected by the server: nothing of the entry was stored
+            await self.revert_claim(claim)
+            await self.compensate(user_id, entry_id, amount)
+            raise
+        except Exception:
+            # The write may still have happened; unless the entry is visibly stored, settle_pending decides later
+            if not await self.recorded_entry_ids([entry_id]):
+                logger.warning(f"Wallet change {entry_id} of user {user_id} left pending for settlement")
+                raise
+        await db.users.update_one({"id": user_id}, {"$pull": {"wallet_pending": {"id": entry_id}}})
+        return user["wallet_balance"]
+    
+    async def recorded_entry_ids(self, entry_ids: List[str]) -> set:
+        """Ids among entry_ids whose ledger entry is stored as completed"""
+        recorded = await db.transactions.find(
+            {"id": {"$in": entry_ids}, "status": TransactionStatus.completed}, {"_id": 0, "id": 1}
+        ).to_list(len(entry_ids))
+        return {transaction["id"] for transaction in recorded}
+    
+    async def revert_claim(self, claim: Optional[dict]):
+        """Put a claimed document back into the status it was claimed from (no-op if it never left it)"""
+        if claim:
+            await db[claim["collection"]].update_one(
+                {"id": claim["id"], "status": claim["set"]["status"]},
+                {"$set": {"status": claim["status"], "updated_at": datetime.utcnow()}}
+            )
+    
+    async def compensate(self, user_id: str, entry_id: str, amount: float):
+        """Revert a pending change whose ledger entry was not stored (no-op once reverted)"""
+        result = await db.users.update_one(
+            {"id": user_id, "wallet_pending.id": entry_id},
+            {"$inc": {"wallet_balance": -amount}, "$pull": {"wallet_pending": {"id": entry_id}}}
+        )
+        if result.modified_count:
+            self.compensated += 1
+            principal_cache.invalidate_user(user_id)
+    
+    async def settle_pending(self):
+        """Resolve markers older than the grace period: keep changes whose entry is stored as completed,
+        revert the rest together with their claims"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+        async for user in db.users.find({"wallet_pending.at": {"$lt": cutoff}}, {"_id": 0, "id": 1, "wallet_pending": 1}):
+            stale = [marker for marker in user["wallet_pending"] if marker["at"] < cutoff]
+            recorded_ids = await self.recorded_entry_ids([marker["id"] for marker in stale])
+            for marker in stale:
+                if marker["id"] in recorded_ids:
+                    await db.users.update_one({"id": user["id"]}, {"$pull": {"wallet_pending": {"id": marker["id"]}}})
+                else:
+                    await self.revert_claim(marker.get("claim"))
+                    await self.compensate(user["id"], marker["id"], marker["amount"])
+                self.settled += 1
+    
+    async def run(self):
+        """Background task: settle markers left by interrupted changes"""
+        while True:
+            if not self.use_transactions:
+                try:
+                    await self.settle_pending()
+                except Exception as e:
+                    logger.error(f"Error settling pending wallet changes: {str(e)}")
+            await asyncio.sleep(self.grace_seconds)
+    
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "transactions": self.use_transactions,
+            "applied": self.applied,
+            "declined": self.declined,
+            "compensated": self.compensated,
+            "settled": self.settled
+        }
+
+wallet_ledger = WalletLedger(WALLET_TRANSACTIONS, WALLET_PENDING_GRACE_SECONDS)
+
+async def wallet_balance(user_id: str) -> float:
+    user = await db.users.find_one({"id": user_id}, WALLET_BALANCE_FIELDS)
+    return user.get("wallet_balance", 0.0) if user else 0.0
+
+async def refund_post_fee(user_id: str, fee: float, post_id: str, admin_notes: Optional[str] = None,
+                          claim: Optional[dict] = None):
+    """Credit a post fee back to its payer with a refund ledger entry (see WalletLedger.apply for claim)"""
+    transaction = Transaction(
+        user_id=user_id,
+        amount=fee,
+        transaction_type=TransactionType.refund,
+        description=f"Refund of post fee for post {post_id}",
+        status=TransactionStatus.completed,
+        reference_id=post_id,
+        admin_notes=admin_notes,
+        completed_at=datetime.utcnow()
+    )
+    return await wallet_ledger.apply(user_id, fee, transaction.dict(), claim=claim)
+
+async def approve_pending_deposit(transaction: dict, completed_fields: dict) -> float:
+    """Set a pending deposit to completed and credit its amount, as one wallet ledger change"""
+    claim = {"collection": "transactions", "id": transaction["id"], "status": TransactionStatus.pending, "set": completed_fields}
+    balance = await wallet_ledger.apply(transaction["user_id"], transaction["amount"], None, claim=claim)
+    if balance is None:
+        if not await db.users.find_one({"id": transaction["user_id"]}, {"_id": 0, "id": 1}):
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=400, detail="Transaction is not pending")
+    return balance
+
+# Wallet & Transaction Routes
+@api_router.get("/wallet/balance")
+async def get_wallet_balance(current_user: AuthPrincipal = Depends(get_current_user)):
+    """Get user wallet balance"""
+    return {
+        "balance": current_user.wallet_balance,
+        "user_id": current_user.id
+    }
+
+@api_router.post("/wallet/deposit")
+async def deposit_money(deposit_request: DepositRequest, current_user: AuthPrincipal = Depends(get_current_user)):
+    """Request money deposit (requires admin approval)"""
+    if deposit_request.amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be greater than 0")
+    
+    # Create transaction record
+    transaction_dict = {
+        "id": str(uuid.uuid4()),
+        "user_id": current_user.id,
+        "amount": deposit_request.amount,
+        "transaction_type": "deposit",
+        "status": "pending",
+        "description": deposit_request.description,
+        "transfer_bill": deposit_request.transfer_bill,
+        "method": "Bank Transfer",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    
+    await externalize_inline_images("transactions", transaction_dict)
+    await db.transactions.insert_one(transaction_dict)
+    
+    return {
+        "message": "Deposit request created successfully. Waiting for admin approval.",
+        "transaction_id": transaction_dict["id"],
+        "amount": deposit_request.amount
+    }
+
+@api_router.get("/wallet/transactions", response_model=List[Transaction])
+async def get_user_transactions(
+    response: Response,
+    current_user: AuthPrincipal = Depends(get_current_user),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, le=100),
+    transaction_type: Optional[TransactionType] = None
+):
+    """Get user transaction history"""
+    filter_query = {"user_id": current_user.id}
+    if transaction_type:
+        filter_query["transaction_type"] = transaction_type
+    
+    page_query = keyset_query(filter_query, "created_at", -1, cursor)
+    transactions = await db.transactions.find(page_query).sort(keyset_sort("created_at", -1)).skip(0 if cursor else skip).limit(limit).to_list(limit)
+    set_next_cursor(response, transactions, limit, "created_at", -1)
+    return [Transaction(**txn) for txn in transactions]
+
+# Admin Transaction Management Routes
+@api_router.get("/admin/transactions", response_model=List[Transaction])
+async def get_all_transactions(
+    response: Response,
+    current_admin: AuthPrincipal = Depends(get_current_admin),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, le=200),
+    status: Optional[TransactionStatus] = None,
+    transaction_type: Optional[TransactionType] = None
+):
+    """Get all transactions - Admin only"""
+    filter_query = {}
+    if status:
+        filter_query["status"] = status
+    if transaction_type:
+        filter_query["transaction_type"] = transaction_type
+    
+    page_query = keyset_query(filter_query, "created_at", -1, cursor)
+    transactions = await db.transactions.find(page_query).sort(keyset_sort("created_at", -1)).skip(0 if cursor else skip).limit(limit).to_list(limit)
+    set_next_cursor(response, transactions, limit, "created_at", -1)
+    return [Transaction(**txn) for txn in transactions]
+
+@api_router.put("/admin/transactions/{transaction_id}/approve")
+async def approve_transaction(
+    transaction_id: str,
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Approve transaction and update user balance - Admin only"""
+    transaction = await db.transactions.find_one({"id": transaction_id})
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    if transaction["status"] != "pending":
+        raise HTTPException(status_code=400, detail="Transaction is not pending")
+    
+    completed = {
+        "status": "completed",
+        "completed_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        "admin_notes": f"Approved by admin: {current_admin.username}"
+    }
+    # Deposits credit the wallet together with the status change; only the request that moves it out of pending does
+    if transaction["transaction_type"] == "deposit":
+        await approve_pending_deposit(transaction, completed)
+    else:
+        result = await db.transactions.update_one({"id": transaction_id, "status": "pending"}, {"$set": completed})
+        if result.modified_count == 0:
+            raise HTTPException(status_code=400, detail="Transaction is not pending")
+    
+    return {"message": "Transaction approved successfully"}
+
+@api_router.put("/admin/transactions/{transaction_id}/reject")
 async def reject_transaction(
     transaction_id: str,
     admin_notes: str,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     """Reject transaction - Admin only"""
     transaction = await db.transactions.find_one({"id": transaction_id})
@@ -859,7 +3368,7 @@ async def register(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     user_dict = {
         "id": str(uuid.uuid4()),
         "username": user_data.username,
@@ -895,7 +3404,7 @@ async def register(user_data: UserCreate):
 async def login(user_credentials: UserLogin):
     """Login user and return access token"""
     user = await db.users.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+    if not user or not await verify_password_async(user_credentials.password, user["hashed_password"]):
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
@@ -926,12 +3435,15 @@ async def login(user_credentials: UserLogin):
     }
 
 @api_router.get("/auth/me", response_model=UserProfile)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: AuthPrincipal = Depends(get_current_user)):
     """Get current user information"""
-    return UserProfile(**current_user.dict())
+    user = await db.users.find_one({"id": current_user.id}, {"hashed_password": 0})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return UserProfile(**user)
 
 @api_router.put("/auth/profile", response_model=UserProfile)
-async def update_profile(user_update: UserUpdate, current_user: User = Depends(get_current_user)):
+async def update_profile(user_update: UserUpdate, current_user: AuthPrincipal = Depends(get_current_user)):
     """Update user profile"""
     update_data = {k: v for k, v in user_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
@@ -940,7 +3452,9 @@ async def update_profile(user_update: UserUpdate, current_user: User = Depends(g
     if update_data.get("full_name") and update_data.get("phone"):
         update_data["profile_completed"] = True
     
+    await externalize_inline_images("users", update_data)
     await db.users.update_one({"id": current_user.id}, {"$set": update_data})
+    principal_cache.invalidate_user(current_user.id)
     updated_user = await db.users.find_one({"id": current_user.id})
     return UserProfile(**updated_user)
 
@@ -948,18 +3462,12 @@ async def update_profile(user_update: UserUpdate, current_user: User = Depends(g
 @api_router.post("/member/posts", response_model=MemberPost)
 async def create_member_post(
     post_data: MemberPostCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Create new post by member (requires approval)"""
-    # Check if user has sufficient balance (post fee = 50,000 VND)
+    # Post fee = 50,000 VND
     POST_FEE = 50000.0
     
-    if current_user.wallet_balance < POST_FEE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Insufficient balance. Required: {POST_FEE:,.0f} VNĐ, Available: {current_user.wallet_balance:,.0f} VNĐ"
-        )
-    
     # Create post
     post_dict = post_data.dict()
     post_dict["id"] = str(uuid.uuid4())
@@ -972,15 +3480,8 @@ async def create_member_post(
     post_dict["expires_at"] = datetime.utcnow() + timedelta(days=30)
     
     post_obj = MemberPost(**post_dict)
-    await db.member_posts.insert_one(post_obj.dict())
-    
-    # Deduct post fee and create transaction
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$inc": {"wallet_balance": -POST_FEE}}
-    )
     
-    # Create transaction record
+    # Deduct post fee and create transaction; the debit is refused if the balance cannot cover it
     transaction_dict = {
         "id": str(uuid.uuid4()),
         "user_id": current_user.id,
@@ -993,14 +3494,23 @@ async def create_member_post(
         "updated_at": datetime.utcnow(),
         "completed_at": datetime.utcnow()
     }
+    if await wallet_ledger.apply(current_user.id, -POST_FEE, transaction_dict) is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient balance. Required: {POST_FEE:,.0f} VNĐ, Available: {await wallet_balance(current_user.id):,.0f} VNĐ"
+        )
     
-    await db.transactions.insert_one(transaction_dict)
+    try:
+        await db.member_posts.insert_one(await externalize_inline_images("member_posts", post_obj.dict()))
+    except Exception:
+        await refund_post_fee(current_user.id, POST_FEE, post_obj.id)
+        raise
     
     return post_obj
 
 @api_router.get("/member/posts", response_model=List[MemberPost])
 async def get_member_posts(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthPrincipal = Depends(get_current_user),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     status: Optional[PostStatus] = None
@@ -1016,7 +3526,7 @@ async def get_member_posts(
 @api_router.get("/member/posts/{post_id}", response_model=MemberPost)
 async def get_member_post(
     post_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Get specific member post"""
     post = await db.member_posts.find_one({"id": post_id, "author_id": current_user.id})
@@ -1028,7 +3538,7 @@ async def get_member_post(
 async def update_member_post(
     post_id: str,
     post_update: MemberPostCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Update member post (only if pending or rejected)"""
     post = await db.member_posts.find_one({"id": post_id, "author_id": current_user.id})
@@ -1052,7 +3562,7 @@ async def update_member_post(
 @api_router.delete("/member/posts/{post_id}")
 async def delete_member_post(
     post_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Delete member post (only if not approved)"""
     post = await db.member_posts.find_one({"id": post_id, "author_id": current_user.id})
@@ -1065,10 +3575,21 @@ async def delete_member_post(
     await db.member_posts.delete_one({"id": post_id})
     return {"message": "Post deleted successfully"}
 
+# Author enrichment for admin queues: one $in query per page instead of one find_one per row
+USER_CONTACT_FIELDS = {"_id": 0, "id": 1, "username": 1, "full_name": 1, "email": 1}
+
+async def users_by_id(user_ids) -> Dict[str, dict]:
+    """Name and email of the given users, keyed by id"""
+    ids = list({user_id for user_id in user_ids if user_id})
+    if not ids:
+        return {}
+    users = await db.users.find({"id": {"$in": ids}}, USER_CONTACT_FIELDS).to_list(len(ids))
+    return {user["id"]: user for user in users}
+
 # Admin Post Approval Routes
 @api_router.get("/admin/posts/pending", response_model=List[MemberPost])
 async def get_pending_posts(
-    current_admin: User = Depends(get_current_admin),
+    current_admin: AuthPrincipal = Depends(get_current_admin),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
     post_type: Optional[PostType] = None
@@ -1081,8 +3602,9 @@ async def get_pending_posts(
     posts = await db.member_posts.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Add author information
+    authors = await users_by_id(post["author_id"] for post in posts)
     for post in posts:
-        author = await db.users.find_one({"id": post["author_id"]})
+        author = authors.get(post["author_id"])
         if author:
             post["author_name"] = author.get("full_name", author["username"])
             post["author_email"] = author["email"]
@@ -1091,7 +3613,7 @@ async def get_pending_posts(
 
 @api_router.get("/admin/posts", response_model=List[MemberPost])
 async def get_all_posts(
-    current_admin: User = Depends(get_current_admin),
+    current_admin: AuthPrincipal = Depends(get_current_admin),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
     status: Optional[PostStatus] = None,
@@ -1107,19 +3629,106 @@ async def get_all_posts(
     posts = await db.member_posts.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Add author information
+    authors = await users_by_id(post["author_id"] for post in posts)
     for post in posts:
-        author = await db.users.find_one({"id": post["author_id"]})
+        author = authors.get(post["author_id"])
         if author:
             post["author_name"] = author.get("full_name", author["username"])
             post["author_email"] = author["email"]
     
     return [MemberPost(**post) for post in posts]
 
+# Listing document an approved member post is copied to. Posts created through /member/posts carry the
+# listing fields themselves (post_type property/land/sim); posts created through /member/posts/create
+# keep the submitted form under "data" (post_type properties/lands/sims).
+MEMBER_POST_DATA_COLLECTIONS = {"properties", "lands", "sims"}
+
+def member_post_listing(post: dict, featured: bool = False) -> Tuple[Optional[str], Optional[dict]]:
+    """Target collection and document for an approved member post, (None, None) for unknown types"""
+    if "data" in post:
+        if post["post_type"] not in MEMBER_POST_DATA_COLLECTIONS:
+            return None, None
+        listing = dict(post["data"])
+        listing["id"] = str(uuid.uuid4())
+        listing["created_at"] = datetime.utcnow()
+        listing["updated_at"] = datetime.utcnow()
+        listing["views"] = 0
+        return post["post_type"], listing
+    
+    if post["post_type"] == "property":
+        return "properties", {
+            "id": post["id"],
+            "title": post["title"],
+            "description": post["description"],
+            "property_type": post["property_type"],
+            "status": post["property_status"],
+            "price": post["price"],
+            "area": post["area"],
+            "bedrooms": post["bedrooms"],
+            "bathrooms": post["bathrooms"],
+            "address": post["address"],
+            "district": post["district"],
+            "city": post["city"],
+            "images": post["images"],
+            "featured": featured,
+            "contact_phone": post["contact_phone"],
+            "contact_email": post["contact_email"],
+            "agent_name": post.get("author_name", ""),
+            "created_at": post["created_at"],
+            "updated_at": datetime.utcnow(),
+            "views": 0
+        }
+    
+    if post["post_type"] == "land":
+        return "lands", {
+            "id": post["id"],
+            "title": post["title"],
+            "description": post["description"],
+            "land_type": post["land_type"],
+            "status": post["property_status"] or "for_sale",
+            "price": post["price"],
+            "area": post["area"],
+            "width": post.get("width"),
+            "length": post.get("length"),
+            "address": post["address"],
+            "district": post["district"],
+            "city": post["city"],
+            "legal_status": post.get("legal_status", "Sổ đỏ"),
+            "orientation": post.get("orientation"),
+            "road_width": post.get("road_width"),
+            "images": post["images"],
+            "featured": featured,
+            "contact_phone": post["contact_phone"],
+            "contact_email": post["contact_email"],
+            "agent_name": post.get("author_name", ""),
+            "created_at": post["created_at"],
+            "updated_at": datetime.utcnow(),
+            "views": 0
+        }
+    
+    if post["post_type"] == "sim":
+        return "sims", {
+            "id": post["id"],
+            "phone_number": post["phone_number"],
+            "network": post["network"],
+            "sim_type": post["sim_type"],
+            "price": post["price"],
+            "is_vip": post["is_vip"],
+            "features": post["features"],
+            "description": post["description"],
+            "status": "available",
+            "created_at": post["created_at"],
+            "updated_at": datetime.utcnow(),
+            "views": 0
+        }
+    
+    return None, None
+
 @api_router.put("/admin/posts/{post_id}/approve")
 async def approve_post(
     post_id: str,
     approval_data: PostApproval,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     """Approve or reject member post - Admin only"""
     post = await db.member_posts.find_one({"id": post_id})
@@ -1138,75 +3747,9 @@ async def approve_post(
         update_data["featured"] = approval_data.featured
         
         # Copy to main collections based on post type
-        if post["post_type"] == "property":
-            property_dict = {
-                "id": post["id"],
-                "title": post["title"],
-                "description": post["description"],
-                "property_type": post["property_type"],
-                "status": post["property_status"],
-                "price": post["price"],
-                "area": post["area"],
-                "bedrooms": post["bedrooms"],
-                "bathrooms": post["bathrooms"],
-                "address": post["address"],
-                "district": post["district"],
-                "city": post["city"],
-                "images": post["images"],
-                "featured": approval_data.featured,
-                "contact_phone": post["contact_phone"],
-                "contact_email": post["contact_email"],
-                "agent_name": post.get("author_name", ""),
-                "created_at": post["created_at"],
-                "updated_at": datetime.utcnow(),
-                "views": 0
-            }
-            await db.properties.insert_one(property_dict)
-        
-        elif post["post_type"] == "land":
-            land_dict = {
-                "id": post["id"],
-                "title": post["title"],
-                "description": post["description"],
-                "land_type": post["land_type"],
-                "status": post["property_status"] or "for_sale",
-                "price": post["price"],
-                "area": post["area"],
-                "width": post.get("width"),
-                "length": post.get("length"),
-                "address": post["address"],
-                "district": post["district"],
-                "city": post["city"],
-                "legal_status": post.get("legal_status", "Sổ đỏ"),
-                "orientation": post.get("orientation"),
-                "road_width": post.get("road_width"),
-                "images": post["images"],
-                "featured": approval_data.featured,
-                "contact_phone": post["contact_phone"],
-                "contact_email": post["contact_email"],
-                "agent_name": post.get("author_name", ""),
-                "created_at": post["created_at"],
-                "updated_at": datetime.utcnow(),
-                "views": 0
-            }
-            await db.lands.insert_one(land_dict)
-        
-        elif post["post_type"] == "sim":
-            sim_dict = {
-                "id": post["id"],
-                "phone_number": post["phone_number"],
-                "network": post["network"],
-                "sim_type": post["sim_type"],
-                "price": post["price"],
-                "is_vip": post["is_vip"],
-                "features": post["features"],
-                "description": post["description"],
-                "status": "available",
-                "created_at": post["created_at"],
-                "updated_at": datetime.utcnow(),
-                "views": 0
-            }
-            await db.sims.insert_one(sim_dict)
+        collection_name, listing = member_post_listing(post, approval_data.featured)
+        if listing is not None:
+            await insert_content_document(collection_name, listing)
     
     elif approval_data.status == "rejected":
         update_data["rejection_reason"] = approval_data.rejection_reason
@@ -1215,10 +3758,189 @@ async def approve_post(
     
     return {"message": f"Post {approval_data.status} successfully"}
 
+# Bulk Moderation
+# Clears several queued member posts per request. The posts are loaded with one $in query and moved out
+# of pending with one bulk_write of conditional updates tagged with a batch id, so a post another admin
+# handled in the meantime is reported as not_pending instead of being approved or refunded twice.
+# Approved listings are grouped by target collection into insert_many; a post whose listing cannot be
+# stored goes back to pending. Rejected /member/posts/create posts are instead claimed one by one
+# together with their refund (wallet_ledger.apply with a claim, run concurrently), so a post is never
+# left rejected without its refund.
+BULK_MODERATION_LIMIT = 200
+BULK_APPROVAL_FIELDS = ["admin_notes", "approved_by", "approved_at", "featured", "moderation_batch"]
+
+class BulkPostModeration(BaseModel):
+    post_ids: List[str]
+    admin_notes: Optional[str] = None
+    rejection_reason: Optional[str] = None
+    featured: bool = False
+
+class BulkPostOutcome(BaseModel):
+    post_id: str
+    outcome: str  # approved, rejected, not_found, not_pending or failed
+    detail: Optional[str] = None
+    listing_id: Optional[str] = None
+    refunded: float = 0.0
+
+class BulkModerationReport(BaseModel):
+    counts: Dict[str, int]
+    results: List[BulkPostOutcome]
+
+def bulk_post_ids(moderation: BulkPostModeration) -> List[str]:
+    post_ids = list(dict.fromkeys(moderation.post_ids))
+    if not post_ids:
+        raise HTTPException(status_code=400, detail="post_ids must not be empty")
+    if len(post_ids) > BULK_MODERATION_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MODERATION_LIMIT} posts per request")
+    return post_ids
+
+async def pending_posts(post_ids: List[str]) -> Tuple[Dict[str, dict], Dict[str, BulkPostOutcome]]:
+    """Load the pending posts among post_ids by id, with outcomes for the others"""
+    posts = {post["id"]: post for post in await db.member_posts.find({"id": {"$in": post_ids}}, {"_id": 0}).to_list(len(post_ids))}
+    outcomes: Dict[str, BulkPostOutcome] = {}
+    for post_id in post_ids:
+        if post_id not in posts:
+            outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="not_found", detail="Post not found")
+        elif posts[post_id]["status"] != "pending":
+            outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="not_pending", detail=f"Post is {posts[post_id]['status']}")
+    return {post_id: posts[post_id] for post_id in post_ids if post_id not in outcomes}, outcomes
+
+async def claim_pending_posts(posts: Dict[str, dict], status_update: dict) -> Tuple[Dict[str, dict], Dict[str, BulkPostOutcome]]:
+    """Move posts (loaded by pending_posts) to status_update.
+    
+    Returns the claimed posts by id and the outcomes of the posts that were no longer pending."""
+    outcomes: Dict[str, BulkPostOutcome] = {}
+    candidates = list(posts)
+    if not candidates:
+        return {}, outcomes
+    
+    batch_id = str(uuid.uuid4())
+    result = await db.member_posts.bulk_write([
+        UpdateOne({"id": post_id, "status": "pending"}, {"$set": {**status_update, "moderation_batch": batch_id}})
+        for post_id in candidates
+    ], ordered=False)
+    if result.modified_count < len(candidates):
+        # Some posts left pending between the read and the write
+        claimed = await db.member_posts.find({"moderation_batch": batch_id}, {"_id": 0, "id": 1}).to_list(len(candidates))
+        claimed_ids = {post["id"] for post in claimed}
+        for post_id in candidates:
+            if post_id not in claimed_ids:
+                outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="not_pending", detail="Post is no longer pending")
+        candidates = [post_id for post_id in candidates if post_id in claimed_ids]
+    return {post_id: posts[post_id] for post_id in candidates}, outcomes
+
+def moderation_report(post_ids: List[str], outcomes: Dict[str, BulkPostOutcome]) -> BulkModerationReport:
+    results = [outcomes[post_id] for post_id in post_ids]
+    return BulkModerationReport(counts=dict(Counter(result.outcome for result in results)), results=results)
+
+@api_router.post("/admin/posts/bulk-approve", response_model=BulkModerationReport)
+async def bulk_approve_posts(
+    moderation: BulkPostModeration,
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Approve several member posts and copy them to the listing collections - Admin only"""
+    post_ids = bulk_post_ids(moderation)
+    now = datetime.utcnow()
+    posts, outcomes = await pending_posts(post_ids)
+    claimed, lost = await claim_pending_posts(posts, {
+        "status": "approved",
+        "admin_notes": moderation.admin_notes,
+        "approved_by": current_admin.id,
+        "approved_at": now,
+        "featured": moderation.featured,
+        "updated_at": now
+    })
+    outcomes.update(lost)
+    
+    by_collection: Dict[str, List[Tuple[str, dict]]] = {}
+    failed = []
+    for post_id, post in claimed.items():
+        try:
+            collection_name, listing = member_post_listing(post, moderation.featured)
+        except KeyError as e:
+            outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="failed", detail=f"Post is missing {e}")
+            failed.append(post_id)
+            continue
+        if listing is None:
+            outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="approved")
+        else:
+            by_collection.setdefault(collection_name, []).append((post_id, listing))
+    
+    for collection_name, entries in by_collection.items():
+        try:
+            _, rejected = await insert_content_documents(collection_name, [listing for _, listing in entries])
+        except Exception as e:
+            rejected = {index: str(e) for index in range(len(entries))}
+        for index, (post_id, listing) in enumerate(entries):
+            if index in rejected:
+                outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="failed", detail=rejected[index])
+                failed.append(post_id)
+            else:
+                outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="approved", listing_id=listing["id"])
+    
+    if failed:
+        # Put posts whose listing could not be stored back in the queue
+        await db.member_posts.bulk_write([
+            UpdateOne(
+                {"id": post_id},
+                {"$set": {"status": "pending", "updated_at": now}, "$unset": {field: "" for field in BULK_APPROVAL_FIELDS}}
+            )
+            for post_id in failed
+        ], ordered=False)
+    
+    return moderation_report(post_ids, outcomes)
+
+@api_router.post("/admin/posts/bulk-reject", response_model=BulkModerationReport)
+async def bulk_reject_posts(
+    moderation: BulkPostModeration,
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Reject several member posts, refunding posting fees - Admin only"""
+    post_ids = bulk_post_ids(moderation)
+    now = datetime.utcnow()
+    rejected = {
+        "status": "rejected",
+        "admin_notes": moderation.admin_notes,
+        "rejection_reason": moderation.rejection_reason,
+        "approved_by": current_admin.id,
+        "rejected_at": now,
+        "updated_at": now
+    }
+    posts, outcomes = await pending_posts(post_ids)
+    # Same rule as reject_member_post: only /member/posts/create posts of existing users are refunded
+    payers = {user["id"] for user in await db.users.find(
+        {"id": {"$in": list({post["user_id"] for post in posts.values() if "data" in post})}}, {"_id": 0, "id": 1}
+    ).to_list(None)}
+    refundable = {post_id: post for post_id, post in posts.items() if "data" in post and post["user_id"] in payers}
+    
+    claimed, lost = await claim_pending_posts({post_id: post for post_id, post in posts.items() if post_id not in refundable}, rejected)
+    outcomes.update(lost)
+    for post_id in claimed:
+        outcomes[post_id] = BulkPostOutcome(post_id=post_id, outcome="rejected")
+    
+    async def reject_with_refund(post_id: str, post: dict) -> BulkPostOutcome:
+        claim = {"collection": "member_posts", "id": post_id, "status": "pending", "set": rejected}
+        try:
+            refunded = await refund_post_fee(
+                post["user_id"], MEMBER_POSTING_FEE, post_id, admin_notes=f"Refunded by admin {current_admin.username}", claim=claim
+            )
+        except Exception as e:
+            # The post stays (or, once the wallet change is settled, goes back to) pending
+            logger.error(f"Error refunding rejected post {post_id}: {str(e)}")
+            return BulkPostOutcome(post_id=post_id, outcome="failed", detail=f"Refund failed: {str(e)}")
+        if refunded is None:
+            return BulkPostOutcome(post_id=post_id, outcome="not_pending", detail="Post is no longer pending")
+        return BulkPostOutcome(post_id=post_id, outcome="rejected", refunded=MEMBER_POSTING_FEE)
+    
+    for outcome in await asyncio.gather(*[reject_with_refund(post_id, post) for post_id, post in refundable.items()]):
+        outcomes[outcome.post_id] = outcome
+    
+    return moderation_report(post_ids, outcomes)
+
 # Admin User Management Routes
 @api_router.get("/admin/users", response_model=List[UserProfile])
 async def get_all_users(
-    current_admin: User = Depends(get_current_admin),
+    current_admin: AuthPrincipal = Depends(get_current_admin),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
     role: Optional[UserRole] = None,
@@ -1244,7 +3966,7 @@ async def get_all_users(
 @api_router.get("/admin/users/{user_id}", response_model=UserProfile)
 async def get_user_by_id(
     user_id: str,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     """Get user by ID - Admin only"""
     user = await db.users.find_one({"id": user_id})
@@ -1257,7 +3979,7 @@ async def update_user_status(
     user_id: str,
     status: UserStatus,
     admin_notes: Optional[str] = None,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     """Update user status - Admin only"""
     user = await db.users.find_one({"id": user_id})
@@ -1276,6 +3998,7 @@ async def update_user_status(
             }
         }
     )
+    principal_cache.invalidate_user(user_id)
     
     return {"message": f"User status updated to {status}"}
 
@@ -1284,20 +4007,10 @@ async def adjust_user_balance(
     user_id: str,
     amount: float,
     description: str,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     """Adjust user wallet balance - Admin only"""
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Update user balance
-    await db.users.update_one(
-        {"id": user_id},
-        {"$inc": {"wallet_balance": amount}}
-    )
-    
-    # Create transaction record
+    # Update user balance and create transaction record
     transaction_dict = {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
@@ -1311,7 +4024,8 @@ async def adjust_user_balance(
         "completed_at": datetime.utcnow()
     }
     
-    await db.transactions.insert_one(transaction_dict)
+    if await wallet_ledger.apply(user_id, amount, transaction_dict, allow_overdraft=True) is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
     return {"message": f"User balance adjusted by {amount:,.0f} VNĐ"}
 
@@ -1328,7 +4042,7 @@ class AdminUserUpdate(BaseModel):
 async def update_user_profile(
     user_id: str,
     user_update: AdminUserUpdate,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     """Update user profile information - Admin only"""
     print(f"=== ADMIN USER UPDATE DEBUG START ===")
@@ -1403,6 +4117,7 @@ async def update_user_profile(
             {"id": user_id},
             {"$set": update_data}
         )
+        principal_cache.invalidate_user(user_id)
         print(f"✅ Database update result: matched={result.matched_count}, modified={result.modified_count}")
         
         if result.modified_count == 0:
@@ -1416,122 +4131,190 @@ async def update_user_profile(
         print(f"=== ADMIN USER UPDATE DEBUG END ===")
         raise HTTPException(status_code=500, detail=f"Database update failed: {str(e)}")
 
-@api_router.get("/admin/dashboard/stats")
-async def get_admin_dashboard_stats(current_admin: User = Depends(get_current_admin)):
-    """Get admin dashboard statistics"""
-    # User statistics
-    total_users = await db.users.count_documents({"role": "member"})
-    active_users = await db.users.count_documents({"role": "member", "status": "active"})
-    suspended_users = await db.users.count_documents({"role": "member", "status": "suspended"})
-    
-    # Content statistics
-    total_properties = await db.properties.count_documents({})
-    total_for_sale = await db.properties.count_documents({"status": "for_sale"})
-    total_for_rent = await db.properties.count_documents({"status": "for_rent"})
-    total_news = await db.news_articles.count_documents({"published": True})
-    total_sims = await db.sims.count_documents({})
-    total_lands = await db.lands.count_documents({})
-    total_tickets = await db.tickets.count_documents({})
-    
-    # Pending approvals
-    pending_posts = await db.member_posts.count_documents({"status": "pending"})
-    pending_properties = await db.member_posts.count_documents({"status": "pending", "post_type": "property"})
-    pending_lands = await db.member_posts.count_documents({"status": "pending", "post_type": "land"})
-    pending_sims = await db.member_posts.count_documents({"status": "pending", "post_type": "sim"})
-    
-    # Transaction statistics
-    pending_transactions = await db.transactions.count_documents({"status": "pending"})
-    total_transactions = await db.transactions.count_documents({})
-    
-    # Revenue statistics (completed post fees)
-    revenue_pipeline = [
-        {"$match": {"transaction_type": "post_fee", "status": "completed"}},
-        {"$group": {"_id": None, "total_revenue": {"$sum": "$amount"}}}
-    ]
-    revenue_result = await db.transactions.aggregate(revenue_pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total_revenue"] if revenue_result else 0
-    
-    # Today's statistics
+# Dashboard aggregation helpers
+def count_facet(match: Optional[dict] = None) -> List[dict]:
+    """$facet sub-pipeline counting the documents that match a filter"""
+    return ([{"$match": match}] if match else []) + [{"$count": "count"}]
+
+def facet_count(facet_result: Dict[str, list], name: str) -> int:
+    rows = facet_result.get(name) or []
+    return rows[0]["count"] if rows else 0
+
+async def run_facets(collection, facets: Dict[str, List[dict]], match: Optional[dict] = None) -> Dict[str, list]:
+    """Run every facet over a collection (or the documents matching `match`) in a single aggregation round trip"""
+    pipeline = ([{"$match": match}] if match else []) + [{"$facet": facets}]
+    result = await collection.aggregate(pipeline).to_list(1)
+    return result[0] if result else {name: [] for name in facets}
+
+ADMIN_STATS_FRESH_SECONDS = float(os.environ.get('ADMIN_STATS_FRESH_SECONDS', '15'))
+ADMIN_STATS_STALE_SECONDS = float(os.environ.get('ADMIN_STATS_STALE_SECONDS', '120'))
+
+async def compute_admin_dashboard_stats():
+    """Compute dashboard counters with one $facet aggregation per collection, run concurrently"""
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_users = await db.users.count_documents({"created_at": {"$gte": today}})
-    today_posts = await db.member_posts.count_documents({"created_at": {"$gte": today}})
-    today_transactions = await db.transactions.count_documents({"created_at": {"$gte": today}})
-    
-    # Traffic analytics
-    total_pageviews = await db.pageviews.count_documents({})
-    today_pageviews = await db.pageviews.count_documents({"timestamp": {"$gte": today}})
-    
-    # Get unique sessions today
-    today_sessions_pipeline = [
-        {"$match": {"timestamp": {"$gte": today}}},
-        {"$group": {"_id": "$session_id"}},
-        {"$count": "unique_sessions"}
-    ]
-    today_sessions_result = await db.pageviews.aggregate(today_sessions_pipeline).to_list(1)
-    today_unique_visitors = today_sessions_result[0]["unique_sessions"] if today_sessions_result else 0
-    
-    # Get properties by city
-    cities_pipeline = [
-        {"$group": {"_id": "$city", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
-    ]
-    top_cities = await db.properties.aggregate(cities_pipeline).to_list(10)
+    
+    users, properties, news, sims, lands, tickets, posts, transactions, total_pageviews, today_traffic = await asyncio.gather(
+        run_facets(db.users, {
+            "total_users": count_facet({"role": "member"}),
+            "active_users": count_facet({"role": "member", "status": "active"}),
+            "suspended_users": count_facet({"role": "member", "status": "suspended"}),
+            "today_users": count_facet({"created_at": {"$gte": today}})
+        }),
+        run_facets(db.properties, {
+            "total": count_facet(),
+            "for_sale": count_facet({"status": "for_sale"}),
+            "for_rent": count_facet({"status": "for_rent"}),
+            "top_cities": [
+                {"$group": {"_id": "$city", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+                {"$limit": 10}
+            ]
+        }),
+        db.news_articles.count_documents({"published": True}),
+        db.sims.count_documents({}),
+        db.lands.count_documents({}),
+        db.tickets.count_documents({}),
+        run_facets(db.member_posts, {
+            "pending_by_type": [
+                {"$match": {"status": "pending"}},
+                {"$group": {"_id": "$post_type", "count": {"$sum": 1}}}
+            ],
+            "today_posts": count_facet({"created_at": {"$gte": today}})
+        }),
+        run_facets(db.transactions, {
+            "total": count_facet(),
+            "pending": count_facet({"status": "pending"}),
+            "today": count_facet({"created_at": {"$gte": today}}),
+            "revenue": [
+                {"$match": {"transaction_type": "post_fee", "status": "completed"}},
+                {"$group": {"_id": None, "total_revenue": {"$sum": "$amount"}}}
+            ]
+        }),
+        count_pageviews(),
+        get_today_traffic()
+    )
+    
+    pending_by_type = {row["_id"]: row["count"] for row in posts.get("pending_by_type", [])}
+    revenue_rows = transactions.get("revenue") or []
     
     return {
         # User statistics
-        "total_users": total_users,
-        "active_users": active_users,
-        "suspended_users": suspended_users,
-        "today_users": today_users,
+        "total_users": facet_count(users, "total_users"),
+        "active_users": facet_count(users, "active_users"),
+        "suspended_users": facet_count(users, "suspended_users"),
+        "today_users": facet_count(users, "today_users"),
         
         # Content statistics
-        "total_properties": total_properties,
-        "properties_for_sale": total_for_sale,
-        "properties_for_rent": total_for_rent,
-        "total_news_articles": total_news,
-        "total_sims": total_sims,
-        "total_lands": total_lands,
-        "total_tickets": total_tickets,
+        "total_properties": facet_count(properties, "total"),
+        "properties_for_sale": facet_count(properties, "for_sale"),
+        "properties_for_rent": facet_count(properties, "for_rent"),
+        "total_news_articles": news,
+        "total_sims": sims,
+        "total_lands": lands,
+        "total_tickets": tickets,
         
         # Pending approvals
-        "pending_posts": pending_posts,
-        "pending_properties": pending_properties,
-        "pending_lands": pending_lands,
-        "pending_sims": pending_sims,
+        "pending_posts": sum(pending_by_type.values()),
+        "pending_properties": pending_by_type.get("property", 0),
+        "pending_lands": pending_by_type.get("land", 0),
+        "pending_sims": pending_by_type.get("sim", 0),
         
         # Transaction statistics
-        "pending_transactions": pending_transactions,
-        "total_transactions": total_transactions,
-        "total_revenue": total_revenue,
-        "today_transactions": today_transactions,
+        "pending_transactions": facet_count(transactions, "pending"),
+        "total_transactions": facet_count(transactions, "total"),
+        "total_revenue": revenue_rows[0]["total_revenue"] if revenue_rows else 0,
+        "today_transactions": facet_count(transactions, "today"),
         
         # Traffic analytics
         "total_pageviews": total_pageviews,
-        "today_pageviews": today_pageviews,
-        "today_unique_visitors": today_unique_visitors,
+        "today_pageviews": today_traffic.get("views", 0),
+        "today_unique_visitors": today_traffic.get("unique_visitors", 0),
         
         # Other
-        "top_cities": top_cities
+        "top_cities": properties.get("top_cities", [])
     }
 
+admin_stats_snapshot = SnapshotCache(compute_admin_dashboard_stats, ADMIN_STATS_FRESH_SECONDS, ADMIN_STATS_STALE_SECONDS)
+
+@api_router.get("/admin/dashboard/stats")
+async def get_admin_dashboard_stats(current_admin: AuthPrincipal = Depends(get_current_admin)):
+    """Get admin dashboard statistics (shared short-lived snapshot)"""
+    return await admin_stats_snapshot.get()
+
+# Site Settings Cache
+# The public settings are held in memory as ready-to-send JSON. update_site_settings bumps the
+# document's version atomically; every worker polls that one field and reloads when it changes.
+SITE_SETTINGS_POLL_SECONDS = float(os.environ.get('SITE_SETTINGS_POLL_SECONDS', '2'))
+
+class SiteSettingsCache:
+    """Serialized public site settings plus their version and validators"""
+    
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self.version: Optional[int] = None
+        self.body = b""
+        self.etag = ""
+        self.last_modified: Optional[datetime] = None
+        self._reload_lock = asyncio.Lock()
+        self.reloads = 0
+    
+    async def reload(self):
+        async with self._reload_lock:
+            settings = await db.site_settings.find_one()
+            if settings:
+                # Remove sensitive fields for public access
+                public_settings = {k: v for k, v in settings.items() if not k.startswith('_')}
+            else:
+                # Default settings if none exist
+                public_settings = SiteSettings().dict()
+            public_blob_urls("site_settings", public_settings)
+            body = json.dumps(jsonable_encoder(public_settings), ensure_ascii=False, separators=(",", ":")).encode()
+            self.body = body
+            self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            self.last_modified = settings.get("updated_at") if settings else None
+            self.version = settings.get("version", 0) if settings else 0
+            self.reloads += 1
+    
+    async def get(self) -> "SiteSettingsCache":
+        if self.version is None:
+            await self.reload()
+        return self
+    
+    async def poll(self):
+        current = await db.site_settings.find_one({}, {"_id": 0, "version": 1})
+        if (current or {}).get("version", 0) != self.version:
+            await self.reload()
+    
+    async def run(self):
+        """Background task: pick up settings changed by other workers"""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Error polling site settings version: {str(e)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "bytes": len(self.body),
+            "poll_interval_seconds": self.poll_interval,
+            "reloads": self.reloads
+        }
+
+site_settings_cache = SiteSettingsCache(SITE_SETTINGS_POLL_SECONDS)
+
 # Public Settings API (không cần authentication)
 @api_router.get("/settings", response_model=dict)
-async def get_public_site_settings():
-    """Get site settings for public use"""
-    settings = await db.site_settings.find_one()
-    if not settings:
-        # Return default settings if none exist
-        default_settings = SiteSettings()
-        return default_settings.dict()
-    
-    # Remove sensitive fields for public access
-    public_settings = {k: v for k, v in settings.items() if not k.startswith('_')}
-    return public_settings
+async def get_public_site_settings(request: Request):
+    """Get site settings for public use (served from memory)"""
+    cached = await site_settings_cache.get()
+    response = Response(content=cached.body, media_type="application/json")
+    return conditional_get(request, response, cached.etag, cached.last_modified, SETTINGS_CACHE_CONTROL) or response
 
 # Admin Settings Routes
 @api_router.get("/admin/settings")
-async def get_site_settings(current_admin: User = Depends(get_current_admin)):
+async def get_site_settings(current_admin: AuthPrincipal = Depends(get_current_admin)):
     """Get site settings (admin only)"""
     settings = await db.site_settings.find_one({})
     if not settings:
@@ -1539,7 +4322,7 @@ async def get_site_settings(current_admin: User = Depends(get_current_admin)):
         default_settings = SiteSettings()
         settings_dict = default_settings.dict()
         settings_dict.pop('id', None)  # Remove id for frontend
-        return settings_dict
+        return public_blob_urls("site_settings", settings_dict)
     
     # Convert MongoDB _id to id and remove _id
     settings['id'] = str(settings['_id'])
@@ -1551,16 +4334,17 @@ async def get_site_settings(current_admin: User = Depends(get_current_admin)):
     if 'holidays' not in settings:
         settings['holidays'] = "Tết Nguyên Đán, 30/4, 1/5"
     
-    return settings
+    return public_blob_urls("site_settings", settings)
 
 @api_router.put("/admin/settings")
 async def update_site_settings(
     settings_update: SiteSettingsUpdate,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: AuthPrincipal = Depends(get_current_admin)
 ):
     """Update site settings (admin only)"""
     update_data = {k: v for k, v in settings_update.dict().items() if v is not None}
     update_data['updated_at'] = datetime.utcnow()
+    await externalize_inline_images("site_settings", update_data)
     
     # Check if settings exist
     existing_settings = await db.site_settings.find_one({})
@@ -1569,7 +4353,7 @@ async def update_site_settings(
         # Update existing settings
         result = await db.site_settings.update_one(
             {"_id": existing_settings["_id"]},
-            {"$set": update_data}
+            {"$set": update_data, "$inc": {"version": 1}}
         )
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="Không thể cập nhật cài đặt")
@@ -1578,30 +4362,25 @@ async def update_site_settings(
         new_settings = SiteSettings(**update_data)
         settings_dict = new_settings.dict()
         settings_dict.pop('id', None)  # Remove the id field for MongoDB
+        settings_dict["version"] = 1
         await db.site_settings.insert_one(settings_dict)
+    await site_settings_cache.reload()
     
     return {"message": "Cập nhật cài đặt thành công"}
 
 # Property Routes
-@api_router.get("/properties", response_model=List[Property])
-async def get_properties(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, le=100),
-    property_type: Optional[PropertyType] = None,
-    status: Optional[PropertyStatus] = None,
-    city: Optional[str] = None,
-    district: Optional[str] = None,
-    min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    min_area: Optional[float] = None,
-    max_area: Optional[float] = None,
-    bedrooms: Optional[int] = None,
-    bathrooms: Optional[int] = None,
-    featured: Optional[bool] = None,
-    sort_by: str = "created_at",
-    order: str = "desc"
-):
-    """Get properties with filtering and pagination"""
+def with_price_per_sqm(listing: dict) -> dict:
+    if listing.get("area") and listing.get("price"):
+        listing["price_per_sqm"] = listing["price"] / listing["area"]
+    return listing
+
+def property_filter_query(property_type: Optional[PropertyType] = None, status: Optional[PropertyStatus] = None,
+                          city: Optional[str] = None, district: Optional[str] = None,
+                          min_price: Optional[float] = None, max_price: Optional[float] = None,
+                          min_area: Optional[float] = None, max_area: Optional[float] = None,
+                          bedrooms: Optional[int] = None, bathrooms: Optional[int] = None,
+                          featured: Optional[bool] = None) -> dict:
+    """Filter for the public property list parameters"""
     filter_query = {}
     
     if property_type:
@@ -1609,9 +4388,9 @@ async def get_properties(
     if status:
         filter_query["status"] = status
     if city:
-        filter_query["city"] = {"$regex": city, "$options": "i"}
+        filter_query["city"] = {"$regex": re.escape(city), "$options": "i"}
     if district:
-        filter_query["district"] = {"$regex": district, "$options": "i"}
+        filter_query["district"] = {"$regex": re.escape(district), "$options": "i"}
     if min_price is not None:
         filter_query["price"] = {"$gte": min_price}
     if max_price is not None:
@@ -1632,65 +4411,160 @@ async def get_properties(
         filter_query["bathrooms"] = bathrooms
     if featured is not None:
         filter_query["featured"] = featured
+    return filter_query
+
+@api_router.get("/properties", response_model=List[PropertySummary])
+async def get_properties(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, le=100),
+    property_type: Optional[PropertyType] = None,
+    status: Optional[PropertyStatus] = None,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    bedrooms: Optional[int] = None,
+    bathrooms: Optional[int] = None,
+    featured: Optional[bool] = None,
+    sort_by: str = Query("created_at", pattern=PROPERTY_SORT_PATTERN),
+    order: str = "desc",
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
+):
+    """Get property summaries with filtering and pagination"""
+    filter_query = property_filter_query(property_type, status, city, district, min_price, max_price,
+                                         min_area, max_area, bedrooms, bathrooms, featured)
     
     sort_order = -1 if order == "desc" else 1
     
-    properties = await db.properties.find(filter_query).sort(sort_by, sort_order).skip(skip).limit(limit).to_list(limit)
-    return [Property(**prop) for prop in properties]
-
-@api_router.get("/properties/featured", response_model=List[Property])
-async def get_featured_properties(limit: int = Query(6, le=20)):
+    properties = await find_listing_summaries(
+        "properties", PROPERTY_SUMMARY_PROJECTION, keyset_query(filter_query, sort_by, sort_order, cursor),
+        sort=keyset_sort(sort_by, sort_order), skip=0 if cursor else skip, limit=limit, image_variant=image_variant
+    )
+    set_next_cursor(response, properties, limit, sort_by, sort_order)
+    return [PropertySummary(**prop) for prop in properties]
+
+@api_router.get("/properties/featured", response_model=List[PropertySummary])
+async def get_featured_properties(
+    request: Request,
+    response: Response,
+    limit: int = Query(6, le=20),
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
+):
     """Get featured properties"""
-    properties = await db.properties.find({"featured": True}).sort("created_at", -1).limit(limit).to_list(limit)
-    return [Property(**prop) for prop in properties]
+    not_modified = await list_conditional_get(request, response, "properties")
+    if not_modified:
+        return not_modified
+    properties = await find_listing_summaries(
+        "properties", PROPERTY_SUMMARY_PROJECTION, {"featured": True},
+        sort={"created_at": -1}, limit=limit, image_variant=image_variant
+    )
+    return [PropertySummary(**prop) for prop in properties]
 
-@api_router.get("/properties/search", response_model=List[Property])
+@api_router.get("/properties/search", response_model=List[PropertySummary])
 async def search_properties(
     q: str = Query(..., description="Search query"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100)
 ):
-    """Search properties by title, description, address"""
-    search_query = {
-        "$or": [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"address": {"$regex": q, "$options": "i"}},
-            {"district": {"$regex": q, "$options": "i"}},
-            {"city": {"$regex": q, "$options": "i"}}
-        ]
+    """Search properties by title, description, address, district and city (accent-insensitive, ranked)"""
+    properties = await search_listings("properties", PROPERTY_SUMMARY_PROJECTION, q, skip, limit)
+    return [PropertySummary(**prop) for prop in properties]
+
+@api_router.get("/properties/facets", response_model=PropertyFacetResults)
+async def get_properties_facets(
+    response: Response,
+    limit: int = Query(20, le=100),
+    property_type: Optional[PropertyType] = None,
+    status: Optional[PropertyStatus] = None,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    bedrooms: Optional[int] = None,
+    bathrooms: Optional[int] = None,
+    featured: Optional[bool] = None,
+    sort_by: str = Query("created_at", pattern=PROPERTY_SORT_PATTERN),
+    order: str = "desc",
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
+):
+    """Counts per type, status, city, district, bedrooms and price range plus the first page, for the current filters"""
+    filters = {
+        "property_type": property_type, "status": status, "city": city, "district": district,
+        "min_price": min_price, "max_price": max_price, "min_area": min_area, "max_area": max_area,
+        "bedrooms": bedrooms, "bathrooms": bathrooms, "featured": featured
     }
-    
-    properties = await db.properties.find(search_query).skip(skip).limit(limit).to_list(limit)
-    return [Property(**prop) for prop in properties]
+    result = await get_listing_facets("properties", PROPERTY_SUMMARY_PROJECTION, PROPERTY_FACET_FIELDS, property_filter_query,
+                                      filters, sort_by, order, limit, image_variant)
+    if result["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = result["next_cursor"]
+    return PropertyFacetResults(**result)
+
+@api_router.get("/properties/nearby", response_model=List[NearbyPropertySummary])
+async def get_nearby_properties(
+    response: Response,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: float = Query(NEARBY_DEFAULT_RADIUS_KM, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    bbox: Optional[str] = Query(None, description="Map viewport as west,south,east,north"),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, le=500),
+    property_type: Optional[PropertyType] = None,
+    status: Optional[PropertyStatus] = None,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    bedrooms: Optional[int] = None,
+    bathrooms: Optional[int] = None,
+    featured: Optional[bool] = None,
+    sort_by: str = Query("created_at", pattern=PROPERTY_SORT_PATTERN),
+    order: str = "desc",
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
+):
+    """Property summaries around a point (lat/lng + radius_km, nearest first) or inside a map viewport (bbox)"""
+    filter_query = property_filter_query(property_type, status, city, district, min_price, max_price,
+                                         min_area, max_area, bedrooms, bathrooms, featured)
+    properties = await find_nearby_summaries(
+        "properties", PROPERTY_SUMMARY_PROJECTION, response, filter_query, lat, lng, radius_km, bbox,
+        skip, cursor, limit, sort_by, order, image_variant
+    )
+    return [NearbyPropertySummary(**item) for item in properties]
 
 @api_router.get("/properties/{property_id}", response_model=Property)
-async def get_property(property_id: str):
+async def get_property(property_id: str, request: Request, response: Response):
     """Get single property by ID"""
     property_data = await db.properties.find_one({"id": property_id})
     if not property_data:
         raise HTTPException(status_code=404, detail="Property not found")
     
-    # Increment views
-    await db.properties.update_one({"id": property_id}, {"$inc": {"views": 1}})
-    property_data["views"] += 1
+    # Count the view (written behind) and include views not yet flushed
+    property_data["views"] = property_data.get("views", 0) + await view_counters.record("properties", property_id)
     
+    not_modified = await document_conditional_get(request, response, property_data)
+    if not_modified:
+        return not_modified
     return Property(**property_data)
 
 @api_router.post("/properties", response_model=Property)
-async def create_property(property_data: PropertyCreate, current_user: User = Depends(get_current_admin)):
+async def create_property(property_data: PropertyCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create new property - Admin only"""
     """Create new property"""
-    property_dict = property_data.dict()
-    if property_dict.get("area") and property_dict.get("price"):
-        property_dict["price_per_sqm"] = property_dict["price"] / property_dict["area"]
-    
+    property_dict = with_price_per_sqm(property_data.dict())
     property_obj = Property(**property_dict)
-    await db.properties.insert_one(property_obj.dict())
+    await insert_content_document("properties", property_obj.dict())
     return property_obj
 
 @api_router.put("/properties/{property_id}", response_model=Property)
-async def update_property(property_id: str, property_update: PropertyUpdate, current_user: User = Depends(get_current_admin)):
+async def update_property(property_id: str, property_update: PropertyUpdate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update property - Admin only"""
     """Update property"""
     update_data = {k: v for k, v in property_update.dict().items() if v is not None}
@@ -1704,36 +4578,42 @@ async def update_property(property_id: str, property_update: PropertyUpdate, cur
             if area and price:
                 update_data["price_per_sqm"] = price / area
     
-    result = await db.properties.update_one({"id": property_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    if not await update_content_document("properties", property_id, update_data):
         raise HTTPException(status_code=404, detail="Property not found")
     
     updated_property = await db.properties.find_one({"id": property_id})
     return Property(**updated_property)
 
 @api_router.delete("/properties/{property_id}")
-async def delete_property(property_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_property(property_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete property - Admin only"""
     """Delete property"""
-    result = await db.properties.delete_one({"id": property_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("properties", property_id):
         raise HTTPException(status_code=404, detail="Property not found")
     return {"message": "Property deleted successfully"}
 
 # News Routes
 @api_router.get("/news", response_model=List[NewsArticle])
 async def get_news_articles(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(10, le=50),
     category: Optional[str] = None,
     published: bool = True
 ):
     """Get news articles"""
+    not_modified = await list_conditional_get(request, response, "news_articles")
+    if not_modified:
+        return not_modified
     filter_query = {"published": published}
     if category:
         filter_query["category"] = category
     
-    articles = await db.news_articles.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    page_query = keyset_query(filter_query, "created_at", -1, cursor)
+    articles = await db.news_articles.find(page_query).sort(keyset_sort("created_at", -1)).skip(0 if cursor else skip).limit(limit).to_list(limit)
+    set_next_cursor(response, articles, limit, "created_at", -1)
     
     # Process articles and handle missing fields
     processed_articles = []
@@ -1764,9 +4644,8 @@ async def get_news_article(article_id: str):
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
-    # Increment views
-    await db.news_articles.update_one({"id": article_id}, {"$inc": {"views": 1}})
-    article["views"] += 1
+    # Count the view (written behind) and include views not yet flushed
+    article["views"] = article.get("views", 0) + await view_counters.record("news_articles", article_id)
     
     # Ensure required fields exist
     if "slug" not in article or not article["slug"]:
@@ -1782,15 +4661,15 @@ async def get_news_article(article_id: str):
     return NewsArticle(**article)
 
 @api_router.post("/news", response_model=NewsArticle)
-async def create_news_article(article_data: NewsArticleCreate, current_user: User = Depends(get_current_admin)):
+async def create_news_article(article_data: NewsArticleCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create news article - Admin only"""
     """Create news article"""
     article_obj = NewsArticle(**article_data.dict())
-    await db.news_articles.insert_one(article_obj.dict())
+    await insert_content_document("news_articles", article_obj.dict())
     return article_obj
 
 @api_router.put("/news/{article_id}", response_model=NewsArticle)
-async def update_news_article(article_id: str, article_data: dict, current_user: User = Depends(get_current_admin)):
+async def update_news_article(article_id: str, article_data: dict, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update news article - Admin only"""
     # Remove None values from update data
     update_data = {k: v for k, v in article_data.items() if v is not None}
@@ -1803,12 +4682,7 @@ async def update_news_article(article_id: str, article_data: dict, current_user:
     update_data['updated_at'] = datetime.utcnow()
     
     # Update the article
-    result = await db.news_articles.update_one(
-        {"id": article_id}, 
-        {"$set": update_data}
-    )
-    
-    if result.matched_count == 0:
+    if not await update_content_document("news_articles", article_id, update_data):
         raise HTTPException(status_code=404, detail="Article not found")
     
     # Get updated article
@@ -1827,71 +4701,58 @@ async def update_news_article(article_id: str, article_data: dict, current_user:
     return NewsArticle(**updated_article)
 
 @api_router.delete("/news/{article_id}")
-async def delete_news_article(article_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_news_article(article_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete news article - Admin only"""
-    result = await db.news_articles.delete_one({"id": article_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("news_articles", article_id):
         raise HTTPException(status_code=404, detail="Article not found")
     return {"message": "Article deleted successfully"}
 
 # Statistics Routes
 @api_router.get("/stats")
 async def get_statistics():
-    """Get website statistics (public)"""
-    total_properties = await db.properties.count_documents({})
-    total_for_sale = await db.properties.count_documents({"status": "for_sale"})
-    total_for_rent = await db.properties.count_documents({"status": "for_rent"})
-    total_news = await db.news_articles.count_documents({"published": True})
-    total_sims = await db.sims.count_documents({})
-    total_lands = await db.lands.count_documents({})
-    
-    # Ticket statistics
-    total_tickets = await db.tickets.count_documents({})
-    open_tickets = await db.tickets.count_documents({"status": "open"})
-    resolved_tickets = await db.tickets.count_documents({"status": "resolved"})
-    
-    # Get today's traffic
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_pageviews = await db.pageviews.count_documents({"timestamp": {"$gte": today}})
-    total_pageviews = await db.pageviews.count_documents({})
-    
-    # Get unique sessions today
-    today_sessions_pipeline = [
-        {"$match": {"timestamp": {"$gte": today}}},
-        {"$group": {"_id": "$session_id"}},
-        {"$count": "unique_sessions"}
-    ]
-    today_sessions_result = await db.pageviews.aggregate(today_sessions_pipeline).to_list(1)
-    today_unique_visitors = today_sessions_result[0]["unique_sessions"] if today_sessions_result else 0
-    
-    # Get properties by city
-    pipeline = [
-        {"$group": {"_id": "$city", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
-    ]
-    cities = await db.properties.aggregate(pipeline).to_list(10)
+    """Get website statistics (public) - served from the counters collection and today's traffic bucket"""
+    counter_query = {"$or": [
+        {"_id": STATS_COUNTER_ID},
+        {"kind": "property_city", "count": {"$gt": 0}}
+    ]}
+    counters, today_stats = await asyncio.gather(
+        db.counters.find(counter_query).to_list(None),
+        get_today_traffic()
+    )
+    if not any(counter["_id"] == STATS_COUNTER_ID for counter in counters):
+        # First requests before the reconcile task has populated the counters all wait for one run
+        await reconcile_counters_once()
+        counters = await db.counters.find(counter_query).to_list(None)
+    
+    site_stats = next((c for c in counters if c["_id"] == STATS_COUNTER_ID), {})
+    cities = sorted(
+        ({"_id": c["city"], "count": c["count"]} for c in counters if c.get("kind") == "property_city"),
+        key=lambda city: city["count"],
+        reverse=True
+    )[:10]
     
     return {
-        "total_properties": total_properties,
-        "properties_for_sale": total_for_sale,
-        "properties_for_rent": total_for_rent,
-        "total_news_articles": total_news,
-        "total_sims": total_sims,
-        "total_lands": total_lands,
-        "total_tickets": total_tickets,
-        "open_tickets": open_tickets,
-        "resolved_tickets": resolved_tickets,
-        "total_pageviews": total_pageviews,
-        "today_pageviews": today_pageviews,
-        "today_unique_visitors": today_unique_visitors,
+        "total_properties": site_stats.get("total_properties", 0),
+        "properties_for_sale": site_stats.get("properties_for_sale", 0),
+        "properties_for_rent": site_stats.get("properties_for_rent", 0),
+        "total_news_articles": site_stats.get("total_news_articles", 0),
+        "total_sims": site_stats.get("total_sims", 0),
+        "total_lands": site_stats.get("total_lands", 0),
+        "total_tickets": site_stats.get("total_tickets", 0),
+        "open_tickets": site_stats.get("open_tickets", 0),
+        "resolved_tickets": site_stats.get("resolved_tickets", 0),
+        "total_pageviews": site_stats.get("total_pageviews", 0),
+        "today_pageviews": today_stats.get("views", 0),
+        "today_unique_visitors": today_stats.get("unique_visitors", 0),
         "top_cities": cities
     }
 
 # Sim Routes
 @api_router.get("/sims", response_model=List[Sim])
 async def get_sims(
+    response: Response,
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(20, le=100),
     network: Optional[SimNetwork] = None,
     sim_type: Optional[SimType] = None,
@@ -1899,7 +4760,7 @@ async def get_sims(
     max_price: Optional[float] = None,
     is_vip: Optional[bool] = None,
     status: str = "available",
-    sort_by: str = "created_at",
+    sort_by: str = Query("created_at", pattern=SIM_SORT_PATTERN),
     order: str = "desc"
 ):
     """Get sims with filtering and pagination"""
@@ -1921,7 +4782,76 @@ async def get_sims(
     
     sort_order = -1 if order == "desc" else 1
     
-    sims = await db.sims.find(filter_query).sort(sort_by, sort_order).skip(skip).limit(limit).to_list(limit)
+    page_query = keyset_query(filter_query, sort_by, sort_order, cursor)
+    sims = await db.sims.find(page_query).sort(keyset_sort(sort_by, sort_order)).skip(0 if cursor else skip).limit(limit).to_list(limit)
+    set_next_cursor(response, sims, limit, sort_by, sort_order)
+    return [Sim(**sim) for sim in sims]
+
+@api_router.get("/sims/search", response_model=List[Sim])
+async def search_sims(
+    q: str = Query(..., description="Search query"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, le=100)
+):
+    """Search sims by phone number, features"""
+    number = re.sub(r"[\s.\-]", "", q)
+    if number and SIM_WILDCARD_PATTERN.match(number):
+        # Digits (and wildcards) anywhere in the number go through the number index
+        search_query = {**sim_pattern_query(f"*{number}*"), "status": "available"}
+    else:
+        pattern = re.escape(q)
+        search_query = {
+            "$or": [
+                {"phone_number": {"$regex": pattern, "$options": "i"}},
+                {"features": {"$regex": pattern, "$options": "i"}},
+                {"description": {"$regex": pattern, "$options": "i"}}
+            ],
+            "status": "available"
+        }
+    
+    sims = await db.sims.find(search_query).skip(skip).limit(limit).to_list(limit)
+    return [Sim(**sim) for sim in sims]
+
+@api_router.get("/sims/pattern-classes")
+async def get_sim_pattern_classes():
+    """Number pattern classes accepted by /sims/query"""
+    return [{"key": key, "label": label} for key, label in SIM_PATTERN_CLASSES.items()]
+
+@api_router.get("/sims/query", response_model=List[Sim])
+async def query_sims(
+    response: Response,
+    pattern: Optional[str] = Query(None, description="Whole number with wildcards: * any digits, ? or x one digit (e.g. 09*68*8, *6868)"),
+    pattern_class: Optional[str] = Query(None, pattern=SIM_PATTERN_CLASS_PATTERN),
+    network: Optional[SimNetwork] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, le=100),
+    sort_by: str = Query("price", pattern=SIM_SORT_PATTERN),
+    order: str = "asc"
+):
+    """Find available sims by number pattern and/or pattern class using the number index"""
+    if not pattern and not pattern_class:
+        raise HTTPException(status_code=400, detail="Provide a pattern or a pattern_class")
+    
+    filter_query = {"status": "available"}
+    if pattern:
+        filter_query.update(sim_pattern_query(pattern))
+    if pattern_class:
+        filter_query["number_patterns"] = pattern_class
+    if network:
+        filter_query["network"] = network
+    if min_price is not None:
+        filter_query["price"] = {"$gte": min_price}
+    if max_price is not None:
+        filter_query.setdefault("price", {})["$lte"] = max_price
+    
+    sort_order = -1 if order == "desc" else 1
+    
+    page_query = keyset_query(filter_query, sort_by, sort_order, cursor)
+    sims = await db.sims.find(page_query).sort(keyset_sort(sort_by, sort_order)).skip(0 if cursor else skip).limit(limit).to_list(limit)
+    set_next_cursor(response, sims, limit, sort_by, sort_order)
     return [Sim(**sim) for sim in sims]
 
 @api_router.get("/sims/{sim_id}", response_model=Sim)
@@ -1931,64 +4861,169 @@ async def get_sim(sim_id: str):
     if not sim_data:
         raise HTTPException(status_code=404, detail="Sim not found")
     
-    # Increment views
-    await db.sims.update_one({"id": sim_id}, {"$inc": {"views": 1}})
-    sim_data["views"] += 1
+    # Count the view (written behind) and include views not yet flushed
+    sim_data["views"] = sim_data.get("views", 0) + await view_counters.record("sims", sim_id)
     
     return Sim(**sim_data)
 
 @api_router.post("/sims", response_model=Sim)
-async def create_sim(sim_data: SimCreate, current_user: User = Depends(get_current_admin)):
+async def create_sim(sim_data: SimCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create new sim - Admin only"""
     sim_obj = Sim(**sim_data.dict())
-    await db.sims.insert_one(sim_obj.dict())
+    await insert_content_document("sims", sim_obj.dict())
     return sim_obj
 
 @api_router.put("/sims/{sim_id}", response_model=Sim)
-async def update_sim(sim_id: str, sim_update: SimUpdate, current_user: User = Depends(get_current_admin)):
+async def update_sim(sim_id: str, sim_update: SimUpdate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update sim - Admin only"""
     update_data = {k: v for k, v in sim_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.sims.update_one({"id": sim_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    if not await update_content_document("sims", sim_id, update_data):
         raise HTTPException(status_code=404, detail="Sim not found")
     
     updated_sim = await db.sims.find_one({"id": sim_id})
     return Sim(**updated_sim)
 
 @api_router.delete("/sims/{sim_id}")
-async def delete_sim(sim_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_sim(sim_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete sim - Admin only"""
-    result = await db.sims.delete_one({"id": sim_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("sims", sim_id):
         raise HTTPException(status_code=404, detail="Sim not found")
     return {"message": "Sim deleted successfully"}
 
-@api_router.get("/sims/search", response_model=List[Sim])
-async def search_sims(
+# Land Routes
+def land_filter_query(land_type: Optional[LandType] = None, status: Optional[PropertyStatus] = None,
+                      city: Optional[str] = None, district: Optional[str] = None,
+                      min_price: Optional[float] = None, max_price: Optional[float] = None,
+                      min_area: Optional[float] = None, max_area: Optional[float] = None,
+                      featured: Optional[bool] = None) -> dict:
+    """Filter for the public land list parameters"""
+    filter_query = {}
+    
+    if land_type:
+        filter_query["land_type"] = land_type
+    if status:
+        filter_query["status"] = status
+    if city:
+        filter_query["city"] = {"$regex": re.escape(city), "$options": "i"}
+    if district:
+        filter_query["district"] = {"$regex": re.escape(district), "$options": "i"}
+    if min_price is not None:
+        filter_query["price"] = {"$gte": min_price}
+    if max_price is not None:
+        if "price" in filter_query:
+            filter_query["price"]["$lte"] = max_price
+        else:
+            filter_query["price"] = {"$lte": max_price}
+    if min_area is not None:
+        filter_query["area"] = {"$gte": min_area}
+    if max_area is not None:
+        if "area" in filter_query:
+            filter_query["area"]["$lte"] = max_area
+        else:
+            filter_query["area"] = {"$lte": max_area}
+    if featured is not None:
+        filter_query["featured"] = featured
+    return filter_query
+
+@api_router.get("/lands", response_model=List[LandSummary])
+async def get_lands(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, le=100),
+    land_type: Optional[LandType] = None,
+    status: Optional[PropertyStatus] = None,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    featured: Optional[bool] = None,
+    sort_by: str = Query("created_at", pattern=LAND_SORT_PATTERN),
+    order: str = "desc",
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
+):
+    """Get land summaries with filtering and pagination"""
+    filter_query = land_filter_query(land_type, status, city, district, min_price, max_price, min_area, max_area, featured)
+    
+    sort_order = -1 if order == "desc" else 1
+    
+    lands = await find_listing_summaries(
+        "lands", LAND_SUMMARY_PROJECTION, keyset_query(filter_query, sort_by, sort_order, cursor),
+        sort=keyset_sort(sort_by, sort_order), skip=0 if cursor else skip, limit=limit, image_variant=image_variant
+    )
+    set_next_cursor(response, lands, limit, sort_by, sort_order)
+    return [LandSummary(**land) for land in lands]
+
+@api_router.get("/lands/featured", response_model=List[LandSummary])
+async def get_featured_lands(
+    request: Request,
+    response: Response,
+    limit: int = Query(6, le=20),
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
+):
+    """Get featured lands"""
+    not_modified = await list_conditional_get(request, response, "lands")
+    if not_modified:
+        return not_modified
+    lands = await find_listing_summaries(
+        "lands", LAND_SUMMARY_PROJECTION, {"featured": True},
+        sort={"created_at": -1}, limit=limit, image_variant=image_variant
+    )
+    return [LandSummary(**land) for land in lands]
+
+@api_router.get("/lands/search", response_model=List[LandSummary])
+async def search_lands(
     q: str = Query(..., description="Search query"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100)
 ):
-    """Search sims by phone number, features"""
-    search_query = {
-        "$or": [
-            {"phone_number": {"$regex": q, "$options": "i"}},
-            {"features": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}}
-        ],
-        "status": "available"
-    }
-    
-    sims = await db.sims.find(search_query).skip(skip).limit(limit).to_list(limit)
-    return [Sim(**sim) for sim in sims]
+    """Search lands by title, description, address, district and city (accent-insensitive, ranked)"""
+    lands = await search_listings("lands", LAND_SUMMARY_PROJECTION, q, skip, limit)
+    return [LandSummary(**land) for land in lands]
 
-# Land Routes
-@api_router.get("/lands", response_model=List[Land])
-async def get_lands(
+@api_router.get("/lands/facets", response_model=LandFacetResults)
+async def get_lands_facets(
+    response: Response,
+    limit: int = Query(20, le=100),
+    land_type: Optional[LandType] = None,
+    status: Optional[PropertyStatus] = None,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    featured: Optional[bool] = None,
+    sort_by: str = Query("created_at", pattern=LAND_SORT_PATTERN),
+    order: str = "desc",
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
+):
+    """Counts per type, status, city, district, orientation and price range plus the first page, for the current filters"""
+    filters = {
+        "land_type": land_type, "status": status, "city": city, "district": district,
+        "min_price": min_price, "max_price": max_price, "min_area": min_area, "max_area": max_area,
+        "featured": featured
+    }
+    result = await get_listing_facets("lands", LAND_SUMMARY_PROJECTION, LAND_FACET_FIELDS, land_filter_query,
+                                      filters, sort_by, order, limit, image_variant)
+    if result["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = result["next_cursor"]
+    return LandFacetResults(**result)
+
+@api_router.get("/lands/nearby", response_model=List[NearbyLandSummary])
+async def get_nearby_lands(
+    response: Response,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: float = Query(NEARBY_DEFAULT_RADIUS_KM, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    bbox: Optional[str] = Query(None, description="Map viewport as west,south,east,north"),
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, le=100),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, le=500),
     land_type: Optional[LandType] = None,
     status: Optional[PropertyStatus] = None,
     city: Optional[str] = None,
@@ -1998,68 +5033,43 @@ async def get_lands(
     min_area: Optional[float] = None,
     max_area: Optional[float] = None,
     featured: Optional[bool] = None,
-    sort_by: str = "created_at",
-    order: str = "desc"
+    sort_by: str = Query("created_at", pattern=LAND_SORT_PATTERN),
+    order: str = "desc",
+    image_variant: Optional[str] = Query(None, pattern=IMAGE_VARIANT_PATTERN)
 ):
-    """Get lands with filtering and pagination"""
-    filter_query = {}
-    
-    if land_type:
-        filter_query["land_type"] = land_type
-    if status:
-        filter_query["status"] = status
-    if city:
-        filter_query["city"] = {"$regex": city, "$options": "i"}
-    if district:
-        filter_query["district"] = {"$regex": district, "$options": "i"}
-    if min_price is not None:
-        filter_query["price"] = {"$gte": min_price}
-    if max_price is not None:
-        if "price" in filter_query:
-            filter_query["price"]["$lte"] = max_price
-        else:
-            filter_query["price"] = {"$lte": max_price}
-    if min_area is not None:
-        filter_query["area"] = {"$gte": min_area}
-    if max_area is not None:
-        if "area" in filter_query:
-            filter_query["area"]["$lte"] = max_area
-        else:
-            filter_query["area"] = {"$lte": max_area}
-    if featured is not None:
-        filter_query["featured"] = featured
-    
-    sort_order = -1 if order == "desc" else 1
-    
-    lands = await db.lands.find(filter_query).sort(sort_by, sort_order).skip(skip).limit(limit).to_list(limit)
-    return [Land(**land) for land in lands]
+    """Land summaries around a point (lat/lng + radius_km, nearest first) or inside a map viewport (bbox)"""
+    filter_query = land_filter_query(land_type, status, city, district, min_price, max_price, min_area, max_area, featured)
+    lands = await find_nearby_summaries(
+        "lands", LAND_SUMMARY_PROJECTION, response, filter_query, lat, lng, radius_km, bbox,
+        skip, cursor, limit, sort_by, order, image_variant
+    )
+    return [NearbyLandSummary(**item) for item in lands]
 
 @api_router.get("/lands/{land_id}", response_model=Land)
-async def get_land(land_id: str):
+async def get_land(land_id: str, request: Request, response: Response):
     """Get single land by ID"""
     land_data = await db.lands.find_one({"id": land_id})
     if not land_data:
         raise HTTPException(status_code=404, detail="Land not found")
     
-    # Increment views
-    await db.lands.update_one({"id": land_id}, {"$inc": {"views": 1}})
-    land_data["views"] += 1
+    # Count the view (written behind) and include views not yet flushed
+    land_data["views"] = land_data.get("views", 0) + await view_counters.record("lands", land_id)
     
+    not_modified = await document_conditional_get(request, response, land_data)
+    if not_modified:
+        return not_modified
     return Land(**land_data)
 
 @api_router.post("/lands", response_model=Land)
-async def create_land(land_data: LandCreate, current_user: User = Depends(get_current_admin)):
+async def create_land(land_data: LandCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create new land - Admin only"""
-    land_dict = land_data.dict()
-    if land_dict.get("area") and land_dict.get("price"):
-        land_dict["price_per_sqm"] = land_dict["price"] / land_dict["area"]
-    
+    land_dict = with_price_per_sqm(land_data.dict())
     land_obj = Land(**land_dict)
-    await db.lands.insert_one(land_obj.dict())
+    await insert_content_document("lands", land_obj.dict())
     return land_obj
 
 @api_router.put("/lands/{land_id}", response_model=Land)
-async def update_land(land_id: str, land_update: LandUpdate, current_user: User = Depends(get_current_admin)):
+async def update_land(land_id: str, land_update: LandUpdate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update land - Admin only"""
     update_data = {k: v for k, v in land_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
@@ -2072,47 +5082,19 @@ async def update_land(land_id: str, land_update: LandUpdate, current_user: User
             if area and price:
                 update_data["price_per_sqm"] = price / area
     
-    result = await db.lands.update_one({"id": land_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    if not await update_content_document("lands", land_id, update_data):
         raise HTTPException(status_code=404, detail="Land not found")
     
     updated_land = await db.lands.find_one({"id": land_id})
     return Land(**updated_land)
 
 @api_router.delete("/lands/{land_id}")
-async def delete_land(land_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_land(land_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete land - Admin only"""
-    result = await db.lands.delete_one({"id": land_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("lands", land_id):
         raise HTTPException(status_code=404, detail="Land not found")
     return {"message": "Land deleted successfully"}
 
-@api_router.get("/lands/featured", response_model=List[Land])
-async def get_featured_lands(limit: int = Query(6, le=20)):
-    """Get featured lands"""
-    lands = await db.lands.find({"featured": True}).sort("created_at", -1).limit(limit).to_list(limit)
-    return [Land(**land) for land in lands]
-
-@api_router.get("/lands/search", response_model=List[Land])
-async def search_lands(
-    q: str = Query(..., description="Search query"),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, le=100)
-):
-    """Search lands by title, description, address"""
-    search_query = {
-        "$or": [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"address": {"$regex": q, "$options": "i"}},
-            {"district": {"$regex": q, "$options": "i"}},
-            {"city": {"$regex": q, "$options": "i"}}
-        ]
-    }
-    
-    lands = await db.lands.find(search_query).skip(skip).limit(limit).to_list(limit)
-    return [Land(**land) for land in lands]
-
 # Ticket Routes
 @api_router.get("/tickets", response_model=List[Ticket])
 async def get_tickets(
@@ -2120,7 +5102,7 @@ async def get_tickets(
     limit: int = Query(20, le=100),
     status: Optional[str] = None,
     priority: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Get tickets - Admin only"""
     filter_query = {}
@@ -2133,7 +5115,7 @@ async def get_tickets(
     return [Ticket(**ticket) for ticket in tickets]
 
 @api_router.get("/tickets/{ticket_id}", response_model=Ticket)
-async def get_ticket(ticket_id: str, current_user: User = Depends(get_current_user)):
+async def get_ticket(ticket_id: str, current_user: AuthPrincipal = Depends(get_current_user)):
     """Get single ticket - Admin only"""
     ticket_data = await db.tickets.find_one({"id": ticket_id})
     if not ticket_data:
@@ -2144,33 +5126,31 @@ async def get_ticket(ticket_id: str, current_user: User = Depends(get_current_us
 async def create_ticket(ticket_data: TicketCreate):
     """Create new ticket (public endpoint)"""
     ticket_obj = Ticket(**ticket_data.dict())
-    await db.tickets.insert_one(ticket_obj.dict())
+    await insert_content_document("tickets", ticket_obj.dict())
     return ticket_obj
 
 @api_router.put("/tickets/{ticket_id}", response_model=Ticket)
-async def update_ticket(ticket_id: str, ticket_update: TicketUpdate, current_user: User = Depends(get_current_user)):
+async def update_ticket(ticket_id: str, ticket_update: TicketUpdate, current_user: AuthPrincipal = Depends(get_current_user)):
     """Update ticket - Admin only"""
     update_data = {k: v for k, v in ticket_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.tickets.update_one({"id": ticket_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    if not await update_content_document("tickets", ticket_id, update_data):
         raise HTTPException(status_code=404, detail="Ticket not found")
     
     updated_ticket = await db.tickets.find_one({"id": ticket_id})
     return Ticket(**updated_ticket)
 
 @api_router.delete("/tickets/{ticket_id}")
-async def delete_ticket(ticket_id: str, current_user: User = Depends(get_current_user)):
+async def delete_ticket(ticket_id: str, current_user: AuthPrincipal = Depends(get_current_user)):
     """Delete ticket - Admin only"""
-    result = await db.tickets.delete_one({"id": ticket_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("tickets", ticket_id):
         raise HTTPException(status_code=404, detail="Ticket not found")
     return {"message": "Ticket deleted successfully"}
 
 # Messaging endpoints
 @api_router.post("/messages", response_model=dict)
-async def create_message(message: MessageCreate, current_user: User = Depends(get_current_user)):
+async def create_message(message: MessageCreate, current_user: AuthPrincipal = Depends(get_current_user)):
     message_data = message.dict()
     message_data["from_user_id"] = current_user.id
     message_data["from_type"] = current_user.role
@@ -2185,7 +5165,7 @@ async def get_messages(
     ticket_id: Optional[str] = None,
     deposit_id: Optional[str] = None,
     limit: int = 50,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     query = {"$or": [
         {"from_user_id": current_user.id},
@@ -2205,7 +5185,7 @@ async def get_messages(
     return messages
 
 @api_router.put("/messages/{message_id}/read", response_model=dict)
-async def mark_message_read(message_id: str, current_user: User = Depends(get_current_user)):
+async def mark_message_read(message_id: str, current_user: AuthPrincipal = Depends(get_current_user)):
     result = await db.messages.update_one(
         {"id": message_id, "to_user_id": current_user.id},
         {"$set": {"read": True, "updated_at": datetime.utcnow()}}
@@ -2217,7 +5197,7 @@ async def mark_message_read(message_id: str, current_user: User = Depends(get_cu
     return {"message": "Đã đánh dấu đã đọc"}
 
 @api_router.get("/admin/messages/unread", response_model=dict)
-async def get_unread_messages_count(current_admin: User = Depends(get_current_admin)):
+async def get_unread_messages_count(current_admin: AuthPrincipal = Depends(get_current_admin)):
     count = await db.messages.count_documents({
         "to_user_id": current_admin.id,
         "read": False
@@ -2227,109 +5207,131 @@ async def get_unread_messages_count(current_admin: User = Depends(get_current_ad
 @api_router.post("/analytics/pageview")
 async def track_page_view(analytics_data: AnalyticsCreate):
     """Track page view (public endpoint)"""
-    pageview_obj = PageView(**analytics_data.dict())
-    await db.pageviews.insert_one(pageview_obj.dict())
+    pageview_buffer.add([new_pageview_document(analytics_data)])
     return {"message": "Page view tracked successfully"}
 
+@api_router.post("/analytics/pageviews/batch")
+async def track_page_views_batch(analytics_data: List[AnalyticsCreate]):
+    """Track several page views in one request (public endpoint)"""
+    if len(analytics_data) > PAGEVIEW_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maximum {PAGEVIEW_BATCH_MAX_ITEMS} page views per batch")
+    
+    accepted = pageview_buffer.add([new_pageview_document(item) for item in analytics_data])
+    return {"message": "Page views tracked successfully", "accepted": accepted, "dropped": len(analytics_data) - accepted}
+
 @api_router.get("/analytics/traffic")
 async def get_traffic_analytics(
-    period: str = Query("week", pattern="^(day|week|month|year)$"),
+    period: str = Query("week", pattern="^(hour|day|week|month|year)$"),
     limit: int = Query(30, le=365),
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
-    """Get traffic analytics - Admin only"""
-    now = datetime.utcnow()
-    
-    # For month period, get daily data from traffic_analytics collection
-    if period == "month":
-        start_date = now - timedelta(days=30)
-        
-        # Get daily traffic data
-        traffic_data = await db.traffic_analytics.find({
-            "timestamp": {"$gte": start_date}
-        }).sort("date", 1).limit(30).to_list(30)
-        
-        return {
-            "period": period,
-            "data": traffic_data
-        }
+    """Get traffic analytics from the traffic rollup buckets - Admin only
     
-    # For other periods, use original pageviews aggregation
-    # Calculate date range based on period
-    if period == "day":
-        start_date = now - timedelta(days=limit)
-        group_format = "%Y-%m-%d"
-    elif period == "week":
-        start_date = now - timedelta(weeks=limit)
-        group_format = "%Y-%U"  # Year-Week
-    else:  # year
-        start_date = now - timedelta(days=limit*365)
-        group_format = "%Y"
-    
-    # Aggregate page views by time period
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": group_format,
-                        "date": "$timestamp"
-                    }
-                },
-                "views": {"$sum": 1},
-                "unique_sessions": {"$addToSet": "$session_id"}
-            }
-        },
-        {
-            "$addFields": {
-                "unique_visitors": {"$size": "$unique_sessions"}
-            }
-        },
-        {"$sort": {"_id": 1}},
-        {"$limit": limit}
-    ]
+    unique_visitors are HyperLogLog estimates (about 1.6% standard error); week and year
+    figures merge the daily sketches, so a session is counted once per period.
+    """
+    now = datetime.utcnow()
     
-    traffic_data = await db.pageviews.aggregate(pipeline).to_list(limit)
+    if period == "hour":
+        granularity = "hour"
+        start_date = traffic_bucket_start(now - timedelta(hours=limit - 1), "hour")
+    else:
+        granularity = "day"
+        if period == "day":
+            start_date = now - timedelta(days=limit - 1)
+        elif period == "month":
+            start_date = now - timedelta(days=29)
+        elif period == "week":
+            start_date = now - timedelta(weeks=limit)
+        else:  # year
+            start_date = now - timedelta(days=limit * 365)
+        start_date = traffic_bucket_start(start_date, "day")
+    
+    buckets = await db.traffic_analytics.find(
+        {"granularity": granularity, "page_path": TRAFFIC_ALL_PAGES, "timestamp": {"$gte": start_date}},
+        {"_id": 0, "date": 1, "timestamp": 1, "views": 1, "unique_visitors": 1, "sessions_hll": 1}
+    ).sort("timestamp", 1).to_list(None)
+    
+    if period in ("week", "year"):
+        grouped = OrderedDict()
+        for bucket in buckets:
+            local_day = bucket["timestamp"] + timedelta(hours=TRAFFIC_TZ_OFFSET_HOURS)
+            label = local_day.strftime("%Y-%U" if period == "week" else "%Y")
+            row = grouped.setdefault(label, {"_id": label, "date": bucket["date"], "views": 0, "sketches": []})
+            row["views"] += bucket["views"]
+            row["sketches"].append(bucket.get("sessions_hll"))
+        traffic_data = [
+            {"_id": row["_id"], "date": row["date"], "views": row["views"], "unique_visitors": merged_unique_count(row["sketches"])}
+            for row in list(grouped.values())[-limit:]
+        ]
+    else:
+        traffic_data = [
+            {"_id": bucket["date"], "date": bucket["date"], "views": bucket["views"], "unique_visitors": bucket["unique_visitors"]}
+            for bucket in buckets
+        ][-limit:]
     
     return {
         "period": period,
         "data": traffic_data
     }
 
+@api_router.get("/admin/pageviews/partitions")
+async def get_pageview_partitions(current_admin: AuthPrincipal = Depends(get_current_admin)):
+    """List monthly pageview partitions and archived months - Admin only"""
+    names = await list_pageview_partitions()
+    counts = await asyncio.gather(*[db[name].estimated_document_count() for name in names])
+    archives = await asyncio.to_thread(
+        lambda: sorted(PAGEVIEW_ARCHIVE_DIR.glob(f"{PAGEVIEW_PARTITION_PREFIX}*.ndjson.gz")) if PAGEVIEW_ARCHIVE_DIR.exists() else []
+    )
+    return {
+        "retention_months": PAGEVIEW_RETENTION_MONTHS,
+        "partitions": [{"name": name, "documents": count} for name, count in zip(names, counts)],
+        "archives": [{"file": archive.name, "size_bytes": archive.stat().st_size} for archive in archives]
+    }
+
 @api_router.get("/analytics/popular-pages")
 async def get_popular_pages(
     limit: int = Query(10, le=50),
     days: int = Query(7, le=365),
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
-    """Get most popular pages - Admin only"""
-    start_date = datetime.utcnow() - timedelta(days=days)
+    """Get most popular pages from the daily traffic buckets - Admin only"""
+    start_date = traffic_bucket_start(datetime.utcnow() - timedelta(days=days), "day")
+    bucket_filter = {"granularity": "day", "page_path": {"$ne": TRAFFIC_ALL_PAGES}, "timestamp": {"$gte": start_date}}
     
     pipeline = [
-        {"$match": {"timestamp": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": "$page_path",
-                "views": {"$sum": 1},
-                "unique_visitors": {"$addToSet": "$session_id"}
-            }
-        },
-        {
-            "$addFields": {
-                "unique_visitors_count": {"$size": "$unique_visitors"}
-            }
-        },
+        {"$match": bucket_filter},
+        {"$group": {"_id": "$page_path", "views": {"$sum": "$views"}}},
         {"$sort": {"views": -1}},
         {"$limit": limit}
     ]
+    popular_pages = await db.traffic_analytics.aggregate(pipeline).to_list(limit)
+    
+    # Unique visitors per page: merge the daily sketches of the top pages only
+    sketches = {page["_id"]: [] for page in popular_pages}
+    async for bucket in db.traffic_analytics.find(
+        {**bucket_filter, "page_path": {"$in": list(sketches)}},
+        {"_id": 0, "page_path": 1, "sessions_hll": 1}
+    ):
+        sketches[bucket["page_path"]].append(bucket.get("sessions_hll"))
+    for page in popular_pages:
+        page["unique_visitors_count"] = merged_unique_count(sketches[page["_id"]])
     
-    popular_pages = await db.pageviews.aggregate(pipeline).to_list(limit)
     return popular_pages
 
 # Admin CRUD APIs for Properties, News, SIMs, Lands
+@api_router.get("/admin/properties", response_model=List[Property])
+async def admin_get_properties(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, le=200),
+    current_user: AuthPrincipal = Depends(get_current_admin)
+):
+    """List full property documents for editing - Admin only"""
+    properties = await db.properties.find().sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    return [Property(**prop) for prop in properties]
+
 @api_router.post("/admin/properties", response_model=dict)
-async def admin_create_property(property_data: PropertyCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_property(property_data: PropertyCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create property - Admin only"""
     try:
         logger.info(f"Creating property by admin: {current_user.username}")
@@ -2341,7 +5343,7 @@ async def admin_create_property(property_data: PropertyCreate, current_user: Use
         property_dict["updated_at"] = datetime.utcnow()
         property_dict["views"] = 0
         
-        await db.properties.insert_one(property_dict)
+        await insert_content_document("properties", property_dict)
         logger.info(f"Property created successfully with ID: {property_dict['id']}")
         return {"message": "Property created successfully", "id": property_dict["id"]}
     except Exception as e:
@@ -2349,28 +5351,26 @@ async def admin_create_property(property_data: PropertyCreate, current_user: Use
         raise HTTPException(status_code=500, detail=f"Error creating property: {str(e)}")
 
 @api_router.put("/admin/properties/{property_id}", response_model=dict)
-async def admin_update_property(property_id: str, property_data: PropertyUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_property(property_id: str, property_data: PropertyUpdate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update property - Admin only"""
     update_dict = property_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.properties.update_one({"id": property_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    if not await update_content_document("properties", property_id, update_dict):
         raise HTTPException(status_code=404, detail="Property not found")
     
     return {"message": "Property updated successfully"}
 
 @api_router.delete("/admin/properties/{property_id}")
-async def admin_delete_property(property_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_property(property_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete property - Admin only"""
-    result = await db.properties.delete_one({"id": property_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("properties", property_id):
         raise HTTPException(status_code=404, detail="Property not found")
     
     return {"message": "Property deleted successfully"}
 
 @api_router.post("/admin/news", response_model=dict)
-async def admin_create_news(news_data: NewsCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_news(news_data: NewsCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create news - Admin only"""
     try:
         logger.info(f"Creating news by admin: {current_user.username}")
@@ -2383,7 +5383,7 @@ async def admin_create_news(news_data: NewsCreate, current_user: User = Depends(
         news_dict["updated_at"] = datetime.utcnow()
         news_dict["views"] = 0
         
-        await db.news_articles.insert_one(news_dict)
+        await insert_content_document("news_articles", news_dict)
         logger.info(f"News created successfully with ID: {news_dict['id']}")
         return {"message": "News created successfully", "id": news_dict["id"]}
     except Exception as e:
@@ -2391,28 +5391,26 @@ async def admin_create_news(news_data: NewsCreate, current_user: User = Depends(
         raise HTTPException(status_code=500, detail=f"Error creating news: {str(e)}")
 
 @api_router.put("/admin/news/{news_id}", response_model=dict)
-async def admin_update_news(news_id: str, news_data: NewsUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_news(news_id: str, news_data: NewsUpdate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update news - Admin only"""
     update_dict = news_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.news_articles.update_one({"id": news_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    if not await update_content_document("news_articles", news_id, update_dict):
         raise HTTPException(status_code=404, detail="News not found")
     
     return {"message": "News updated successfully"}
 
 @api_router.delete("/admin/news/{news_id}")
-async def admin_delete_news(news_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_news(news_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete news - Admin only"""
-    result = await db.news_articles.delete_one({"id": news_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("news_articles", news_id):
         raise HTTPException(status_code=404, detail="News not found")
     
     return {"message": "News deleted successfully"}
 
 @api_router.post("/admin/sims", response_model=dict)
-async def admin_create_sim(sim_data: SimCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_sim(sim_data: SimCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create SIM - Admin only"""
     sim_dict = sim_data.dict()
     sim_dict["id"] = str(uuid.uuid4())
@@ -2421,32 +5419,40 @@ async def admin_create_sim(sim_data: SimCreate, current_user: User = Depends(get
     sim_dict["views"] = 0
     sim_dict["status"] = "available"
     
-    await db.sims.insert_one(sim_dict)
+    await insert_content_document("sims", sim_dict)
     return {"message": "SIM created successfully", "id": sim_dict["id"]}
 
 @api_router.put("/admin/sims/{sim_id}", response_model=dict)
-async def admin_update_sim(sim_id: str, sim_data: SimUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_sim(sim_id: str, sim_data: SimUpdate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update SIM - Admin only"""
     update_dict = sim_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.sims.update_one({"id": sim_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    if not await update_content_document("sims", sim_id, update_dict):
         raise HTTPException(status_code=404, detail="SIM not found")
     
     return {"message": "SIM updated successfully"}
 
 @api_router.delete("/admin/sims/{sim_id}")
-async def admin_delete_sim(sim_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_sim(sim_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete SIM - Admin only"""
-    result = await db.sims.delete_one({"id": sim_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("sims", sim_id):
         raise HTTPException(status_code=404, detail="SIM not found")
     
     return {"message": "SIM deleted successfully"}
 
+@api_router.get("/admin/lands", response_model=List[Land])
+async def admin_get_lands(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, le=200),
+    current_user: AuthPrincipal = Depends(get_current_admin)
+):
+    """List full land documents for editing - Admin only"""
+    lands = await db.lands.find().sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    return [Land(**land) for land in lands]
+
 @api_router.post("/admin/lands", response_model=dict)
-async def admin_create_land(land_data: LandCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_land(land_data: LandCreate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Create land - Admin only"""
     try:
         logger.info(f"Creating land by admin: {current_user.username}")
@@ -2459,7 +5465,7 @@ async def admin_create_land(land_data: LandCreate, current_user: User = Depends(
         land_dict["views"] = 0
         land_dict["status"] = "for_sale"
         
-        await db.lands.insert_one(land_dict)
+        await insert_content_document("lands", land_dict)
         logger.info(f"Land created successfully with ID: {land_dict['id']}")
         return {"message": "Land created successfully", "id": land_dict["id"]}
     except Exception as e:
@@ -2467,22 +5473,20 @@ async def admin_create_land(land_data: LandCreate, current_user: User = Depends(
         raise HTTPException(status_code=500, detail=f"Error creating land: {str(e)}")
 
 @api_router.put("/admin/lands/{land_id}", response_model=dict)
-async def admin_update_land(land_id: str, land_data: LandUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_land(land_id: str, land_data: LandUpdate, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update land - Admin only"""
     update_dict = land_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.lands.update_one({"id": land_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    if not await update_content_document("lands", land_id, update_dict):
         raise HTTPException(status_code=404, detail="Land not found")
     
     return {"message": "Land updated successfully"}
 
 @api_router.delete("/admin/lands/{land_id}")
-async def admin_delete_land(land_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_land(land_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Delete land - Admin only"""
-    result = await db.lands.delete_one({"id": land_id})
-    if result.deleted_count == 0:
+    if not await delete_content_document("lands", land_id):
         raise HTTPException(status_code=404, detail="Land not found")
     
     return {"message": "Land deleted successfully"}
@@ -2494,7 +5498,7 @@ async def get_all_members(
     limit: int = Query(20, le=100),
     role: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Get all members - Admin only"""
     filter_query = {}
@@ -2507,7 +5511,7 @@ async def get_all_members(
     return [UserProfile(**member) for member in members]
 
 @api_router.get("/admin/members/{user_id}", response_model=UserProfile)
-async def get_member_details(user_id: str, current_user: User = Depends(get_current_admin)):
+async def get_member_details(user_id: str, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Get member details - Admin only"""
     member = await db.users.find_one({"id": user_id})
     if not member:
@@ -2515,7 +5519,7 @@ async def get_member_details(user_id: str, current_user: User = Depends(get_curr
     return UserProfile(**member)
 
 @api_router.put("/admin/members/{user_id}")
-async def update_member(user_id: str, update_data: dict, current_user: User = Depends(get_current_admin)):
+async def update_member(user_id: str, update_data: dict, current_user: AuthPrincipal = Depends(get_current_admin)):
     """Update member - Admin only"""
     update_fields = {k: v for k, v in update_data.items() if v is not None}
     update_fields["updated_at"] = datetime.utcnow()
@@ -2523,6 +5527,7 @@ async def update_member(user_id: str, update_data: dict, current_user: User = De
     result = await db.users.update_one({"id": user_id}, {"$set": update_fields})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Member not found")
+    principal_cache.invalidate_user(user_id)
     
     updated_member = await db.users.find_one({"id": user_id})
     return UserProfile(**updated_member)
@@ -2532,34 +5537,24 @@ async def adjust_member_balance(
     user_id: str, 
     amount: float, 
     description: str,
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Adjust member wallet balance - Admin only"""
-    member = await db.users.find_one({"id": user_id})
-    if not member:
-        raise HTTPException(status_code=404, detail="Member not found")
-    
-    new_balance = member.get("wallet_balance", 0.0) + amount
-    if new_balance < 0:
-        raise HTTPException(status_code=400, detail="Insufficient balance")
-    
-    # Update balance
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
-    )
-    
-    # Create transaction record
+    # Update balance and create transaction record
     transaction = Transaction(
         user_id=user_id,
         amount=amount,
-        transaction_type=TransactionType.deposit if amount > 0 else TransactionType.withdrawal,
+        transaction_type=TransactionType.deposit if amount > 0 else TransactionType.withdraw,
         description=f"Admin adjustment: {description}",
         status=TransactionStatus.completed,
         admin_notes=f"Adjusted by admin {current_user.username}",
         completed_at=datetime.utcnow()
     )
-    await db.transactions.insert_one(transaction.dict())
+    new_balance = await wallet_ledger.apply(user_id, amount, transaction.dict())
+    if new_balance is None:
+        if not await db.users.find_one({"id": user_id}, {"_id": 0, "id": 1}):
+            raise HTTPException(status_code=404, detail="Member not found")
+        raise HTTPException(status_code=400, detail="Insufficient balance")
     
     return {"message": "Balance adjusted successfully", "new_balance": new_balance}
 
@@ -2569,7 +5564,7 @@ async def get_pending_deposits(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     status: TransactionStatus = Query(TransactionStatus.pending),
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Get deposit requests - Admin only"""
     filter_query = {
@@ -2577,15 +5572,16 @@ async def get_pending_deposits(
         "status": status
     }
     
-    deposits = await db.transactions.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    deposits = await db.transactions.find(filter_query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Get user details for each deposit
     enriched_deposits = []
+    users = await users_by_id(deposit["user_id"] for deposit in deposits)
     for deposit in deposits:
-        user = await db.users.find_one({"id": deposit["user_id"]})
+        user = users.get(deposit["user_id"])
         deposit["user_name"] = user.get("full_name", "Unknown") if user else "Unknown"
         deposit["user_email"] = user.get("email", "Unknown") if user else "Unknown"
-        enriched_deposits.append(deposit)
+        enriched_deposits.append(public_blob_urls("transactions", deposit))
     
     return enriched_deposits
 
@@ -2593,7 +5589,7 @@ async def get_pending_deposits(
 async def approve_deposit(
     transaction_id: str,
     admin_notes: str = "",
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Approve deposit request - Admin only"""
     transaction = await db.transactions.find_one({"id": transaction_id})
@@ -2603,27 +5599,13 @@ async def approve_deposit(
     if transaction["status"] != TransactionStatus.pending:
         raise HTTPException(status_code=400, detail="Transaction is not pending")
     
-    # Update transaction status
-    await db.transactions.update_one(
-        {"id": transaction_id},
-        {
-            "$set": {
-                "status": TransactionStatus.completed,
-                "admin_notes": admin_notes,
-                "completed_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-        }
-    )
-    
-    # Add money to user wallet
-    user = await db.users.find_one({"id": transaction["user_id"]})
-    if user:
-        new_balance = user.get("wallet_balance", 0.0) + transaction["amount"]
-        await db.users.update_one(
-            {"id": transaction["user_id"]},
-            {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
-        )
+    # Complete the deposit and credit the wallet together; only the request that moves it out of pending credits
+    await approve_pending_deposit(transaction, {
+        "status": TransactionStatus.completed,
+        "admin_notes": admin_notes,
+        "completed_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
     
     return {"message": "Deposit approved successfully"}
 
@@ -2631,7 +5613,7 @@ async def approve_deposit(
 async def reject_deposit(
     transaction_id: str,
     admin_notes: str,
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Reject deposit request - Admin only"""
     transaction = await db.transactions.find_one({"id": transaction_id})
@@ -2662,7 +5644,7 @@ async def create_deposit_request(
     amount: float,
     bank_transfer_image: str,  # base64 image
     transfer_content: str,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Create deposit request with bank transfer proof"""
     if amount <= 0:
@@ -2687,6 +5669,7 @@ async def create_deposit_request(
     transaction_dict["bank_transfer_image"] = bank_transfer_image
     transaction_dict["transfer_content"] = transfer_content
     
+    await externalize_inline_images("transactions", transaction_dict)
     await db.transactions.insert_one(transaction_dict)
     
     return {
@@ -2696,7 +5679,7 @@ async def create_deposit_request(
     }
 
 @api_router.get("/member/bank-info")
-async def get_bank_info(current_user: User = Depends(get_current_user)):
+async def get_bank_info(current_user: AuthPrincipal = Depends(get_current_user)):
     """Get bank information for deposits"""
     return {
         "bank_name": "Ngân hàng Techcombank",
@@ -2716,7 +5699,7 @@ async def get_member_posts(
     limit: int = Query(10, le=50),
     post_type: Optional[str] = Query(None),  # properties, lands, sims
     status: Optional[str] = Query(None),
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Get member's posts"""
     filter_query = {"user_id": current_user.id}
@@ -2726,43 +5709,36 @@ async def get_member_posts(
         filter_query["status"] = status
     
     posts = await db.member_posts.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    return posts
+    return [public_blob_urls("member_posts", post) for post in posts]
 
 @api_router.post("/member/posts/create")
 async def create_member_post(
     post_data: dict,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthPrincipal = Depends(get_current_user)
 ):
     """Create member post (property/land/sim)"""
-    # Check wallet balance for posting fee (50k VND)
-    POSTING_FEE = 50000
-    if current_user.wallet_balance < POSTING_FEE:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Insufficient balance. Need {POSTING_FEE:,} VND to post. Current balance: {current_user.wallet_balance:,} VND"
-        )
-    
-    # Deduct posting fee
-    new_balance = current_user.wallet_balance - POSTING_FEE
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
-    )
+    post_id = str(uuid.uuid4())
     
-    # Create transaction record
+    # Deduct posting fee and create transaction record; refused if the balance cannot cover it
     transaction = Transaction(
         user_id=current_user.id,
-        amount=-POSTING_FEE,
-        transaction_type=TransactionType.withdrawal,
+        amount=-MEMBER_POSTING_FEE,
+        transaction_type=TransactionType.withdraw,
         description=f"Posting fee for {post_data.get('post_type', 'unknown')} post",
         status=TransactionStatus.completed,
+        reference_id=post_id,
         completed_at=datetime.utcnow()
     )
-    await db.transactions.insert_one(transaction.dict())
+    new_balance = await wallet_ledger.apply(current_user.id, -MEMBER_POSTING_FEE, transaction.dict())
+    if new_balance is None:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Insufficient balance. Need {MEMBER_POSTING_FEE:,} VND to post. Current balance: {await wallet_balance(current_user.id):,} VND"
+        )
     
     # Create member post
     member_post = {
-        "id": str(uuid.uuid4()),
+        "id": post_id,
         "user_id": current_user.id,
         "post_type": post_data.get("post_type", "properties"),
         "status": "pending",
@@ -2771,7 +5747,12 @@ async def create_member_post(
         "updated_at": datetime.utcnow()
     }
     
-    await db.member_posts.insert_one(member_post)
+    try:
+        await externalize_inline_images("member_posts", member_post)
+        await db.member_posts.insert_one(member_post)
+    except Exception:
+        await refund_post_fee(current_user.id, MEMBER_POSTING_FEE, post_id)
+        raise
     
     return {
         "message": "Post created successfully", 
@@ -2787,22 +5768,23 @@ async def get_pending_member_posts(
     limit: int = Query(20, le=100),
     post_type: Optional[str] = Query(None),
     status: str = Query("pending"),
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Get member posts for admin approval"""
     filter_query = {"status": status}
     if post_type:
         filter_query["post_type"] = post_type
     
-    posts = await db.member_posts.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    posts = await db.member_posts.find(filter_query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Get user details for each post
     enriched_posts = []
+    users = await users_by_id(post["user_id"] for post in posts)
     for post in posts:
-        user = await db.users.find_one({"id": post["user_id"]})
+        user = users.get(post["user_id"])
         post["user_name"] = user.get("full_name", "Unknown") if user else "Unknown"
         post["user_email"] = user.get("email", "Unknown") if user else "Unknown"
-        enriched_posts.append(post)
+        enriched_posts.append(public_blob_urls("member_posts", post))
     
     return enriched_posts
 
@@ -2810,7 +5792,7 @@ async def get_pending_member_posts(
 async def approve_member_post(
     post_id: str,
     admin_notes: str = "",
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Approve member post and move to main collection"""
     post = await db.member_posts.find_one({"id": post_id})
@@ -2821,22 +5803,10 @@ async def approve_member_post(
         raise HTTPException(status_code=400, detail="Post is not pending")
     
     # Move post data to appropriate collection
-    post_data = post["data"]
     post_type = post["post_type"]
-    
-    # Add common fields
-    post_data["id"] = str(uuid.uuid4())
-    post_data["created_at"] = datetime.utcnow()
-    post_data["updated_at"] = datetime.utcnow()
-    post_data["views"] = 0
-    
-    # Insert to appropriate collection
-    if post_type == "properties":
-        await db.properties.insert_one(post_data)
-    elif post_type == "lands":
-        await db.lands.insert_one(post_data)
-    elif post_type == "sims":
-        await db.sims.insert_one(post_data)
+    collection_name, listing = member_post_listing(post)
+    if listing is not None:
+        await insert_content_document(collection_name, listing)
     
     # Update member post status
     await db.member_posts.update_one(
@@ -2857,7 +5827,7 @@ async def approve_member_post(
 async def reject_member_post(
     post_id: str,
     admin_notes: str,
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Reject member post"""
     post = await db.member_posts.find_one({"id": post_id})
@@ -2867,115 +5837,533 @@ async def reject_member_post(
     if post["status"] != "pending":
         raise HTTPException(status_code=400, detail="Post is not pending")
     
-    # Update member post status
-    await db.member_posts.update_one(
-        {"id": post_id},
-        {
-            "$set": {
-                "status": "rejected",
-                "admin_notes": admin_notes,
-                "rejected_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-        }
+    rejected = {
+        "status": "rejected",
+        "admin_notes": admin_notes,
+        "rejected_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    # Reject the post and refund the posting fee together; only the request that moves it out of pending refunds
+    claim = {"collection": "member_posts", "id": post_id, "status": "pending", "set": rejected}
+    refunded = await refund_post_fee(
+        post["user_id"], MEMBER_POSTING_FEE, post_id, admin_notes=f"Refunded by admin {current_user.username}", claim=claim
     )
+    if refunded is None:
+        if await db.users.find_one({"id": post["user_id"]}, {"_id": 0, "id": 1}):
+            raise HTTPException(status_code=400, detail="Post is not pending")
+        # The author's account is gone: nothing to refund
+        result = await db.member_posts.update_one({"id": post_id, "status": "pending"}, {"$set": rejected})
+        if result.modified_count == 0:
+            raise HTTPException(status_code=400, detail="Post is not pending")
     
-    # Refund posting fee
-    user = await db.users.find_one({"id": post["user_id"]})
-    if user:
-        POSTING_FEE = 50000
-        new_balance = user.get("wallet_balance", 0.0) + POSTING_FEE
-        await db.users.update_one(
-            {"id": post["user_id"]},
-            {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
+    return {"message": f"{post['post_type']} post rejected and fee refunded"}
+
+# Bulk Import
+# Admins upload a CSV (header row) or NDJSON file of properties, lands or sims. Rows are read one at a
+# time from the spooled upload, validated against the Create model, and written with insert_many in
+# IMPORT_BATCH_SIZE batches; reading and validating a batch runs in a worker thread, so a large file
+# does not hold up the event loop between writes. Each row's id is derived from the job id and row number, and the job
+# records the last committed row after every batch, so re-uploading the same file with job_id resumes
+# where the previous attempt stopped without duplicating rows. The job keeps the size and a SHA-256 of
+# the first IMPORT_FINGERPRINT_BYTES of the file, and a resume with a different file is rejected.
+# Rows of an interrupted batch that were already stored get their search postings rewritten and are
+# counted in the site stats unless their import_counted flag shows they already were.
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+IMPORT_FINGERPRINT_BYTES = 64 * 1024
+IMPORT_STALE_SECONDS = float(os.environ.get('IMPORT_STALE_SECONDS', '300'))  # a running job idle this long may be resumed
+IMPORT_ERROR_PREVIEW = 100
+IMPORT_ID_NAMESPACE = uuid.UUID("6f1c8f43-8a73-4a8e-9a55-2f4a4d6b2c10")
+IMPORT_MODELS = {"properties": (PropertyCreate, Property), "lands": (LandCreate, Land), "sims": (SimCreate, Sim)}
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[Dict[str, Any]]
+
+class ImportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    collection: str
+    format: str
+    filename: Optional[str] = None
+    file_size: Optional[int] = None
+    file_sha256: Optional[str] = None  # of the first IMPORT_FINGERPRINT_BYTES
+    status: str = "running"  # running, completed, failed
+    rows_committed: int = 0  # rows fully processed, resume point
+    inserted: int = 0
+    existing: int = 0  # rows already written by an earlier attempt
+    failed: int = 0
+    error: Optional[str] = None
+    created_by: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ImportReport(ImportJob):
+    errors: List[ImportRowError] = []  # first IMPORT_ERROR_PREVIEW row errors
+
+def list_fields(model) -> set:
+    return {
+        name for name, field in model.model_fields.items()
+        if field.annotation is list or getattr(field.annotation, "__origin__", None) is list
+    }
+
+IMPORT_LIST_FIELDS = {collection_name: list_fields(models[0]) for collection_name, models in IMPORT_MODELS.items()}
+
+def iter_import_rows(file: UploadFile, file_format: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row number, row dict or error message) without reading the whole file into memory"""
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(text), start=1):
+                # Empty cells mean "not given"; cells beyond the header land under None
+                yield row_number, {key: value for key, value in row.items() if key and value not in (None, "")}
+        else:
+            row_number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield row_number, f"Invalid JSON: {str(e)}"
+                    continue
+                yield row_number, row if isinstance(row, dict) else "Row must be a JSON object"
+    finally:
+        text.detach()
+
+def import_document(collection_name: str, job_id: str, row_number: int, row: dict) -> dict:
+    """Validate a row like the create endpoints do and build the stored document"""
+    create_model, model = IMPORT_MODELS[collection_name]
+    for field in IMPORT_LIST_FIELDS[collection_name] & row.keys():
+        # CSV cells hold lists as JSON arrays or "a|b|c"
+        if isinstance(row[field], str):
+            value = row[field].strip()
+            row[field] = json.loads(value) if value.startswith("[") else [item.strip() for item in value.split("|") if item.strip()]
+    data = create_model(**row).dict()
+    if collection_name in ("properties", "lands"):
+        with_price_per_sqm(data)
+    data["id"] = str(uuid.uuid5(IMPORT_ID_NAMESPACE, f"{job_id}:{row_number}"))
+    return {**model(**data).dict(), "import_job_id": job_id, "import_counted": False}
+
+def import_fingerprint(file: UploadFile) -> Tuple[int, str]:
+    """Size and SHA-256 of the first IMPORT_FINGERPRINT_BYTES of an upload"""
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    digest = hashlib.sha256(file.file.read(IMPORT_FINGERPRINT_BYTES)).hexdigest()
+    file.file.seek(0)
+    return size, digest
+
+async def finish_existing_import_rows(collection_name: str, job_id: str, documents: List[dict]):
+    """Derived data for rows an interrupted attempt already stored: the search postings are simply
+    rewritten, the stats only counted for rows not flagged as counted"""
+    uncounted = await db[collection_name].find(
+        {"id": {"$in": [document["id"] for document in documents]}, "import_job_id": job_id, "import_counted": False},
+        {"_id": 0, "id": 1}
+    ).to_list(len(documents))
+    uncounted_ids = {document["id"] for document in uncounted}
+    if uncounted_ids:
+        await record_content_inserts(collection_name, [document for document in documents if document["id"] in uncounted_ids])
+        await db[collection_name].update_many({"id": {"$in": list(uncounted_ids)}}, {"$set": {"import_counted": True}})
+    if collection_name in SEARCH_COLLECTIONS:
+        await write_search_chunk(collection_name, documents)
+    await bump_content_generation(collection_name)
+
+def validation_messages(error: ValidationError) -> List[Dict[str, Any]]:
+    return [{"field": ".".join(str(part) for part in item["loc"]), "message": item["msg"]} for item in error.errors()]
+
+async def commit_import_batch(job: dict, batch: List[Tuple[int, dict]], row_errors: List[dict], last_row: int):
+    """Write one batch of rows and advance the job's resume point"""
+    documents = [document for _, document in batch]
+    inserted, rejected = await insert_content_documents(job["collection"], documents) if batch else ([], {})
+    if inserted:
+        await db[job["collection"]].update_many(
+            {"id": {"$in": [document["id"] for document in inserted]}}, {"$set": {"import_counted": True}}
         )
-        
-        # Create refund transaction
-        transaction = Transaction(
-            user_id=post["user_id"],
-            amount=POSTING_FEE,
-            transaction_type=TransactionType.deposit,
-            description=f"Refund for rejected {post['post_type']} post",
-            status=TransactionStatus.completed,
-            admin_notes=f"Refunded by admin {current_user.username}",
-            completed_at=datetime.utcnow()
+    inserted_ids = {document["id"] for document in inserted}
+    existing_documents = [
+        document for index, document in enumerate(documents) if index not in rejected and document["id"] not in inserted_ids
+    ]
+    if existing_documents:
+        await finish_existing_import_rows(job["collection"], job["id"], existing_documents)
+    for index, message in rejected.items():
+        row_errors.append({"row": batch[index][0], "errors": [{"field": None, "message": message}]})
+    new_errors = 0
+    if row_errors:
+        # Keyed by row, so rows retried after an interruption are not reported twice
+        result = await db.import_errors.bulk_write([
+            UpdateOne({"_id": f"{job['id']}:{error['row']}"}, {"$set": {"job_id": job["id"], **error}}, upsert=True)
+            for error in row_errors
+        ], ordered=False)
+        new_errors = result.upserted_count
+    existing = len(existing_documents)
+    await db.import_jobs.update_one({"id": job["id"]}, {
+        "$set": {"rows_committed": last_row, "updated_at": datetime.utcnow()},
+        "$inc": {"inserted": len(inserted), "existing": existing, "failed": new_errors}
+    })
+
+def parse_import_batch(job: dict, rows: Iterator[Tuple[int, Any]]) -> Tuple[List[Tuple[int, dict]], List[dict], Optional[int]]:
+    """Read and validate up to IMPORT_BATCH_SIZE rows past the job's resume point (blocking, run in a thread).
+    
+    Returns the documents, the row errors and the number of the last row read (None at the end of the file).
+    """
+    batch: List[Tuple[int, dict]] = []
+    row_errors: List[dict] = []
+    last_row = None
+    for row_number, row in rows:
+        if row_number <= job["rows_committed"]:
+            continue
+        last_row = row_number
+        if isinstance(row, str):
+            row_errors.append({"row": row_number, "errors": [{"field": None, "message": row}]})
+        else:
+            try:
+                batch.append((row_number, import_document(job["collection"], job["id"], row_number, row)))
+            except ValidationError as e:
+                row_errors.append({"row": row_number, "errors": validation_messages(e)})
+            except ValueError as e:
+                row_errors.append({"row": row_number, "errors": [{"field": None, "message": str(e)}]})
+        if len(batch) + len(row_errors) >= IMPORT_BATCH_SIZE:
+            break
+    return batch, row_errors, last_row
+
+async def run_import(job: dict, file: UploadFile):
+    rows = iter_import_rows(file, job["format"])
+    while True:
+        batch, row_errors, last_row = await asyncio.to_thread(parse_import_batch, job, rows)
+        if last_row is None:
+            break
+        await commit_import_batch(job, batch, row_errors, last_row)
+
+async def import_report(job_id: str) -> ImportReport:
+    job = await db.import_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    errors = await db.import_errors.find({"job_id": job_id}, {"_id": 0, "row": 1, "errors": 1}).sort("row", 1).limit(IMPORT_ERROR_PREVIEW).to_list(IMPORT_ERROR_PREVIEW)
+    return ImportReport(**job, errors=errors)
+
+@api_router.post("/admin/import/{collection_name}", response_model=ImportReport)
+async def bulk_import(
+    collection_name: str,
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    job_id: Optional[str] = Query(None, description="Resume this job with the same file"),
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Import properties, lands or sims from a CSV or NDJSON file - Admin only"""
+    if collection_name not in IMPORT_MODELS:
+        raise HTTPException(status_code=404, detail="Import supports properties, lands and sims")
+    file_size, file_sha256 = await asyncio.to_thread(import_fingerprint, file)
+    if job_id:
+        job = await db.import_jobs.find_one({"id": job_id}, {"_id": 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Import job not found")
+        if job["collection"] != collection_name:
+            raise HTTPException(status_code=400, detail=f"Import job {job_id} imports {job['collection']}")
+        if job["status"] == "completed":
+            return await import_report(job_id)
+        if job.get("file_sha256") and (job["file_size"], job["file_sha256"]) != (file_size, file_sha256):
+            raise HTTPException(status_code=400, detail=f"This is not the file import job {job_id} was started with")
+        # Claim the job, unless another upload is still working on it
+        stale_before = datetime.utcnow() - timedelta(seconds=IMPORT_STALE_SECONDS)
+        claimed = await db.import_jobs.update_one(
+            {"id": job_id, "$or": [{"status": {"$ne": "running"}}, {"updated_at": {"$lt": stale_before}}]},
+            {"$set": {
+                "status": "running",
+                "error": None,
+                "file_size": file_size,
+                "file_sha256": file_sha256,
+                "updated_at": datetime.utcnow()
+            }}
         )
-        await db.transactions.insert_one(transaction.dict())
+        if claimed.modified_count == 0:
+            raise HTTPException(status_code=409, detail=f"Import job {job_id} is already running")
+    else:
+        if file_format is None:
+            file_format = "ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+        job = ImportJob(
+            collection=collection_name,
+            format=file_format,
+            filename=file.filename,
+            file_size=file_size,
+            file_sha256=file_sha256,
+            created_by=current_admin.id
+        ).dict()
+        await db.import_jobs.insert_one(dict(job))
     
-    return {"message": f"{post['post_type']} post rejected and fee refunded"}
+    try:
+        await run_import(job, file)
+    except (UnicodeDecodeError, csv.Error) as e:
+        await db.import_jobs.update_one({"id": job["id"]}, {"$set": {"status": "failed", "error": f"Unreadable file: {str(e)}", "updated_at": datetime.utcnow()}})
+        return await import_report(job["id"])
+    except Exception as e:
+        logger.error(f"Error importing {collection_name} (job {job['id']}): {str(e)}")
+        await db.import_jobs.update_one({"id": job["id"]}, {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}})
+        return await import_report(job["id"])
+    
+    await db.import_jobs.update_one({"id": job["id"]}, {"$set": {"status": "completed", "updated_at": datetime.utcnow()}})
+    logger.info(f"Import job {job['id']} into {collection_name} completed by {current_admin.username}")
+    return await import_report(job["id"])
+
+@api_router.get("/admin/import/jobs/{job_id}", response_model=ImportReport)
+async def get_import_job(job_id: str, current_admin: AuthPrincipal = Depends(get_current_admin)):
+    """Progress and first row errors of an import job - Admin only"""
+    return await import_report(job_id)
+
+@api_router.get("/admin/import/jobs/{job_id}/errors", response_model=List[ImportRowError])
+async def get_import_errors(
+    job_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, le=1000),
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Full per-row error report of an import job - Admin only"""
+    return await db.import_errors.find({"job_id": job_id}, {"_id": 0, "row": 1, "errors": 1}).sort("row", 1).skip(skip).limit(limit).to_list(limit)
+
+# Admin Exports
+# Exports stream straight from a Motor cursor as CSV or NDJSON, a few hundred rows per chunk, so
+# memory does not grow with the result size. Only the columns listed in EXPORT_FIELDS are fetched:
+# heavy or sensitive fields (transfer_bill, avatar, hashed_password, images) never leave the database.
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_CHUNK_ROWS = 200
+LISTING_EXPORT_FIELDS = ["id", "title", "status", "price", "price_per_sqm", "area", "address", "district", "city",
+                         "latitude", "longitude", "featured", "views", "contact_phone", "contact_email", "agent_name",
+                         "created_at", "updated_at"]
+EXPORT_FIELDS = {
+    "transactions": ["id", "user_id", "amount", "transaction_type", "status", "description", "reference_id",
+                     "transaction_id", "method", "admin_notes", "created_at", "updated_at", "completed_at"],
+    "users": ["id", "username", "email", "full_name", "phone", "address", "role", "status", "wallet_balance",
+              "is_active", "email_verified", "profile_completed", "created_at", "last_login"],
+    "properties": LISTING_EXPORT_FIELDS[:2] + ["property_type", "bedrooms", "bathrooms"] + LISTING_EXPORT_FIELDS[2:],
+    "lands": LISTING_EXPORT_FIELDS[:2] + ["land_type", "width", "length", "legal_status", "orientation", "road_width"] + LISTING_EXPORT_FIELDS[2:],
+}
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+EXPORT_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def export_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, list):
+        text = "|".join(str(item) for item in value)
+    elif isinstance(value, str):
+        text = value
+    else:
+        # Numbers (a negative amount starts with "-") stay numbers
+        return str(value)
+    # User-entered text: quoted so it is shown, not evaluated
+    return f"'{text}" if text.startswith(EXPORT_FORMULA_PREFIXES) else text
+
+async def export_rows(collection_name: str, filter_query: dict, file_format: str) -> AsyncIterator[bytes]:
+    fields = EXPORT_FIELDS[collection_name]
+    cursor = db[collection_name].find(filter_query, {"_id": 0, **{field: 1 for field in fields}})
+    cursor = cursor.sort(keyset_sort("created_at", -1)).batch_size(EXPORT_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if file_format == "csv":
+        writer.writerow(fields)
+    rows = 0
+    try:
+        async for document in cursor:
+            if file_format == "csv":
+                writer.writerow([export_cell(document.get(field)) for field in fields])
+            else:
+                buffer.write(json.dumps({field: document.get(field) for field in fields}, default=archive_json_default, ensure_ascii=False))
+                buffer.write("\n")
+            rows += 1
+            if rows % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+    finally:
+        # Also when the client disconnects mid-download: free the server-side cursor now
+        await cursor.close()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def created_range_query(filter_query: dict, created_from: Optional[datetime], created_to: Optional[datetime]) -> dict:
+    """Restrict a filter to created_from <= created_at < created_to"""
+    if created_from or created_to:
+        created_at = {}
+        if created_from:
+            created_at["$gte"] = created_from
+        if created_to:
+            created_at["$lt"] = created_to
+        filter_query["created_at"] = created_at
+    return filter_query
+
+def export_response(collection_name: str, filter_query: dict, file_format: str) -> StreamingResponse:
+    filename = f"{collection_name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{file_format}"
+    media_type = "text/csv; charset=utf-8" if file_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_rows(collection_name, filter_query, file_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+@api_router.get("/admin/export/transactions")
+async def export_transactions(
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    status: Optional[TransactionStatus] = None,
+    transaction_type: Optional[TransactionType] = None,
+    user_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Stream all matching transactions as CSV or NDJSON - Admin only"""
+    filter_query = {}
+    if status:
+        filter_query["status"] = status
+    if transaction_type:
+        filter_query["transaction_type"] = transaction_type
+    if user_id:
+        filter_query["user_id"] = user_id
+    return export_response("transactions", created_range_query(filter_query, created_from, created_to), file_format)
+
+@api_router.get("/admin/export/users")
+async def export_users(
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    role: Optional[UserRole] = None,
+    status: Optional[UserStatus] = None,
+    search: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Stream all matching users (without avatars or password hashes) as CSV or NDJSON - Admin only"""
+    filter_query = {}
+    if role:
+        filter_query["role"] = role
+    if status:
+        filter_query["status"] = status
+    if search:
+        pattern = re.escape(search)
+        filter_query["$or"] = [
+            {"username": {"$regex": pattern, "$options": "i"}},
+            {"email": {"$regex": pattern, "$options": "i"}},
+            {"full_name": {"$regex": pattern, "$options": "i"}}
+        ]
+    return export_response("users", created_range_query(filter_query, created_from, created_to), file_format)
+
+@api_router.get("/admin/export/properties")
+async def export_properties(
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    property_type: Optional[PropertyType] = None,
+    status: Optional[PropertyStatus] = None,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    bedrooms: Optional[int] = None,
+    bathrooms: Optional[int] = None,
+    featured: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Stream all matching properties (without images) as CSV or NDJSON - Admin only"""
+    filter_query = property_filter_query(property_type, status, city, district, min_price, max_price,
+                                         min_area, max_area, bedrooms, bathrooms, featured)
+    return export_response("properties", created_range_query(filter_query, created_from, created_to), file_format)
+
+@api_router.get("/admin/export/lands")
+async def export_lands(
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    land_type: Optional[LandType] = None,
+    status: Optional[PropertyStatus] = None,
+    city: Optional[str] = None,
+    district: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    featured: Optional[bool] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_admin: AuthPrincipal = Depends(get_current_admin)
+):
+    """Stream all matching lands (without images) as CSV or NDJSON - Admin only"""
+    filter_query = land_filter_query(land_type, status, city, district, min_price, max_price, min_area, max_area, featured)
+    return export_response("lands", created_range_query(filter_query, created_from, created_to), file_format)
 
 # Image Upload Routes
 @api_router.post("/upload/image")
 async def upload_image(file: UploadFile = File(...)):
-    """Upload image and return base64 encoded string"""
+    """Upload an image, store it with its thumbnail/medium variants and return their URLs"""
     try:
         # Check file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Check file size (max 5MB)
-        file_size = 0
-        file_content = await file.read()
-        file_size = len(file_content)
-        
-        if file_size > 5 * 1024 * 1024:  # 5MB
-            raise HTTPException(status_code=400, detail="File size too large (max 5MB)")
-        
-        # Convert to base64
-        import base64
-        base64_string = base64.b64encode(file_content).decode('utf-8')
-        data_url = f"data:{file.content_type};base64,{base64_string}"
+        # Read (max 5MB), process on the image pool and store
+        file_content = await read_upload(file, MAX_IMAGE_BYTES)
+        stored = await ingest_image(file_content)
         
         return {
             "success": True,
-            "image_url": data_url,
+            "image_url": public_blob_url(stored["url"]),
+            "blob_id": stored["blob_id"],
+            "thumbnail_url": public_blob_url(stored["variants"].get("thumb", stored["url"])),
+            "variants": {name: public_blob_url(url) for name, url in stored["variants"].items()},
             "filename": file.filename,
-            "size": file_size
+            "size": stored["size"]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading image: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
 
 @api_router.post("/upload/multiple-images")
 async def upload_multiple_images(files: List[UploadFile] = File(...)):
-    """Upload multiple images and return base64 encoded strings"""
+    """Upload multiple images to the blob store and return their URLs"""
     try:
         if len(files) > 10:  # Max 10 images
             raise HTTPException(status_code=400, detail="Maximum 10 images allowed")
         
+        # Check file types before storing anything
+        for file in files:
+            if not file.content_type.startswith('image/'):
+                raise HTTPException(status_code=400, detail=f"File {file.filename} must be an image")
+        
         results = []
         total_size = 0
         
+        contents = []
         for file in files:
-            # Check file type
-            if not file.content_type.startswith('image/'):
-                raise HTTPException(status_code=400, detail=f"File {file.filename} must be an image")
-            
-            # Read file content
-            file_content = await file.read()
-            file_size = len(file_content)
-            total_size += file_size
-            
-            # Check individual file size (max 5MB)
-            if file_size > 5 * 1024 * 1024:
+            # Read each file (max 5MB per file)
+            try:
+                file_content = await read_upload(file, MAX_IMAGE_BYTES)
+            except HTTPException:
                 raise HTTPException(status_code=400, detail=f"File {file.filename} is too large (max 5MB)")
+            total_size += len(file_content)
             
-            # Convert to base64
-            import base64
-            base64_string = base64.b64encode(file_content).decode('utf-8')
-            data_url = f"data:{file.content_type};base64,{base64_string}"
-            
+            # Check total size (max 25MB for all files)
+            if total_size > 25 * 1024 * 1024:
+                raise HTTPException(status_code=400, detail="Total file size too large (max 25MB)")
+            contents.append(file_content)
+        
+        # Process all images concurrently on the image pool
+        stored_images = await asyncio.gather(*[
+            ingest_image(file_content) for file_content in contents
+        ])
+        for file, stored in zip(files, stored_images):
             results.append({
                 "filename": file.filename,
-                "image_url": data_url,
-                "size": file_size
+                "image_url": public_blob_url(stored["url"]),
+                "blob_id": stored["blob_id"],
+                "thumbnail_url": public_blob_url(stored["variants"].get("thumb", stored["url"])),
+                "variants": {name: public_blob_url(url) for name, url in stored["variants"].items()},
+                "size": stored["size"]
             })
         
-        # Check total size (max 25MB for all files)
-        if total_size > 25 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="Total file size too large (max 25MB)")
-        
         return {
             "success": True,
             "images": results,
@@ -2989,11 +6377,34 @@ async def upload_multiple_images(files: List[UploadFile] = File(...)):
         logger.error(f"Error uploading multiple images: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error uploading images: {str(e)}")
 
+@api_router.get("/blobs/{blob_id}")
+async def get_blob(blob_id: str, request: Request):
+    """Serve stored blob bytes. Blob URLs never change content, so they are cached forever."""
+    if not BLOB_ID_PATTERN.match(blob_id):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    blob = await db.blobs.find_one({"id": blob_id}, {"_id": 0})
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    
+    headers = {
+        "ETag": f'"{blob_id}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+    }
+    if blob["content_type"] not in IMAGE_UPLOAD_CONTENT_TYPES.values():
+        # Stored before uploads were restricted to decodable images: never render it inline
+        headers["Content-Disposition"] = f'attachment; filename="{blob_id}"'
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    headers["Content-Length"] = str(blob["size"])
+    return StreamingResponse(blob_backend.stream(blob_id), media_type=blob["content_type"], headers=headers)
+
 # Admin Recent Activities API
 @api_router.get("/admin/recent-activities")
 async def get_recent_activities(
     limit: int = Query(10, le=50),
-    current_user: User = Depends(get_current_admin)
+    current_user: AuthPrincipal = Depends(get_current_admin)
 ):
     """Get recent activities for admin dashboard"""
     try:
@@ -3062,15 +6473,194 @@ async def get_recent_activities(
         logger.error(f"Error getting recent activities: {str(e)}")
         return []
 
+# Cache Monitoring
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(current_admin: AuthPrincipal = Depends(get_current_admin)):
+    """Get in-process cache hit/miss counters - Admin only"""
+    return {
+        "principals": principal_cache.stats(),
+        "admin_dashboard_stats": admin_stats_snapshot.stats(),
+        "listing_facets": listing_facets_cache.stats(),
+        "pageview_buffer": pageview_buffer.stats(),
+        "view_counters": view_counters.stats(),
+        "wallet_ledger": wallet_ledger.stats(),
+        "site_settings": site_settings_cache.stats(),
+        "password_pool": {
+            "executor": PASSWORD_HASH_EXECUTOR,
+            "workers": PASSWORD_HASH_WORKERS,
+            "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+            "in_flight": password_jobs_in_flight
+        }
+    }
+
+# Database Index Management
+# Declared indexes per collection, matching the filter + sort shapes used by the routes above
+INDEX_DECLARATIONS: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("role", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("wallet_pending.at", ASCENDING)], sparse=True),
+    ],
+    "properties": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("featured", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("property_type", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("price", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("location", GEOSPHERE)]),
+    ],
+    "lands": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("featured", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("land_type", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("price", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("location", GEOSPHERE)]),
+    ],
+    "sims": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("network", ASCENDING), ("price", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("price", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("number_digits", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("number_reversed", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("number_ngrams", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("number_patterns", ASCENDING), ("price", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "news_articles": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("published", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("published", ASCENDING), ("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "tickets": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "transactions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("transaction_type", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("transaction_type", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "member_posts": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("post_type", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("moderation_batch", ASCENDING)], sparse=True),
+    ],
+    "messages": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("from_user_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("to_user_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("to_user_id", ASCENDING), ("read", ASCENDING)]),
+    ],
+    "pageviews": [
+        IndexModel([("timestamp", ASCENDING)]),
+        IndexModel([("timestamp", ASCENDING), ("session_id", ASCENDING)]),
+        IndexModel([("timestamp", ASCENDING), ("page_path", ASCENDING)]),
+    ],
+    "traffic_analytics": [
+        IndexModel([("granularity", ASCENDING), ("page_path", ASCENDING), ("timestamp", ASCENDING)]),
+        IndexModel([("granularity", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+    "counters": [
+        IndexModel([("kind", ASCENDING), ("count", DESCENDING)]),
+    ],
+    "blobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "search_postings": [
+        IndexModel([("collection", ASCENDING), ("token", ASCENDING), ("score", DESCENDING)]),
+        IndexModel([("collection", ASCENDING), ("doc_id", ASCENDING), ("token", ASCENDING)]),
+    ],
+    "import_jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "import_errors": [
+        IndexModel([("job_id", ASCENDING), ("row", ASCENDING)]),
+    ],
+}
+
+async def ensure_indexes():
+    """Create all declared indexes (idempotent, safe to run on every startup)"""
+    for collection_name, indexes in INDEX_DECLARATIONS.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except Exception as e:
+                # Keep going: one bad index (e.g. duplicates blocking a unique index) must not block startup
+                logger.error(f"Error creating index {index.document['name']} on {collection_name}: {str(e)}")
+
+@api_router.get("/admin/indexes")
+async def get_index_audit(current_admin: AuthPrincipal = Depends(get_current_admin)):
+    """List declared vs. actual indexes and their sizes - Admin only"""
+    report = []
+    for collection_name, indexes in INDEX_DECLARATIONS.items():
+        declared = {index.document["name"]: index.document for index in indexes}
+        actual = await db[collection_name].index_information()
+        
+        try:
+            coll_stats = await db.command("collStats", collection_name)
+        except Exception:
+            coll_stats = {}
+        index_sizes = coll_stats.get("indexSizes", {})
+        
+        index_rows = []
+        for name in sorted(set(declared) | set(actual)):
+            spec = declared.get(name) or actual[name]
+            keys = spec["key"].items() if isinstance(spec["key"], dict) else spec["key"]
+            index_rows.append({
+                "name": name,
+                "keys": [[field, direction] for field, direction in keys],
+                "unique": bool(spec.get("unique", False)),
+                "declared": name in declared or name == "_id_",
+                "present": name in actual,
+                "size_bytes": index_sizes.get(name, 0)
+            })
+        
+        report.append({
+            "collection": collection_name,
+            "document_count": coll_stats.get("count", 0),
+            "total_index_size": coll_stats.get("totalIndexSize", 0),
+            "missing": [name for name in declared if name not in actual],
+            "undeclared": [name for name in actual if name not in declared and name != "_id_"],
+            "indexes": index_rows
+        })
+    
+    return report
+
 # Include the router in the main app
 app.include_router(api_router)
 
+if DB_COMMAND_TRACING:
+    @app.middleware("http")
+    async def count_db_commands(request: Request, call_next):
+        counter = [0]
+        token = db_command_counter.set(counter)
+        try:
+            response = await call_next(request)
+        finally:
+            db_command_counter.reset(token)
+        response.headers[DB_COMMANDS_HEADER] = str(counter[0])
+        return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", DB_COMMANDS_HEADER],
 )
 
 # Configure logging
@@ -3080,8 +6670,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Long-running background tasks started at startup and cancelled at shutdown
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def startup_db_client():
+    await ensure_indexes()
+    # Rendering may differ between deploys: invalidate every validator handed out by earlier code
+    await bump_content_generation(FORMAT_GENERATION)
+    rollup_backfill = await prepare_traffic_rollups()
+    background_tasks.append(asyncio.create_task(pageview_maintenance_loop(rollup_backfill)))
+    background_tasks.append(asyncio.create_task(image_maintenance()))
+    background_tasks.append(asyncio.create_task(backfill_sim_number_index()))
+    background_tasks.append(asyncio.create_task(backfill_geo_locations()))
+    if await search_index_needs_rebuild():
+        background_tasks.append(asyncio.create_task(rebuild_search_index()))
+    background_tasks.append(asyncio.create_task(counters_reconcile_loop()))
+    background_tasks.append(asyncio.create_task(pageview_buffer.run()))
+    background_tasks.append(asyncio.create_task(view_counters.run()))
+    await wallet_ledger.detect()
+    background_tasks.append(asyncio.create_task(wallet_ledger.run()))
+    await site_settings_cache.reload()
+    background_tasks.append(asyncio.create_task(site_settings_cache.run()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    # Let a flush the cancellation interrupted hand its increments back before the final flush
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await pageview_buffer.drain()
+    await view_counters.drain()
+    if password_executor is not None:
+        password_executor.shutdown(wait=False)
+    if image_executor is not None:
+        image_executor.shutdown(wait=False)
     client.close()
 
 if __name__ == "__main__":
@@ -894,8 +894,8 @@ const PropertiesSection = ({ searchFilters, hideTitle = false }) => {
   const [loadingMore, setLoadingMore] = useState(false);
   const [hasMoreFeatured, setHasMoreFeatured] = useState(true);
   const [hasMoreLatest, setHasMoreLatest] = useState(true);
-  const [featuredSkip, setFeaturedSkip] = useState(0);
-  const [latestSkip, setLatestSkip] = useState(0);
+  const [featuredCursor, setFeaturedCursor] = useState(null);
+  const [latestCursor, setLatestCursor] = useState(null);
 
   useEffect(() => {
     fetchProperties();
@@ -904,7 +904,7 @@ const PropertiesSection = ({ searchFilters, hideTitle = false }) => {
     }
   }, [searchFilters]);
 
-  const fetchProperties = async (skip = 0, append = false) => {
+  const fetchProperties = async (cursor = null, append = false) => {
     try {
       if (!append) setLoading(true);
       const params = new URLSearchParams();
@@ -913,7 +913,7 @@ const PropertiesSection = ({ searchFilters, hideTitle = false }) => {
       if (searchFilters?.minPrice) params.append('min_price', searchFilters.minPrice);
       if (searchFilters?.maxPrice) params.append('max_price', searchFilters.maxPrice);
       if (searchFilters?.bedrooms) params.append('bedrooms', searchFilters.bedrooms);
-      params.append('skip', skip.toString());
+      if (cursor) params.append('cursor', cursor);
       params.append('limit', '6');
       
       const response = await axios.get(`${API}/properties?${params.toString()}`);
@@ -925,7 +925,10 @@ const PropertiesSection = ({ searchFilters, hideTitle = false }) => {
         setProperties(newProperties);
       }
       
-      if (newProperties.length < 6) {
+      // The next page cursor is only sent while more results may follow
+      const nextCursor = response.headers['x-next-cursor'] || null;
+      setLatestCursor(nextCursor);
+      if (!nextCursor) {
         setHasMoreLatest(false);
       }
       
@@ -937,9 +940,10 @@ const PropertiesSection = ({ searchFilters, hideTitle = false }) => {
     }
   };
 
-  const fetchFeaturedProperties = async (skip = 0, append = false) => {
+  const fetchFeaturedProperties = async (cursor = null, append = false) => {
     try {
-      const response = await axios.get(`${API}/properties?featured=true&limit=6&skip=${skip}`);
+      const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await axios.get(`${API}/properties?featured=true&limit=6${cursorParam}`);
       const newFeatured = response.data;
       
       if (append) {
@@ -948,7 +952,9 @@ const PropertiesSection = ({ searchFilters, hideTitle = false }) => {
         setFeaturedProperties(newFeatured);
       }
       
-      if (newFeatured.length < 6) {
+      const nextCursor = response.headers['x-next-cursor'] || null;
+      setFeaturedCursor(nextCursor);
+      if (!nextCursor) {
         setHasMoreFeatured(false);
       }
     } catch (error) {
@@ -958,17 +964,13 @@ const PropertiesSection = ({ searchFilters, hideTitle = false }) => {
 
   const loadMoreFeatured = async () => {
     setLoadingMore(true);
-    const newSkip = featuredSkip + 6;
-    setFeaturedSkip(newSkip);
-    await fetchFeaturedProperties(newSkip, true);
+    await fetchFeaturedProperties(featuredCursor, true);
     setLoadingMore(false);
   };
 
   const loadMoreLatest = async () => {
     setLoadingMore(true);
-    const newSkip = latestSkip + 6;
-    setLatestSkip(newSkip);
-    await fetchProperties(newSkip, true);
+    await fetchProperties(latestCursor, true);
   };
 
   const handlePropertyClick = (property) => {
@@ -168,10 +168,10 @@ const AdminDashboard = () => {
       
       // Make API calls with detailed error logging
       const apiCalls = [
-        { name: 'properties', url: `${API}/properties?limit=50` },
+        { name: 'properties', url: `${API}/admin/properties?limit=50` },
         { name: 'news', url: `${API}/news?limit=50` },
         { name: 'sims', url: `${API}/sims?limit=50` },
-        { name: 'lands', url: `${API}/lands?limit=50` },
+        { name: 'lands', url: `${API}/admin/lands?limit=50` },
         { name: 'tickets', url: `${API}/tickets?limit=50` },
         { name: 'members', url: `${API}/admin/users` },
         { name: 'deposits', url: `${API}/admin/transactions` },
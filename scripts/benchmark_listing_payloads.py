@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Listing Payload Benchmark
+Compares the response size and latency of full listing documents (admin list endpoints, the shape the
+public list endpoints used to return) against the summary list endpoints, on a seeded dataset.
+
+    python scripts/benchmark_listing_payloads.py --seed 500          # seed 500 properties + 500 lands
+    python scripts/benchmark_listing_payloads.py --runs 50 --limit 20
+    python scripts/benchmark_listing_payloads.py --cleanup           # remove the seeded documents
+
+--inline-images seeds base64 data URLs instead of blob URLs, like documents stored before the blob store.
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent.parent
+load_dotenv(ROOT_DIR / 'backend' / '.env')
+load_dotenv('/app/frontend/.env')
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001') + '/api'
+BENCH_ID_PREFIX = "bench-"
+
+CITIES = ["Hồ Chí Minh", "Hà Nội", "Đà Nẵng", "Cần Thơ", "Hải Phòng", "Nha Trang"]
+DISTRICTS = ["Quận 1", "Quận 3", "Quận 7", "Bình Thạnh", "Cầu Giấy", "Hải Châu", "Ninh Kiều"]
+PARAGRAPH = (
+    "Căn hộ nằm tại vị trí đắc địa, gần trường học, bệnh viện và trung tâm thương mại. "
+    "Thiết kế hiện đại, nội thất cao cấp, ban công thoáng mát view thành phố. "
+    "Pháp lý rõ ràng, sổ hồng chính chủ, hỗ trợ vay ngân hàng đến 70% giá trị. "
+)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def fake_images(count: int, inline: bool):
+    if inline:
+        # ~150KB per image once base64 encoded, like phone photos squeezed by the old upload path
+        return [f"data:image/jpeg;base64,{base64.b64encode(os.urandom(110 * 1024)).decode()}" for _ in range(count)]
+    return [f"/api/blobs/{uuid.uuid4().hex}{uuid.uuid4().hex}" for _ in range(count)]
+
+def listing_base(index: int, inline_images: bool):
+    price = random.randint(1, 200) * 100_000_000
+    area = random.randint(30, 500)
+    return {
+        "id": f"{BENCH_ID_PREFIX}{uuid.uuid4()}",
+        "title": f"Bất động sản demo #{index} - {random.choice(DISTRICTS)}",
+        "description": PARAGRAPH * random.randint(10, 30),
+        "status": random.choice(["for_sale", "for_rent"]),
+        "price": float(price),
+        "price_per_sqm": round(price / area, 2),
+        "area": float(area),
+        "address": f"{random.randint(1, 500)} Đường số {random.randint(1, 50)}",
+        "district": random.choice(DISTRICTS),
+        "city": random.choice(CITIES),
+        "images": fake_images(random.randint(5, 10), inline_images),
+        "featured": random.random() < 0.2,
+        "created_at": datetime.utcnow() - timedelta(minutes=index),
+        "updated_at": datetime.utcnow(),
+        "views": random.randint(0, 5000),
+        "contact_phone": "0901234567",
+        "contact_email": "sales@example.com",
+        "agent_name": "Demo Agent"
+    }
+
+async def seed(count: int, inline_images: bool):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    properties = []
+    lands = []
+    for index in range(count):
+        properties.append({
+            **listing_base(index, inline_images),
+            "property_type": random.choice(["apartment", "house", "villa", "shophouse"]),
+            "bedrooms": random.randint(1, 5),
+            "bathrooms": random.randint(1, 4)
+        })
+        lands.append({
+            **listing_base(index, inline_images),
+            "land_type": random.choice(["residential", "commercial", "agricultural"]),
+            "width": float(random.randint(4, 20)),
+            "length": float(random.randint(10, 40)),
+            "legal_status": "Sổ đỏ",
+            "orientation": random.choice(["Đông", "Tây", "Nam", "Bắc"]),
+            "road_width": float(random.randint(3, 20))
+        })
+    for batch_start in range(0, count, 100):
+        await db.properties.insert_many(properties[batch_start:batch_start + 100])
+        await db.lands.insert_many(lands[batch_start:batch_start + 100])
+    print(f"✅ Seeded {count} properties and {count} lands")
+    client.close()
+
+async def cleanup():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    bench_filter = {"id": {"$regex": f"^{BENCH_ID_PREFIX}"}}
+    deleted_properties = await db.properties.delete_many(bench_filter)
+    deleted_lands = await db.lands.delete_many(bench_filter)
+    print(f"🧹 Removed {deleted_properties.deleted_count} properties and {deleted_lands.deleted_count} lands")
+    client.close()
+
+def admin_token(username: str, password: str) -> str:
+    response = requests.post(f"{BACKEND_URL}/auth/login", json={"username": username, "password": password}, timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+def measure(session: requests.Session, url: str, runs: int, headers=None):
+    """Return (response bytes, latencies in ms) for repeated GETs"""
+    latencies = []
+    size = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = session.get(url, headers=headers, timeout=60)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        size = len(response.content)
+    return size, latencies
+
+def run_benchmark(runs: int, limit: int, username: str, password: str):
+    headers = {"Authorization": f"Bearer {admin_token(username, password)}"}
+    session = requests.Session()
+    comparisons = [
+        ("properties", f"{BACKEND_URL}/admin/properties?limit={limit}", f"{BACKEND_URL}/properties?limit={limit}"),
+        ("lands", f"{BACKEND_URL}/admin/lands?limit={limit}", f"{BACKEND_URL}/lands?limit={limit}"),
+    ]
+
+    print("\n📊 Listing Payload Benchmark")
+    print(f"  Backend: {BACKEND_URL}  (limit={limit}, runs={runs})")
+    for name, full_url, summary_url in comparisons:
+        full_size, full_latencies = measure(session, full_url, runs, headers)
+        summary_size, summary_latencies = measure(session, summary_url, runs)
+        print(f"\n  {name}:")
+        print(f"    full:    {full_size / 1024:10.1f} KB  p50={statistics.median(full_latencies):.1f}ms "
+              f"p95={percentile(full_latencies, 95):.1f}ms")
+        print(f"    summary: {summary_size / 1024:10.1f} KB  p50={statistics.median(summary_latencies):.1f}ms "
+              f"p95={percentile(summary_latencies, 95):.1f}ms")
+        if summary_size:
+            print(f"    payload reduction: {full_size / summary_size:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full vs summary listing payloads")
+    parser.add_argument("--seed", type=int, default=0, help="seed this many properties and lands first")
+    parser.add_argument("--inline-images", action="store_true", help="seed base64 images instead of blob URLs")
+    parser.add_argument("--cleanup", action="store_true", help="remove seeded documents and exit")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        asyncio.run(cleanup())
+    else:
+        if args.seed:
+            asyncio.run(seed(args.seed, args.inline_images))
+        run_benchmark(args.runs, args.limit, args.username, args.password)
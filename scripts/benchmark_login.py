@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Login Throughput Benchmark
+Fires concurrent logins at the backend while probing a cheap endpoint to measure event loop stalls.
+
+Compare before/after by running the backend twice:
+    PASSWORD_HASH_EXECUTOR=inline python server.py   # old behaviour: bcrypt on the event loop
+    python server.py                                 # bcrypt on the password pool
+and running this script against each:
+    python scripts/benchmark_login.py --logins 200 --concurrency 32
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv('/app/frontend/.env')
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001') + '/api'
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def ensure_bench_user(username: str, password: str):
+    """Register the benchmark user (ignored if it already exists)"""
+    requests.post(f"{BACKEND_URL}/auth/register", json={
+        "username": username,
+        "email": f"{username}@bench.local",
+        "password": password
+    }, timeout=30)
+
+def probe_loop(stop_event: threading.Event, samples: list):
+    """Measure latency of GET /api/ until stopped - this is our event loop latency signal"""
+    session = requests.Session()
+    while not stop_event.is_set():
+        started = time.perf_counter()
+        session.get(f"{BACKEND_URL}/", timeout=30)
+        samples.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.01)
+
+def run_benchmark(logins: int, concurrency: int, username: str, password: str):
+    ensure_bench_user(username, password)
+
+    probe_samples = []
+    status_counts = {}
+    login_latencies = []
+    lock = threading.Lock()
+
+    def do_login(_):
+        started = time.perf_counter()
+        response = requests.post(f"{BACKEND_URL}/auth/login", json={
+            "username": username,
+            "password": password
+        }, timeout=60)
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+            login_latencies.append(elapsed)
+
+    stop_event = threading.Event()
+    prober = threading.Thread(target=probe_loop, args=(stop_event, probe_samples), daemon=True)
+    prober.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(do_login, range(logins)))
+    wall_time = time.perf_counter() - started
+
+    stop_event.set()
+    prober.join()
+
+    print("\n📊 Login Throughput Benchmark")
+    print(f"  Backend: {BACKEND_URL}")
+    print(f"  Logins: {logins} (concurrency {concurrency}) in {wall_time:.2f}s -> {logins / wall_time:.1f} logins/s")
+    print(f"  Status codes: {status_counts}")
+    print(f"  Login latency ms: p50={percentile(login_latencies, 50):.1f} p95={percentile(login_latencies, 95):.1f} max={max(login_latencies):.1f}")
+    if probe_samples:
+        print(f"  Loop probe latency ms ({len(probe_samples)} samples): "
+              f"p50={statistics.median(probe_samples):.1f} p95={percentile(probe_samples, 95):.1f} "
+              f"p99={percentile(probe_samples, 99):.1f} max={max(probe_samples):.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent logins and event loop latency")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--username", default=f"bench_{uuid.uuid4().hex[:8]}")
+    parser.add_argument("--password", default="bench-password-123")
+    args = parser.parse_args()
+    run_benchmark(args.logins, args.concurrency, args.username, args.password)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Wallet Debit Concurrency Benchmark
+Funds a fresh member with enough balance for --funded-posts post fees, fires --posts concurrent
+POST /api/member/posts requests at the backend, then checks the wallet against the ledger:
+
+    successful posts == min(posts, funded posts)
+    final balance    == initial balance - successful posts * fee   (and never negative)
+    post_fee entries == successful posts == member posts stored
+    no wallet_pending markers left on the user
+
+    python scripts/benchmark_wallet_debits.py --posts 2000 --funded-posts 1000 --concurrency 64
+
+Exits with status 1 if any check fails. The bench user and its posts/transactions are removed
+afterwards unless --keep is given.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent.parent
+load_dotenv(ROOT_DIR / 'backend' / '.env')
+load_dotenv('/app/frontend/.env')
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001') + '/api'
+POST_FEE = 50000.0
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def register_bench_user(username: str, password: str) -> str:
+    response = requests.post(f"{BACKEND_URL}/auth/register", json={
+        "username": username,
+        "email": f"{username}@bench.local",
+        "password": password
+    }, timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def set_balance(username: str, balance: float) -> str:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    user = await db.users.find_one_and_update({"username": username}, {"$set": {"wallet_balance": balance}})
+    client.close()
+    return user["id"]
+
+async def ledger_state(user_id: str):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    user = await db.users.find_one({"id": user_id})
+    fee_entries = await db.transactions.count_documents({"user_id": user_id, "transaction_type": "post_fee"})
+    posts = await db.member_posts.count_documents({"author_id": user_id})
+    client.close()
+    return user.get("wallet_balance", 0.0), user.get("wallet_pending", []), fee_entries, posts
+
+async def cleanup(user_id: str):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    await db.member_posts.delete_many({"author_id": user_id})
+    await db.transactions.delete_many({"user_id": user_id})
+    await db.users.delete_one({"id": user_id})
+    client.close()
+
+def run_benchmark(posts: int, funded_posts: int, concurrency: int, keep: bool) -> bool:
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    token = register_bench_user(username, "bench-password-123")
+    initial_balance = funded_posts * POST_FEE
+    user_id = asyncio.run(set_balance(username, initial_balance))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    status_counts = {}
+    latencies = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def do_post(index):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = local.session.post(f"{BACKEND_URL}/member/posts", headers=headers, json={
+            "title": f"Bench post #{index}",
+            "description": "Wallet debit benchmark",
+            "post_type": "property",
+            "price": 1_000_000_000,
+            "contact_phone": "0901234567"
+        }, timeout=60)
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(do_post, range(posts)))
+    wall_time = time.perf_counter() - started
+
+    final_balance, pending, fee_entries, stored_posts = asyncio.run(ledger_state(user_id))
+    successes = status_counts.get(200, 0)
+    expected_successes = min(posts, funded_posts)
+    expected_balance = initial_balance - successes * POST_FEE
+    checks = [
+        ("successful posts", successes, expected_successes),
+        ("final balance", final_balance, expected_balance),
+        ("post_fee ledger entries", fee_entries, successes),
+        ("member posts stored", stored_posts, successes),
+        ("pending markers", len(pending), 0),
+    ]
+
+    print("\n📊 Wallet Debit Concurrency Benchmark")
+    print(f"  Backend: {BACKEND_URL}")
+    print(f"  Posts: {posts} (concurrency {concurrency}, funded for {funded_posts}) in {wall_time:.2f}s "
+          f"-> {posts / wall_time:.1f} req/s")
+    print(f"  Status codes: {status_counts}")
+    print(f"  Latency ms: p50={percentile(latencies, 50):.1f} p95={percentile(latencies, 95):.1f} "
+          f"p99={percentile(latencies, 99):.1f} max={max(latencies):.1f}")
+    print(f"  Balance: {initial_balance:,.0f} -> {final_balance:,.0f} VND")
+    passed = final_balance >= 0
+    for name, actual, expected in checks:
+        ok = actual == expected
+        passed = passed and ok
+        print(f"  {'✅' if ok else '❌'} {name}: {actual} (expected {expected})")
+    print(f"  {'✅ no balance drift' if passed else '❌ balance drift detected'}")
+
+    if not keep:
+        asyncio.run(cleanup(user_id))
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Race concurrent post-fee debits and check the wallet against the ledger")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--funded-posts", type=int, default=1000, help="initial balance in post fees")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--keep", action="store_true", help="keep the bench user, posts and transactions")
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.posts, args.funded_posts, args.concurrency, args.keep) else 1)
@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# server.py reads its settings at import time; the client it creates only connects on first use
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bds_vietnam_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
@@ -0,0 +1,68 @@
+import pytest
+
+from server import HLL_PRECISION, HyperLogLog, merged_unique_count
+
+# 1.04 / sqrt(2^12) is about 1.6%; three standard errors keep these deterministic inputs well inside
+STANDARD_ERROR = 1.04 / (1 << HLL_PRECISION) ** 0.5
+
+
+def sketch_of(values) -> HyperLogLog:
+    sketch = HyperLogLog()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+
+
+def test_small_counts_are_close_to_exact():
+    sketch = sketch_of(f"session-{i}" for i in range(100))
+    assert abs(sketch.count() - 100) <= 2
+
+
+def test_duplicates_are_not_counted():
+    sketch = sketch_of(f"session-{i % 50}" for i in range(10000))
+    assert abs(sketch.count() - 50) <= 1
+
+
+@pytest.mark.parametrize("distinct", [1000, 20000, 200000])
+def test_estimate_within_error_bound(distinct):
+    sketch = sketch_of(f"session-{i}" for i in range(distinct))
+    assert abs(sketch.count() - distinct) <= 3 * STANDARD_ERROR * distinct
+
+
+def test_merge_equals_sketch_of_union():
+    first = sketch_of(f"session-{i}" for i in range(0, 30000))
+    second = sketch_of(f"session-{i}" for i in range(20000, 50000))
+    union = sketch_of(f"session-{i}" for i in range(0, 50000))
+    first.merge(second)
+    assert first.registers == union.registers
+    assert abs(first.count() - 50000) <= 3 * STANDARD_ERROR * 50000
+
+
+def test_merge_is_idempotent():
+    sketch = sketch_of(f"session-{i}" for i in range(5000))
+    before = sketch.count()
+    sketch.merge(sketch_of(f"session-{i}" for i in range(5000)))
+    assert sketch.count() == before
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog().merge(HyperLogLog(precision=10))
+
+
+def test_serialization_round_trip():
+    sketch = sketch_of(f"session-{i}" for i in range(3000))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert restored.precision == sketch.precision
+    assert restored.registers == sketch.registers
+    assert len(HyperLogLog().to_bytes()) < 100  # empty registers compress away
+
+
+def test_merged_unique_count_skips_missing_sketches():
+    days = [sketch_of(f"session-{i}" for i in range(start, start + 4000)).to_bytes() for start in (0, 2000, 4000)]
+    assert abs(merged_unique_count(days + [b"", None]) - 8000) <= 3 * STANDARD_ERROR * 8000
+    assert merged_unique_count([]) == 0
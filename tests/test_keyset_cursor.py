@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from server import decode_cursor, encode_cursor, keyset_query
+
+
+@pytest.mark.parametrize("value", [
+    "Quận 1", 1500000000, 72.5, True, None, datetime(2024, 5, 1, 14, 30, 15, 250000),
+])
+def test_cursor_round_trip(value):
+    cursor = encode_cursor("price", -1, {"id": "p-1", "price": value})
+    assert decode_cursor(cursor, "price", -1) == (value, "p-1")
+
+
+def test_missing_sort_value_round_trips_as_none():
+    cursor = encode_cursor("views", 1, {"id": "p-1"})
+    assert decode_cursor(cursor, "views", 1) == (None, "p-1")
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("title", 1, {"id": "?" * 20, "title": "???>>>"})
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+
+def test_cursor_for_another_sort_is_rejected():
+    cursor = encode_cursor("price", -1, {"id": "p-1", "price": 10})
+    for sort_by, sort_order in (("area", -1), ("price", 1)):
+        with pytest.raises(HTTPException) as raised:
+            decode_cursor(cursor, sort_by, sort_order)
+        assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "eyJmIjoicHJpY2UifQ", "W10"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor, "price", -1)
+    assert raised.value.status_code == 400
+
+
+def test_operator_in_cursor_value_is_rejected():
+    cursor = encode_cursor("price", -1, {"id": "p-1", "price": {"$ne": None}})
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor, "price", -1)
+
+
+def test_no_cursor_leaves_the_filter_alone():
+    assert keyset_query({"city": "HCM"}, "price", -1, None) == {"city": "HCM"}
+
+
+def compare(value, operator, other) -> bool:
+    """MongoDB comparison between values of the same type (null never compares)"""
+    if value is None or other is None:
+        return False
+    return value < other if operator == "$lt" else value > other
+
+
+def matches(document: dict, query: dict) -> bool:
+    """Evaluate the subset of the query language keyset_query produces"""
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif field == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(field)
+            for operator, other in condition.items():
+                if operator == "$ne":
+                    if value == other:
+                        return False
+                elif not compare(value, operator, other):
+                    return False
+        elif document.get(field) != condition:
+            return False
+    return True
+
+
+def sort_documents(documents, sort_by, sort_order):
+    """MongoDB order: missing/null sorts before any value, ties broken by id"""
+    return sorted(
+        documents,
+        key=lambda document: (document.get(sort_by) is not None, document.get(sort_by) or 0, document["id"]),
+        reverse=sort_order == -1
+    )
+
+
+@pytest.mark.parametrize("sort_order", [1, -1])
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7])
+def test_pages_cover_every_document_once_including_null_values(sort_order, page_size):
+    documents = [
+        {"id": "a", "price": 300}, {"id": "b", "price": None}, {"id": "c", "price": 100},
+        {"id": "d"}, {"id": "e", "price": 300}, {"id": "f", "price": 200}, {"id": "g", "price": None},
+        {"id": "h", "price": 100, "city": "HN"},
+    ]
+    expected = sort_documents([document for document in documents if document.get("city") != "HN"], "price", sort_order)
+
+    seen, cursor = [], None
+    while True:
+        query = keyset_query({"city": None}, "price", sort_order, cursor)
+        page = sort_documents([document for document in documents if matches(document, query)], "price", sort_order)[:page_size]
+        seen.extend(page)
+        if len(page) < page_size:
+            break
+        cursor = encode_cursor("price", sort_order, page[-1])
+    assert [document["id"] for document in seen] == [document["id"] for document in expected]
@@ -0,0 +1,107 @@
+import re
+
+import pytest
+from fastapi import HTTPException
+
+from server import SIM_PATTERN_CLASSES, sim_number_fields, sim_pattern_classes, sim_pattern_query
+
+
+@pytest.mark.parametrize("number, classes", [
+    ("0909118888", ["tu_quy"]),
+    ("0909123888", ["tam_hoa"]),
+    ("0912345668", ["loc_phat"]),
+    ("0912345686", ["loc_phat"]),
+    ("0912340539", ["than_tai"]),
+    ("0912340579", ["than_tai"]),
+    ("0912340538", ["ong_dia"]),
+    ("0912340578", ["ong_dia"]),
+    ("0912787878", ["ong_dia", "taxi"]),
+    ("0912123123", ["taxi"]),
+    ("0912346789", ["tien_len"]),
+    ("0905123321", ["guong"]),
+    ("0912341990", ["nam_sinh"]),
+    ("0915081990", ["nam_sinh"]),
+    ("0912150890", ["nam_sinh"]),
+    ("0912405137", []),
+])
+def test_pattern_classes(number, classes):
+    assert sim_pattern_classes(number) == classes
+
+
+def test_every_pattern_class_is_covered():
+    examples = ["0909118888", "0909123888", "0912345668", "0912340539", "0912340538",
+                "0912123123", "0912346789", "0905123321", "0912341990"]
+    found = {pattern_class for number in examples for pattern_class in sim_pattern_classes(number)}
+    assert found == set(SIM_PATTERN_CLASSES)
+
+
+def test_repeated_digit_is_not_taxi_or_mirror():
+    assert sim_pattern_classes("0905555555") == ["tu_quy"]
+
+
+def test_number_fields_normalize_country_code():
+    fields = sim_number_fields("+84 912 345 668")
+    assert fields["number_digits"] == "0912345668"
+    assert fields["number_reversed"] == "8665432190"
+    assert fields["number_patterns"] == ["loc_phat"]
+    assert "6866" not in fields["number_ngrams"] and "5668" in fields["number_ngrams"]
+
+
+def test_query_without_wildcards_is_an_exact_match():
+    assert sim_pattern_query("0912345678") == {"number_digits": "0912345678"}
+
+
+@pytest.mark.parametrize("pattern, query", [
+    ("*6868", {
+        "number_digits": {"$regex": r"^\d*6868$"},
+        "number_reversed": {"$regex": "^8686"},
+        "number_ngrams": {"$all": ["6868"]},
+    }),
+    ("09*68*8", {
+        "number_digits": {"$regex": r"^09\d*68\d*8$"},
+        "number_reversed": {"$regex": "^8"},
+        "number_ngrams": {"$all": ["09", "68"]},
+    }),
+    ("09xX", {
+        "number_digits": {"$regex": r"^09\d\d$"},
+        "number_ngrams": {"$all": ["09"]},
+    }),
+    (" **68 ", {
+        "number_digits": {"$regex": r"^\d*68$"},
+        "number_reversed": {"$regex": "^86"},
+        "number_ngrams": {"$all": ["68"]},
+    }),
+])
+def test_wildcard_translation(pattern, query):
+    assert sim_pattern_query(pattern) == query
+
+
+def matches(fields: dict, query: dict) -> bool:
+    """Evaluate a sim_pattern_query filter against a number's index keys"""
+    for field, condition in query.items():
+        if isinstance(condition, str):
+            if fields[field] != condition:
+                return False
+        elif "$regex" in condition:
+            if not re.search(condition["$regex"], fields[field]):
+                return False
+        elif not set(condition["$all"]) <= set(fields[field]):
+            return False
+    return True
+
+
+@pytest.mark.parametrize("pattern", ["*6868", "09*68*8", "091?34*", "*1?3*", "0912x45678"])
+def test_index_keys_agree_with_the_regex(pattern):
+    numbers = ["0912345678", "0912346868", "0909686868", "0968123458", "0913345678", "0123456868", "0912134568"]
+    query = sim_pattern_query(pattern)
+    regex = query["number_digits"]["$regex"] if isinstance(query["number_digits"], dict) else None
+    for number in numbers:
+        expected = bool(re.search(regex, number)) if regex else number == query["number_digits"]
+        assert matches(sim_number_fields(number), query) == expected, number
+
+
+@pytest.mark.parametrize("pattern", ["", "*", "***", "09-12", "abc", "09*6a"])
+def test_invalid_patterns_are_rejected(pattern):
+    with pytest.raises(HTTPException) as raised:
+        sim_pattern_query(pattern)
+    assert raised.value.status_code == 400